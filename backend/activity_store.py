@@ -0,0 +1,216 @@
+"""
+Activity storage on a MongoDB time-series collection
+Raw activities expire after a retention window; hourly and daily rollups answer counts
+"""
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from pymongo import UpdateOne
+from pymongo.errors import CollectionInvalid, OperationFailure
+
+logger = logging.getLogger(__name__)
+
+GRANULARITIES = ('hour', 'day')
+ROLLUPS_MARKER = 'activity_rollups'  # system_state document recording when rollups started
+
+
+def bucket_start(timestamp: datetime, granularity: str) -> datetime:
+    """Truncate a timestamp to the start of its rollup bucket"""
+    bucket = timestamp.replace(minute=0, second=0, microsecond=0)
+    if granularity == 'day':
+        bucket = bucket.replace(hour=0)
+    return bucket
+
+
+def first_full_hour(since: datetime) -> datetime:
+    """Start of the first hourly bucket entirely after since"""
+    hour = bucket_start(since, 'hour')
+    return hour if hour == since else hour + timedelta(hours=1)
+
+
+def rollup_filter(granularity: str, start: datetime, end: Optional[datetime] = None,
+                  agent_id: Optional[str] = None) -> Dict[str, Any]:
+    """Rollup buckets of one granularity from start's bucket up to end"""
+    match: Dict[str, Any] = {'granularity': granularity, 'bucket': {'$gte': bucket_start(start, granularity)}}
+    if end:
+        match['bucket']['$lte'] = end
+    if agent_id:
+        match['agent_id'] = agent_id
+    return match
+
+
+def partial_hour_filter(since: datetime) -> Dict[str, Any]:
+    """Raw activities between since and the first full hourly bucket"""
+    return {'timestamp': {'$gte': since, '$lt': first_full_hour(since)}}
+
+
+class ActivityStore:
+    """Time-series activity log with hourly and daily rollups"""
+
+    def __init__(self, db, retention_days: int = 30, hourly_retention_days: int = 90, writer=None):
+        self.db = db
+        self.retention = timedelta(days=retention_days)
+        self.hourly_retention = timedelta(days=hourly_retention_days)
+        self.timeseries = False
+
+        # Optional write-behind buffer; rollups are applied once per flushed batch
+        self.writer = writer
+        if writer:
+            writer.register_hook('activities', self.apply_rollups)
+
+    @property
+    def activities(self):
+        return self.db.activities
+
+    @property
+    def rollups(self):
+        return self.db.activity_rollups
+
+    async def ensure_collection(self):
+        """Create activities as a time-series collection with TTL retention"""
+        # Activities older than the first start with rollups are counted by backfill_rollups()
+        await self.db.system_state.update_one(
+            {'_id': ROLLUPS_MARKER}, {'$setOnInsert': {'since': datetime.utcnow()}}, upsert=True
+        )
+        expire_seconds = int(self.retention.total_seconds())
+        listing = await self.db.command('listCollections', filter={'name': 'activities'})
+        existing = listing['cursor']['firstBatch']
+
+        if existing:
+            self.timeseries = existing[0].get('type') == 'timeseries'
+            if self.timeseries:
+                await self.db.command({'collMod': 'activities', 'expireAfterSeconds': expire_seconds})
+            else:
+                logger.warning("activities is a regular collection; retention enforced by prune()")
+            return
+
+        try:
+            await self.db.create_collection(
+                'activities',
+                timeseries={'timeField': 'timestamp', 'metaField': 'agent_id', 'granularity': 'seconds'},
+                expireAfterSeconds=expire_seconds
+            )
+            self.timeseries = True
+        except CollectionInvalid:
+            pass  # Created concurrently by another worker
+        except OperationFailure as e:
+            # Time-series collections need MongoDB 5.0+
+            logger.warning(f"Time-series activities unavailable, using a regular collection: {str(e)}")
+
+    async def record(self, activity: Dict[str, Any]):
+        """Store one activity and bump its rollup buckets"""
+        if self.writer:
+            await self.writer.enqueue('activities', dict(activity))
+            return
+        await self.activities.insert_one(dict(activity))
+        await self.apply_rollups([activity])
+
+    @staticmethod
+    def count_buckets(activities, counts: Optional[Dict[tuple, int]] = None) -> Dict[tuple, int]:
+        """Activity counts per (granularity, bucket, agent_id, activity_type)"""
+        counts = {} if counts is None else counts
+        for activity in activities:
+            for granularity in GRANULARITIES:
+                key = (
+                    granularity,
+                    bucket_start(activity['timestamp'], granularity),
+                    activity['agent_id'],
+                    activity['activity_type']
+                )
+                counts[key] = counts.get(key, 0) + 1
+        return counts
+
+    async def apply_rollups(self, activities: List[Dict[str, Any]]):
+        """Increment hourly and daily buckets for a batch of activities"""
+        operations = []
+        for (granularity, bucket, agent_id, activity_type), count in self.count_buckets(activities).items():
+            update = {'$inc': {'count': count}}
+            if granularity == 'hour':
+                update['$setOnInsert'] = {'expires_at': bucket + self.hourly_retention}
+            operations.append(UpdateOne(
+                {'granularity': granularity, 'bucket': bucket, 'agent_id': agent_id, 'activity_type': activity_type},
+                update,
+                upsert=True
+            ))
+        if operations:
+            await self.rollups.bulk_write(operations, ordered=False)
+
+    async def backfill_rollups(self, batch_size: int = 5000) -> int:
+        """Count activities recorded before rollups existed into their buckets"""
+        marker = await self.db.system_state.find_one({'_id': ROLLUPS_MARKER})
+        if not marker:
+            return 0
+        counts: Dict[tuple, int] = {}
+        cursor = self.activities.find(
+            {'timestamp': {'$lt': marker['since']}},
+            {'_id': 0, 'timestamp': 1, 'agent_id': 1, 'activity_type': 1}
+        ).batch_size(batch_size)
+        async for activity in cursor:
+            self.count_buckets([activity], counts)
+
+        operations = []
+        for (granularity, bucket, agent_id, activity_type), count in counts.items():
+            expires_at = bucket + self.hourly_retention if granularity == 'hour' else None
+            # Replace this bucket's earlier backfill instead of adding to it, so a retried run
+            # is idempotent; live increments to the same bucket are kept
+            operations.append(UpdateOne(
+                {'granularity': granularity, 'bucket': bucket, 'agent_id': agent_id, 'activity_type': activity_type},
+                [{'$set': {
+                    'count': {'$add': [{'$ifNull': ['$count', 0]}, count,
+                                       {'$multiply': [-1, {'$ifNull': ['$backfilled', 0]}]}]},
+                    'backfilled': count,
+                    **({'expires_at': {'$ifNull': ['$expires_at', expires_at]}} if expires_at else {})
+                }}],
+                upsert=True
+            ))
+        for start in range(0, len(operations), batch_size):
+            await self.rollups.bulk_write(operations[start:start + batch_size], ordered=False)
+        if operations:
+            logger.info(f"Backfilled {len(operations)} activity rollup buckets from before {marker['since']}")
+        return len(operations)
+
+    async def recent(self, limit: int = 20, agent_id: Optional[str] = None,
+                     projection: Optional[Dict[str, int]] = None) -> List[Dict[str, Any]]:
+        """Most recent activities, newest first"""
+        query = {'agent_id': agent_id} if agent_id else {}
+        return await self.activities.find(query, projection or {'_id': 0}).sort('timestamp', -1).limit(limit).to_list(limit)
+
+    async def count_since(self, since: datetime) -> int:
+        """Activities since a point in time, answered from hourly buckets"""
+        pipeline = [
+            {'$match': rollup_filter('hour', first_full_hour(since))},
+            {'$group': {'_id': None, 'count': {'$sum': '$count'}}}
+        ]
+        result = await self.rollups.aggregate(pipeline).to_list(1)
+        bucketed = result[0]['count'] if result else 0
+
+        # Only the partial first hour is counted from raw rows
+        partial = await self.activities.count_documents(partial_hour_filter(since))
+        return bucketed + partial
+
+    async def rollup_series(self, granularity: str, start: datetime, end: Optional[datetime] = None,
+                            agent_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Activity counts per bucket and type between start and end"""
+        pipeline = [
+            {'$match': rollup_filter(granularity, start, end, agent_id)},
+            {'$group': {
+                '_id': {'bucket': '$bucket', 'activity_type': '$activity_type'},
+                'count': {'$sum': '$count'}
+            }},
+            {'$group': {
+                '_id': '$_id.bucket',
+                'total': {'$sum': '$count'},
+                'by_type': {'$push': {'k': '$_id.activity_type', 'v': '$count'}}
+            }},
+            {'$sort': {'_id': 1}},
+            {'$project': {'_id': 0, 'bucket': '$_id', 'total': 1, 'by_type': {'$arrayToObject': '$by_type'}}}
+        ]
+        return await self.rollups.aggregate(pipeline).to_list(None)
+
+    async def prune(self) -> int:
+        """Delete raw activities past retention when the collection has no native TTL"""
+        if self.timeseries:
+            return 0
+        result = await self.activities.delete_many({'timestamp': {'$lt': datetime.utcnow() - self.retention}})
+        return result.deleted_count
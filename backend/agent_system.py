@@ -1,15 +1,23 @@
 import os
-from dotenv import load_dotenv
-from emergentintegrations.llm.chat import LlmChat, UserMessage
 import asyncio
+import time
 import uuid
-from typing import Dict, Optional
+from functools import partial
+from typing import Awaitable, Callable, Dict, Optional
 import logging
 
-load_dotenv()
+import deadlines
+from deadlines import DeadlineExceeded
+from instrumentation import llm_provider_events, llm_request_duration, llm_request_errors, llm_tokens
+from llm_simulator import create_llm_chat, create_user_message
+from usage_accounting import UsageBudgetExceeded
 
 logger = logging.getLogger(__name__)
 
+# Rough token estimate used to turn streamed characters into a completion fraction
+CHARS_PER_TOKEN = 4
+CHAT_ERROR_PREFIX = "Error processing request"
+
 class AIAgent:
     """Individual AI Agent with specific specialization"""
     
@@ -23,6 +31,14 @@ class AIAgent:
         self.specialization = specialization
         self.api_key = os.environ.get('EMERGENT_LLM_KEY')
         
+        # Moving average of response length, the denominator for streamed progress
+        self.expected_response_tokens = 500.0
+        
+        # Token, cost and budget accounting, attached by the server
+        self.usage = None
+        # Circuit breakers, failover and hedging across providers, attached by the server
+        self.providers = None
+        
         # Define system prompts based on agent type
         self.system_prompt = self._get_system_prompt()
         
@@ -61,27 +77,103 @@ class AIAgent:
         }
         return prompts.get(self.agent_type, "You are a helpful AI assistant.")
     
-    async def chat(self, message: str, session_id: Optional[str] = None) -> str:
-        """Send a message to this agent and get response"""
+    async def chat(self, message: str, session_id: Optional[str] = None,
+                   on_progress: Optional[Callable[[float], Awaitable[None]]] = None,
+                   history: Optional[str] = None, kind: str = "chat") -> str:
+        """Send a message to this agent and get response
+        
+        on_progress receives the streamed fraction of the expected response length when
+        the backend streams; live LlmChat only returns complete responses. history is the
+        rendered conversation context sent ahead of the message. kind labels the call in
+        usage accounting; UsageBudgetExceeded is raised before anything is sent.
+        Calls are bounded by the request deadline, raising DeadlineExceeded.
+        """
         try:
             if not session_id:
                 session_id = str(uuid.uuid4())
             
-            chat = LlmChat(
-                api_key=self.api_key,
-                session_id=session_id,
-                system_message=self.system_prompt
-            ).with_model(self.model_provider, self.model_name)
+            text = f"{history}\n\nUser: {message}" if history else message
+            if self.usage:
+                text = await self.usage.admit(text)
+            attempt = partial(self._attempt, text, session_id, on_progress, kind)
             
-            user_message = UserMessage(text=message)
-            response = await chat.send_message(user_message)
+            if self.providers:
+                # Failover along the fallback chain; only non-streamed calls are hedged
+                response = await self.providers.call(
+                    self.model_provider, self.model_name, attempt, hedge=on_progress is None
+                )
+            else:
+                try:
+                    response = await asyncio.wait_for(
+                        attempt(self.model_provider, self.model_name), deadlines.bounded(None)
+                    )
+                except asyncio.TimeoutError:
+                    raise DeadlineExceeded(f"Request deadline exceeded waiting for {self.model_provider}")
             
+            tokens = len(response) / CHARS_PER_TOKEN
+            self.expected_response_tokens = 0.8 * self.expected_response_tokens + 0.2 * tokens
             return response
+        except (UsageBudgetExceeded, DeadlineExceeded):
+            raise
         except Exception as e:
             logger.error(f"Error in agent {self.name} chat: {str(e)}")
-            return f"Error processing request: {str(e)}"
+            return f"{CHAT_ERROR_PREFIX}: {str(e)}"
+    
+    async def _attempt(self, text: str, session_id: str,
+                       on_progress: Optional[Callable[[float], Awaitable[None]]], kind: str,
+                       provider: str, model: str) -> str:
+        """One LLM call on one provider/model, with latency, error and usage accounting"""
+        # Live provider, or the simulator / record / replay backend set by LLM_BACKEND
+        chat = create_llm_chat(
+            api_key=self.api_key,
+            session_id=session_id,
+            system_message=self.system_prompt
+        ).with_model(provider, model)
+        
+        user_message = create_user_message(text)
+        labels = {"provider": provider, "model": model, "agent": self.agent_id}
+        started = time.perf_counter()
+        try:
+            if on_progress and hasattr(chat, "stream_message"):
+                response = await self._stream(chat, user_message, on_progress)
+            else:
+                response = await chat.send_message(user_message)
+        except asyncio.CancelledError:
+            # A lost hedge race or an expired deadline: counted apart from latency and usage
+            llm_provider_events.inc(provider=provider, event="attempt_cancelled")
+            raise
+        except Exception:
+            llm_request_errors.inc(**labels)
+            await self._account(labels, kind, text, "", time.perf_counter() - started, failed=True)
+            raise
+        await self._account(labels, kind, text, response, time.perf_counter() - started)
+        return response
     
-    async def process_task(self, task_title: str, task_description: str) -> str:
+    async def _account(self, labels: Dict[str, str], kind: str, text: str, response: str,
+                       elapsed: float, failed: bool = False):
+        """Latency, usage and token counts of one finished call"""
+        llm_request_duration.observe(elapsed, **labels)
+        if self.usage:
+            usage = await self.usage.record(
+                self.agent_id, labels["provider"], labels["model"], kind,
+                f"{self.system_prompt}\n{text}", response, elapsed, error=failed
+            )
+            llm_tokens.inc(usage["prompt_tokens"], direction="prompt", **labels)
+            llm_tokens.inc(usage["completion_tokens"], direction="completion", **labels)
+    
+    async def _stream(self, chat, user_message, on_progress: Callable[[float], Awaitable[None]]) -> str:
+        """Collect a streamed response, reporting the fraction received so far"""
+        chunks = []
+        received = 0
+        expected = max(1.0, self.expected_response_tokens * CHARS_PER_TOKEN)
+        async for chunk in chat.stream_message(user_message):
+            chunks.append(chunk)
+            received += len(chunk)
+            await on_progress(min(1.0, received / expected))
+        return "".join(chunks).strip()
+    
+    async def process_task(self, task_title: str, task_description: str,
+                           on_progress: Optional[Callable[[float], Awaitable[None]]] = None) -> str:
         """Process a task and return results"""
         prompt = f"""Task: {task_title}
 
@@ -95,7 +187,7 @@ Please analyze this task based on your expertise as a {self.agent_type} and prov
 
 Provide a comprehensive but concise response."""
         
-        return await self.chat(prompt)
+        return await self.chat(prompt, on_progress=on_progress, kind="task")
 
 
 class HiveMindOrchestrator:
@@ -169,6 +261,16 @@ class HiveMindOrchestrator:
             )
             self.agents[config["agent_id"]] = agent
     
+    def attach_usage(self, usage):
+        """Account every agent's LLM calls with a UsageAccountant"""
+        for agent in self.agents.values():
+            agent.usage = usage
+    
+    def attach_providers(self, providers):
+        """Route every agent's LLM calls through a ProviderPool"""
+        for agent in self.agents.values():
+            agent.providers = providers
+    
     def get_agent(self, agent_id: str) -> Optional[AIAgent]:
         """Get agent by ID"""
         return self.agents.get(agent_id)
@@ -186,7 +288,7 @@ class HiveMindOrchestrator:
         primary_agent = self.agents[primary_agent_id]
         
         # Get primary response
-        primary_response = await primary_agent.chat(message)
+        primary_response = await primary_agent.chat(message, kind="hive")
         responses[primary_agent.name] = primary_response
         
         return {
@@ -211,6 +313,3 @@ class HiveMindOrchestrator:
             return "agent-3"  # Cipher
         else:
             return "agent-1"  # Default to Sentinel
-
-# Global orchestrator instance
-orchestrator = HiveMindOrchestrator()
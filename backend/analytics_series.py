@@ -0,0 +1,266 @@
+"""
+Pre-aggregated analytics time series
+Task, activity and finding counts are added to minute, hour and day buckets as they are
+written, so trend queries read a few thousand bucket documents instead of raw history
+"""
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from pymongo import UpdateOne
+
+logger = logging.getLogger(__name__)
+
+GRANULARITIES = ('minute', 'hour', 'day')
+STEPS = {'minute': timedelta(minutes=1), 'hour': timedelta(hours=1), 'day': timedelta(days=1)}
+METRICS = ('tasks', 'activities', 'findings')
+MAX_POINTS = 2000  # buckets per series in one response
+SERIES_MARKER = 'analytics_series'  # system_state document recording when counting started
+
+
+def bucket_start(timestamp: datetime, granularity: str) -> datetime:
+    """Truncate a timestamp to the start of its bucket"""
+    bucket = timestamp.replace(second=0, microsecond=0)
+    if granularity in ('hour', 'day'):
+        bucket = bucket.replace(minute=0)
+    if granularity == 'day':
+        bucket = bucket.replace(hour=0)
+    return bucket
+
+
+def bucket_count(start: datetime, end: datetime, granularity: str) -> int:
+    return int((end - bucket_start(start, granularity)) / STEPS[granularity]) + 1
+
+
+def resolve_granularity(metric: str, start: datetime, end: datetime, granularity: Optional[str] = None) -> str:
+    """Validate a series query; without a granularity, the finest that fits in MAX_POINTS"""
+    if metric not in METRICS:
+        raise ValueError(f"metric must be one of {', '.join(METRICS)}")
+    if start >= end:
+        raise ValueError("start must be before end")
+    if granularity is None:
+        fitting = [g for g in GRANULARITIES if bucket_count(start, end, g) <= MAX_POINTS]
+        granularity = fitting[0] if fitting else 'day'
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"granularity must be one of {', '.join(GRANULARITIES)}")
+    points = bucket_count(start, end, granularity)
+    if points > MAX_POINTS:
+        raise ValueError(f"{points} {granularity} buckets requested; at most {MAX_POINTS}, use a coarser granularity")
+    return granularity
+
+
+def completion_events(agent_id: str, findings: Dict[str, Any], timestamp: datetime) -> List[Dict[str, Any]]:
+    """Events of a completed task with its vulnerabilities, fixes and severity-tagged results"""
+    events = [
+        {'metric': 'tasks', 'dimension': 'completed', 'agent_id': agent_id, 'timestamp': timestamp},
+        {'metric': 'findings', 'dimension': 'vulnerabilities', 'agent_id': agent_id,
+         'timestamp': timestamp, 'count': findings.get('vulnerabilities', 0)},
+        {'metric': 'findings', 'dimension': 'fixed', 'agent_id': agent_id,
+         'timestamp': timestamp, 'count': findings.get('fixed', 0)}
+    ]
+    return events + [
+        {'metric': 'findings', 'dimension': severity, 'agent_id': agent_id, 'timestamp': timestamp}
+        for severity in findings.get('severity_tags', [])
+    ]
+
+
+def scan_events(agent_id: str, severities: Dict[str, int], timestamp: datetime) -> List[Dict[str, Any]]:
+    """Events of a code scan: every vulnerability it found, under its severity"""
+    events = [{'metric': 'findings', 'dimension': 'vulnerabilities', 'agent_id': agent_id,
+               'timestamp': timestamp, 'count': sum(severities.values())}]
+    return events + [
+        {'metric': 'findings', 'dimension': severity, 'agent_id': agent_id, 'timestamp': timestamp, 'count': count}
+        for severity, count in severities.items()
+    ]
+
+
+def activity_events(activities: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return [
+        {'metric': 'activities', 'dimension': activity['activity_type'],
+         'agent_id': activity['agent_id'], 'timestamp': activity['timestamp']}
+        for activity in activities
+    ]
+
+
+def series_filter(metric: str, granularity: str, start: datetime, end: datetime,
+                  agent_id: Optional[str] = None) -> Dict[str, Any]:
+    """Buckets of one metric and granularity from start's bucket up to end"""
+    match: Dict[str, Any] = {
+        'granularity': granularity, 'metric': metric,
+        'bucket': {'$gte': bucket_start(start, granularity), '$lte': end}
+    }
+    if agent_id:
+        match['agent_id'] = agent_id
+    return match
+
+
+class TimeSeriesAnalytics:
+    """Counters per metric, dimension and agent in minute, hour and day buckets"""
+
+    def __init__(self, db, minute_retention_days: int = 7, hour_retention_days: int = 400):
+        self.db = db
+        # Day buckets are kept indefinitely
+        self.retention = {'minute': timedelta(days=minute_retention_days), 'hour': timedelta(days=hour_retention_days)}
+        self._stats = {'increments': 0, 'errors': 0, 'queries': 0}
+
+    @property
+    def buckets(self):
+        return self.db.analytics_buckets
+
+    def count_events(self, events: List[Dict[str, Any]], counts: Optional[Dict[tuple, int]] = None) -> Dict[tuple, int]:
+        """Event counts per (granularity, metric, bucket, agent_id, dimension), past retention left out"""
+        counts = {} if counts is None else counts
+        now = datetime.utcnow()
+        for event in events:
+            for granularity in GRANULARITIES:
+                bucket = bucket_start(event['timestamp'], granularity)
+                if granularity in self.retention and bucket + self.retention[granularity] < now:
+                    continue
+                key = (granularity, event['metric'], bucket, event.get('agent_id') or 'system', event['dimension'])
+                counts[key] = counts.get(key, 0) + event.get('count', 1)
+        return counts
+
+    async def record_many(self, events: List[Dict[str, Any]]):
+        """Add events of the form {metric, dimension, agent_id, timestamp, count} to their buckets"""
+        operations = []
+        for (granularity, metric, bucket, agent_id, dimension), count in self.count_events(events).items():
+            if not count:
+                continue
+            update = {'$inc': {'count': count}}
+            if granularity in self.retention:
+                update['$setOnInsert'] = {'expires_at': bucket + self.retention[granularity]}
+            operations.append(UpdateOne(
+                {'granularity': granularity, 'metric': metric, 'bucket': bucket,
+                 'agent_id': agent_id, 'dimension': dimension},
+                update,
+                upsert=True
+            ))
+        if not operations:
+            return
+        try:
+            await self.buckets.bulk_write(operations, ordered=False)
+            self._stats['increments'] += len(operations)
+        except Exception as e:
+            # Analytics never fail the write they describe
+            self._stats['errors'] += 1
+            logger.error(f"Error updating analytics buckets: {str(e)}")
+
+    async def record(self, metric: str, dimension: str, agent_id: Optional[str],
+                     timestamp: Optional[datetime] = None, count: int = 1):
+        await self.record_many([{
+            'metric': metric, 'dimension': dimension, 'agent_id': agent_id,
+            'timestamp': timestamp or datetime.utcnow(), 'count': count
+        }])
+
+    async def record_completion(self, agent_id: str, findings: Dict[str, Any], timestamp: Optional[datetime] = None):
+        """A completed task with its vulnerabilities, fixes and severity-tagged results"""
+        await self.record_many(completion_events(agent_id, findings, timestamp or datetime.utcnow()))
+
+    async def record_scan(self, agent_id: str, severities: Dict[str, int], timestamp: Optional[datetime] = None):
+        """A code scan with its vulnerability count per severity"""
+        await self.record_many(scan_events(agent_id, severities, timestamp or datetime.utcnow()))
+
+    async def record_activities(self, activities: List[Dict[str, Any]]):
+        """Write-behind hook: count flushed activities by type"""
+        await self.record_many(activity_events(activities))
+
+    async def mark_started(self):
+        """Record when counting started; earlier tasks and activities are left to backfill()"""
+        await self.db.system_state.update_one(
+            {'_id': SERIES_MARKER}, {'$setOnInsert': {'since': datetime.utcnow()}}, upsert=True
+        )
+
+    async def backfill(self, batch_size: int = 5000) -> int:
+        """Count tasks, code scans and activities written before counting started into their buckets"""
+        marker = await self.db.system_state.find_one({'_id': SERIES_MARKER})
+        if not marker:
+            return 0
+        since = marker['since']
+        counts: Dict[tuple, int] = {}
+
+        tasks = self.db.tasks.find(
+            {'created_at': {'$lt': since}},
+            {'_id': 0, 'assigned_agent_id': 1, 'status': 1, 'created_at': 1, 'completed_at': 1, 'failed_at': 1,
+             'findings': 1}
+        ).batch_size(batch_size)
+        async for task in tasks:
+            agent_id = task.get('assigned_agent_id')
+            events = [{'metric': 'tasks', 'dimension': 'created', 'agent_id': agent_id, 'timestamp': task['created_at']}]
+            if task.get('status') == 'completed' and task.get('completed_at') and task['completed_at'] < since:
+                events += completion_events(agent_id, task.get('findings') or {}, task['completed_at'])
+            elif task.get('status') == 'failed':
+                # Failures from before failed_at was stored are counted at creation
+                failed_at = task.get('failed_at') or task['created_at']
+                if failed_at < since:
+                    events.append({'metric': 'tasks', 'dimension': 'failed', 'agent_id': agent_id,
+                                   'timestamp': failed_at})
+            self.count_events(events, counts)
+
+        scans = self.db.code_scans.find(
+            {'timestamp': {'$lt': since}}, {'_id': 0, 'agent_id': 1, 'severities': 1, 'timestamp': 1}
+        ).batch_size(batch_size)
+        async for scan in scans:
+            self.count_events(scan_events(scan.get('agent_id'), scan.get('severities') or {}, scan['timestamp']), counts)
+
+        activities = self.db.activities.find(
+            {'timestamp': {'$lt': since}}, {'_id': 0, 'agent_id': 1, 'activity_type': 1, 'timestamp': 1}
+        ).batch_size(batch_size)
+        async for activity in activities:
+            self.count_events(activity_events([activity]), counts)
+
+        operations = []
+        for (granularity, metric, bucket, agent_id, dimension), count in counts.items():
+            fields: Dict[str, Any] = {
+                # Replace this bucket's earlier backfill instead of adding to it, so a retried
+                # run is idempotent; live increments to the same bucket are kept
+                'count': {'$add': [{'$ifNull': ['$count', 0]}, count,
+                                   {'$multiply': [-1, {'$ifNull': ['$backfilled', 0]}]}]},
+                'backfilled': count
+            }
+            if granularity in self.retention:
+                fields['expires_at'] = {'$ifNull': ['$expires_at', bucket + self.retention[granularity]]}
+            operations.append(UpdateOne(
+                {'granularity': granularity, 'metric': metric, 'bucket': bucket,
+                 'agent_id': agent_id, 'dimension': dimension},
+                [{'$set': fields}],
+                upsert=True
+            ))
+        for start in range(0, len(operations), batch_size):
+            await self.buckets.bulk_write(operations[start:start + batch_size], ordered=False)
+        if operations:
+            logger.info(f"Backfilled {len(operations)} analytics buckets from before {since}")
+        return len(operations)
+
+    async def series(self, metric: str, start: datetime, end: datetime, granularity: Optional[str] = None,
+                     agent_id: Optional[str] = None) -> Dict[str, Any]:
+        """Zero-filled counts per dimension and bucket between start and end"""
+        granularity = resolve_granularity(metric, start, end, granularity)
+        first = bucket_start(start, granularity)
+        points = bucket_count(start, end, granularity)
+
+        self._stats['queries'] += 1
+        rows = await self.buckets.aggregate([
+            {'$match': series_filter(metric, granularity, start, end, agent_id)},
+            {'$group': {'_id': {'bucket': '$bucket', 'dimension': '$dimension'}, 'count': {'$sum': '$count'}}}
+        ]).to_list(None)
+
+        counts: Dict[str, Dict[datetime, int]] = {}
+        for row in rows:
+            counts.setdefault(row['_id']['dimension'], {})[row['_id']['bucket']] = row['count']
+        buckets = [first + STEPS[granularity] * i for i in range(points)]
+        return {
+            'metric': metric,
+            'granularity': granularity,
+            'start': first,
+            'end': end,
+            'agent_id': agent_id,
+            'buckets': buckets,
+            'series': {
+                dimension: [values.get(bucket, 0) for bucket in buckets]
+                for dimension, values in sorted(counts.items())
+            },
+            'totals': {dimension: sum(values.values()) for dimension, values in sorted(counts.items())}
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(self._stats)
@@ -0,0 +1,128 @@
+"""
+Persistent conversation store per (agent_id, session_id)
+Recent turns are kept verbatim within a token budget; older turns are folded into a
+cached extractive summary so prompt size stays flat over long sessions
+"""
+import logging
+import re
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+
+from pymongo import ReturnDocument
+
+from usage_accounting import count_tokens
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_SENTENCE_CHARS = 200
+
+
+def first_sentence(text: str, max_chars: int = SUMMARY_SENTENCE_CHARS) -> str:
+    """Leading sentence of a turn, whitespace collapsed and length capped"""
+    text = " ".join(text.split())
+    match = re.match(r'(.+?[.!?])(\s|$)', text)
+    sentence = match.group(1) if match else text
+    return sentence if len(sentence) <= max_chars else sentence[:max_chars - 3].rstrip() + "..."
+
+
+class ConversationStore:
+    """Mongo-backed chat history with a token-budgeted context window"""
+
+    def __init__(self, db, context_tokens: int = 2000, summary_tokens: int = 300, ttl_days: int = 30):
+        self.db = db
+        self.context_tokens = context_tokens  # summary + verbatim turns sent with each message
+        self.summary_tokens = summary_tokens
+        self.ttl = timedelta(days=ttl_days)
+        self._stats = {'loads': 0, 'appends': 0, 'compactions': 0, 'compaction_conflicts': 0}
+
+    @property
+    def conversations(self):
+        return self.db.conversations
+
+    async def context(self, agent_id: str, session_id: str) -> Dict[str, Any]:
+        """Summary and verbatim recent turns for a session"""
+        self._stats['loads'] += 1
+        doc = await self.conversations.find_one(
+            {'agent_id': agent_id, 'session_id': session_id},
+            {'_id': 0, 'summary': 1, 'turns': 1}
+        )
+        return doc or {'summary': '', 'turns': []}
+
+    @staticmethod
+    def render(context: Dict[str, Any]) -> str:
+        """Conversation history as prompt text; empty for a new session"""
+        sections = []
+        if context.get('summary'):
+            sections.append("Summary of earlier conversation:\n" + context['summary'])
+        if context.get('turns'):
+            lines = [f"{'User' if turn['role'] == 'user' else 'Assistant'}: {turn['content']}"
+                     for turn in context['turns']]
+            sections.append("Recent conversation:\n" + "\n".join(lines))
+        return "\n\n".join(sections)
+
+    async def append(self, agent_id: str, session_id: str, message: str, response: str):
+        """Store one exchange, then fold old turns into the summary if over budget"""
+        self._stats['appends'] += 1
+        now = datetime.utcnow()
+        turns = [
+            {'role': 'user', 'content': message, 'tokens': count_tokens(message), 'timestamp': now},
+            {'role': 'assistant', 'content': response, 'tokens': count_tokens(response), 'timestamp': now}
+        ]
+        doc = await self.conversations.find_one_and_update(
+            {'agent_id': agent_id, 'session_id': session_id},
+            {
+                '$push': {'turns': {'$each': turns}},
+                '$inc': {'version': 1, 'total_turns': len(turns)},
+                '$set': {'updated_at': now, 'expires_at': now + self.ttl},
+                '$setOnInsert': {'summary': '', 'summarized_turns': 0, 'created_at': now}
+            },
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+            projection={'turns.content': 1, 'turns.role': 1, 'turns.tokens': 1, 'summary': 1, 'version': 1}
+        )
+        await self._compact(doc)
+
+    async def _compact(self, doc: Dict[str, Any]):
+        turns: List[Dict[str, Any]] = doc.get('turns', [])
+        recent_budget = self.context_tokens - self.summary_tokens
+        if sum(turn['tokens'] for turn in turns) <= recent_budget:
+            return
+
+        # Keep the newest turns that fit, always at least the latest exchange
+        keep, used = 0, 0
+        for turn in reversed(turns):
+            if keep >= 2 and used + turn['tokens'] > recent_budget:
+                break
+            keep += 1
+            used += turn['tokens']
+        folded = turns[:len(turns) - keep]
+        if not folded:
+            return
+
+        lines = [line for line in (doc.get('summary') or '').split("\n") if line]
+        lines += [f"- {'User' if turn['role'] == 'user' else 'Assistant'}: {first_sentence(turn['content'])}"
+                  for turn in folded]
+        # The summary keeps its newest lines within its own budget
+        while len(lines) > 1 and count_tokens("\n".join(lines)) > self.summary_tokens:
+            lines.pop(0)
+
+        result = await self.conversations.update_one(
+            {'_id': doc['_id'], 'version': doc['version']},
+            {
+                '$set': {'summary': "\n".join(lines)},
+                '$inc': {'summarized_turns': len(folded)},
+                '$push': {'turns': {'$each': [], '$slice': -keep}}
+            }
+        )
+        if result.modified_count:
+            self._stats['compactions'] += 1
+        else:
+            # Another append landed first; the next append compacts again
+            self._stats['compaction_conflicts'] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'context_tokens': self.context_tokens,
+            'summary_tokens': self.summary_tokens,
+            **self._stats
+        }
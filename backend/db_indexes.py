@@ -0,0 +1,184 @@
+"""
+Declarative MongoDB index registry
+Every hot route query is listed here together with the index that serves it
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+from activity_store import first_full_hour, partial_hour_filter, rollup_filter
+from analytics_series import series_filter
+from metrics_engine import deployments_filter, recent_errors_filter, stuck_tasks_filter
+from result_store import INLINE_RESULTS
+from task_findings import STALE_FINDINGS
+from task_queries import TASK_LIST_LIMIT, TASK_LIST_SORT, task_filter
+from usage_accounting import summary_filter
+
+logger = logging.getLogger(__name__)
+
+# Indexes ensured at startup, per collection
+INDEXES: Dict[str, List[IndexModel]] = {
+    'agents': [
+        IndexModel([('agent_id', ASCENDING)], name='agent_id_unique', unique=True),
+        IndexModel([('name', ASCENDING)], name='name')
+    ],
+    'tasks': [
+        IndexModel([('task_id', ASCENDING)], name='task_id_unique', unique=True),
+        IndexModel([('created_at', DESCENDING)], name='created_at'),
+        IndexModel([('status', ASCENDING), ('created_at', DESCENDING)], name='status_created_at'),
+        IndexModel([('assigned_agent_id', ASCENDING), ('created_at', DESCENDING)], name='agent_created_at'),
+        IndexModel([('priority', ASCENDING), ('created_at', DESCENDING)], name='priority_created_at'),
+        IndexModel([('status', ASCENDING), ('completed_at', DESCENDING)], name='status_completed_at'),
+        # One-time migrations: tasks still holding their result inline, findings of an older version
+        IndexModel([('status', ASCENDING)], name='status_inline_result',
+                   partialFilterExpression={'result': {'$type': 'string'}}),
+        IndexModel([('status', ASCENDING), ('findings.version', ASCENDING)], name='status_findings_version')
+    ],
+    'activities': [
+        IndexModel([('timestamp', DESCENDING)], name='timestamp'),
+        IndexModel([('agent_id', ASCENDING), ('timestamp', DESCENDING)], name='agent_timestamp')
+    ],
+    'activity_rollups': [
+        IndexModel(
+            [('granularity', ASCENDING), ('bucket', ASCENDING), ('agent_id', ASCENDING), ('activity_type', ASCENDING)],
+            name='granularity_bucket_agent_type_unique', unique=True
+        ),
+        IndexModel([('expires_at', ASCENDING)], name='expires_at_ttl', expireAfterSeconds=0)
+    ],
+    'hive_messages': [
+        IndexModel([('timestamp', DESCENDING)], name='timestamp')
+    ],
+    'certifications': [
+        IndexModel([('name', ASCENDING)], name='name_unique', unique=True),
+        IndexModel([('status', ASCENDING)], name='status')
+    ],
+    'health_checks': [
+        IndexModel([('status', ASCENDING)], name='status')
+    ],
+    'job_runs': [
+        IndexModel([('job', ASCENDING), ('started_at', DESCENDING)], name='job_started_at'),
+        IndexModel([('started_at', ASCENDING)], name='started_at_ttl', expireAfterSeconds=7 * 24 * 3600)
+    ],
+    'code_scans': [
+        IndexModel([('timestamp', DESCENDING)], name='timestamp')
+    ],
+    'error_logs': [
+        IndexModel([('timestamp', DESCENDING)], name='timestamp')
+    ],
+    'conversations': [
+        IndexModel([('agent_id', ASCENDING), ('session_id', ASCENDING)], name='agent_session_unique', unique=True),
+        IndexModel([('expires_at', ASCENDING)], name='expires_at_ttl', expireAfterSeconds=0)
+    ],
+    'task_results': [
+        IndexModel([('task_id', ASCENDING)], name='task_id_unique', unique=True)
+    ],
+    'analytics_buckets': [
+        IndexModel(
+            [('granularity', ASCENDING), ('metric', ASCENDING), ('bucket', ASCENDING), ('agent_id', ASCENDING), ('dimension', ASCENDING)],
+            name='granularity_metric_bucket_agent_dimension_unique', unique=True
+        ),
+        IndexModel([('granularity', ASCENDING), ('metric', ASCENDING), ('agent_id', ASCENDING), ('bucket', ASCENDING)],
+                   name='granularity_metric_agent_bucket'),
+        IndexModel([('expires_at', ASCENDING)], name='expires_at_ttl', expireAfterSeconds=0)
+    ],
+    'usage_buckets': [
+        IndexModel(
+            [('bucket', ASCENDING), ('agent_id', ASCENDING), ('provider', ASCENDING), ('model', ASCENDING), ('kind', ASCENDING)],
+            name='bucket_agent_provider_model_kind_unique', unique=True
+        ),
+        IndexModel([('agent_id', ASCENDING), ('bucket', ASCENDING)], name='agent_bucket'),
+        IndexModel([('expires_at', ASCENDING)], name='expires_at_ttl', expireAfterSeconds=0)
+    ],
+    'usage_periods': [
+        IndexModel([('period', ASCENDING), ('start', ASCENDING)], name='period_start_unique', unique=True),
+        IndexModel([('expires_at', ASCENDING)], name='expires_at_ttl', expireAfterSeconds=0)
+    ]
+}
+
+# Query shapes issued by the API routes; each must be answered without a COLLSCAN.
+# Filters come from the same builders the routes call, so this list cannot drift from
+# them; only exact lookups on a unique key are written out. Unfiltered reads of small
+# fixed collections (agents, certifications) and free-text regex search are not listed.
+_NOW = datetime.utcnow()
+_TODAY = _NOW.replace(hour=0, minute=0, second=0, microsecond=0)
+
+ROUTE_QUERIES: List[Dict[str, Any]] = [
+    {'route': 'GET /api/agents (current task)', 'collection': 'tasks',
+     'filter': {'task_id': 'task-00000001'}},
+    {'route': 'GET /api/agents/{agent_id}', 'collection': 'agents',
+     'filter': {'agent_id': 'agent-1'}},
+    {'route': 'GET /api/tasks', 'collection': 'tasks',
+     'filter': task_filter(), 'sort': TASK_LIST_SORT, 'limit': TASK_LIST_LIMIT},
+    {'route': 'GET /api/tasks?status=', 'collection': 'tasks',
+     'filter': task_filter(status='in_progress'), 'sort': TASK_LIST_SORT, 'limit': TASK_LIST_LIMIT},
+    {'route': 'GET /api/tasks?priority=', 'collection': 'tasks',
+     'filter': task_filter(priority='high'), 'sort': TASK_LIST_SORT, 'limit': TASK_LIST_LIMIT},
+    {'route': 'GET /api/tasks?agent_id=', 'collection': 'tasks',
+     'filter': task_filter(agent_id='agent-1'), 'sort': TASK_LIST_SORT, 'limit': TASK_LIST_LIMIT},
+    {'route': 'GET /api/tasks?status=&agent_id=', 'collection': 'tasks',
+     'filter': task_filter(status='completed', agent_id='agent-1'), 'sort': TASK_LIST_SORT, 'limit': TASK_LIST_LIMIT},
+    {'route': 'GET /api/tasks/{task_id}/result', 'collection': 'task_results',
+     'filter': {'task_id': 'task-00000001'}},
+    {'route': 'GET /api/analytics/dashboard (task counts)', 'collection': 'tasks',
+     'filter': task_filter(status='completed')},
+    {'route': 'GET /api/analytics/dashboard (24h activity buckets)', 'collection': 'activity_rollups',
+     'filter': rollup_filter('hour', first_full_hour(_NOW - timedelta(hours=24)))},
+    {'route': 'GET /api/analytics/dashboard (partial hour)', 'collection': 'activities',
+     'filter': partial_hour_filter(_NOW - timedelta(hours=24))},
+    {'route': 'GET /api/analytics/dashboard (certifications)', 'collection': 'certifications',
+     'filter': {'status': 'certified'}},
+    {'route': 'GET /api/analytics/timeseries', 'collection': 'analytics_buckets',
+     'filter': series_filter('tasks', 'hour', _NOW - timedelta(days=30), _NOW)},
+    {'route': 'GET /api/analytics/timeseries?agent_id=', 'collection': 'analytics_buckets',
+     'filter': series_filter('activities', 'minute', _NOW - timedelta(hours=24), _NOW, 'agent-1')},
+    {'route': 'GET /api/analytics/agent-performance', 'collection': 'tasks',
+     'filter': task_filter(agent_id='agent-1')},
+    {'route': 'GET /api/activities', 'collection': 'activities',
+     'filter': {}, 'sort': [('timestamp', DESCENDING)], 'limit': 20},
+    {'route': 'GET /api/activities/rollups', 'collection': 'activity_rollups',
+     'filter': rollup_filter('day', _NOW - timedelta(days=30))},
+    {'route': 'POST /api/agents/{agent_id}/chat (conversation)', 'collection': 'conversations',
+     'filter': {'agent_id': 'agent-1', 'session_id': 'session-1'}},
+    {'route': 'GET /api/usage', 'collection': 'usage_buckets',
+     'filter': summary_filter(_NOW - timedelta(hours=24))},
+    {'route': 'GET /api/usage?agent_id=', 'collection': 'usage_buckets',
+     'filter': summary_filter(_NOW - timedelta(hours=24), 'agent-1')},
+    {'route': 'POST /api/agents/{agent_id}/chat (budget period)', 'collection': 'usage_periods',
+     'filter': {'period': 'day', 'start': _TODAY}},
+    {'route': 'GET /api/hive/messages', 'collection': 'hive_messages',
+     'filter': {}, 'sort': [('timestamp', DESCENDING)], 'limit': 50},
+    {'route': 'GET /api/health (pending tasks)', 'collection': 'tasks',
+     'filter': task_filter(status='pending')},
+    {'route': 'GET /api/health (stuck tasks)', 'collection': 'tasks',
+     'filter': stuck_tasks_filter(_NOW)},
+    {'route': 'GET /api/health (recent errors)', 'collection': 'error_logs',
+     'filter': recent_errors_filter(_NOW)},
+    {'route': 'GET /api/metrics/security (uptime)', 'collection': 'health_checks',
+     'filter': {'status': 'healthy'}},
+    {'route': 'GET /api/metrics/development (deployments today)', 'collection': 'tasks',
+     'filter': deployments_filter(_TODAY)},
+    {'route': 'scheduler: update_certification_progress', 'collection': 'certifications',
+     'filter': {'status': 'in_progress'}},
+    {'route': 'migration: migrate_task_results', 'collection': 'tasks',
+     'filter': INLINE_RESULTS, 'limit': 100},
+    {'route': 'migration: backfill_findings', 'collection': 'tasks',
+     'filter': STALE_FINDINGS, 'limit': 100}
+]
+
+
+async def ensure_indexes(db) -> Dict[str, List[str]]:
+    """Create every registered index, returns the index names per collection"""
+    async def ensure(collection: str, indexes: List[IndexModel]):
+        try:
+            ensured[collection] = await db[collection].create_indexes(indexes)
+        except Exception as e:
+            logger.error(f"Error ensuring indexes on {collection}: {str(e)}")
+
+    # One round trip per collection, issued concurrently
+    ensured = {}
+    await asyncio.gather(*[ensure(collection, indexes) for collection, indexes in INDEXES.items()])
+    logger.info(f"Ensured indexes on {len(ensured)} collections")
+    return ensured
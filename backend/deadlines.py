@@ -0,0 +1,164 @@
+"""
+Request deadlines propagated to LLM calls and MongoDB operations
+Each API request runs under a deadline from the X-Request-Timeout header or its route default,
+and is cancelled when the deadline passes or the client disconnects
+"""
+import asyncio
+import contextvars
+import json
+import logging
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
+import pymongo
+from starlette.routing import Match
+
+from instrumentation import http_request_cancellations
+
+logger = logging.getLogger(__name__)
+
+TIMEOUT_HEADER = b'x-request-timeout'
+
+# Absolute deadline on the event loop clock; None outside a request
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar('request_deadline', default=None)
+
+
+class DeadlineExceeded(Exception):
+    """The request's deadline passed before the work finished"""
+
+
+def remaining() -> Optional[float]:
+    """Seconds left before the current deadline, or None without one"""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - asyncio.get_running_loop().time()
+
+
+def check():
+    """Raise DeadlineExceeded if the current deadline has passed"""
+    left = remaining()
+    if left is not None and left <= 0:
+        raise DeadlineExceeded("Request deadline exceeded")
+
+
+def bounded(timeout: Optional[float]) -> Optional[float]:
+    """A timeout shortened to the current deadline"""
+    left = remaining()
+    if left is None:
+        return timeout
+    return left if timeout is None else min(timeout, left)
+
+
+@contextmanager
+def deadline(seconds: float):
+    """Run the block under a deadline; MongoDB operations get it through pymongo.timeout"""
+    token = _deadline.set(asyncio.get_running_loop().time() + seconds)
+    try:
+        with pymongo.timeout(seconds):
+            yield
+    finally:
+        _deadline.reset(token)
+
+
+def detach(coro) -> asyncio.Task:
+    """Start a background task that outlives the request, without its deadline"""
+    return contextvars.Context().run(asyncio.create_task, coro)
+
+
+class DeadlineMiddleware:
+    """ASGI middleware that bounds each request and cancels it on deadline or disconnect"""
+
+    def __init__(self, app, router=None, default_timeout: float = 30.0,
+                 route_timeouts: Optional[Dict[str, float]] = None, max_timeout: float = 300.0):
+        self.app = app
+        self.router = router
+        self.default_timeout = default_timeout
+        self.route_timeouts = route_timeouts or {}  # route template -> seconds
+        self.max_timeout = max_timeout
+
+    def route_path(self, scope) -> Optional[str]:
+        if self.router is None:
+            return None
+        for route in self.router.routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return route.path
+        return None
+
+    def timeout_for(self, scope, route: Optional[str]) -> float:
+        for name, value in scope.get('headers', []):
+            if name == TIMEOUT_HEADER:
+                try:
+                    requested = float(value)
+                except ValueError:
+                    break
+                if requested > 0:
+                    return min(requested, self.max_timeout)
+                break
+        return self.route_timeouts.get(route, self.default_timeout)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        route = self.route_path(scope)
+        timeout = self.timeout_for(scope, route)
+
+        # Read ahead of the app so a client disconnect is seen while the handler still runs
+        messages: asyncio.Queue = asyncio.Queue()
+        disconnected = asyncio.Event()
+
+        async def pump():
+            while True:
+                message = await receive()
+                await messages.put(message)
+                if message['type'] == 'http.disconnect':
+                    disconnected.set()
+                    return
+
+        response_started = False
+        response_sent = False
+
+        async def send_tracked(message: Dict[str, Any]):
+            nonlocal response_started, response_sent
+            if message['type'] == 'http.response.start':
+                response_started = True
+            elif message['type'] == 'http.response.body' and not message.get('more_body', False):
+                response_sent = True
+            await send(message)
+
+        with deadline(timeout):
+            # Tasks copy the current context, so the handler inherits the deadline
+            handler = asyncio.ensure_future(self.app(scope, messages.get, send_tracked))
+        reader = asyncio.ensure_future(pump())
+        watcher = asyncio.ensure_future(disconnected.wait())
+        try:
+            done, _ = await asyncio.wait({handler, watcher}, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            if handler in done or response_sent:
+                # Finished, or only cleanup is left after the response went out
+                await handler
+                return
+
+            reason = 'disconnect' if watcher in done else 'deadline'
+            handler.cancel()
+            try:
+                await handler
+            except (asyncio.CancelledError, Exception):
+                pass
+            http_request_cancellations.inc(route=route or 'unmatched', reason=reason)
+            logger.warning(f"Cancelled {scope['method']} {scope['path']} on {reason} (deadline {timeout:g}s)")
+
+            if reason == 'deadline' and not response_started:
+                body = json.dumps({'detail': f"Request deadline of {timeout:g}s exceeded"}).encode()
+                await send({
+                    'type': 'http.response.start',
+                    'status': 504,
+                    'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())]
+                })
+                await send({'type': 'http.response.body', 'body': body})
+        finally:
+            for task in (handler, reader, watcher):
+                if not task.done():
+                    task.cancel()
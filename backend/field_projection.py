@@ -0,0 +1,111 @@
+"""
+Sparse fieldsets for list endpoints
+Each endpoint declares the fields a client may ask for and a lean default, and a `fields=`
+query parameter is turned into a MongoDB projection so unused fields are never read or sent
+"""
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Set
+
+ALL_FIELDS = ('*', 'all')
+
+
+class FieldSet:
+    """Selectable fields of one kind of document"""
+
+    def __init__(self, name: str, allowed: Iterable[str], default: Iterable[str],
+                 derived: Optional[Mapping[str, Iterable[str]]] = None):
+        self.name = name
+        self.allowed = tuple(allowed)
+        self.default = tuple(default)
+        # computed field -> stored fields it is computed from
+        self.derived = {name: tuple(sources) for name, sources in (derived or {}).items()}
+        unknown = set(self.default) - set(self.allowed)
+        if unknown:
+            raise ValueError(f"Default {name} fields {sorted(unknown)} are not allowed fields")
+
+    def select(self, fields: Optional[str]) -> Set[str]:
+        """Fields named by a comma-separated fields= value, the default when it is empty"""
+        if not fields or not fields.strip():
+            return set(self.default)
+        names = {name.strip() for name in fields.split(',') if name.strip()}
+        if names & set(ALL_FIELDS):
+            return set(self.allowed)
+        unknown = names - set(self.allowed)
+        if unknown:
+            raise ValueError(
+                f"Unknown {self.name} fields: {', '.join(sorted(unknown))}; "
+                f"expected any of {', '.join(self.allowed)}"
+            )
+        return names
+
+    def projection(self, selected: Set[str]) -> Dict[str, int]:
+        """MongoDB projection reading the selected fields and whatever derived ones need"""
+        stored = {source for name in selected for source in self.derived.get(name, (name,))}
+        projection = {name: 1 for name in sorted(stored)}
+        projection['_id'] = 0
+        return projection
+
+    def trim(self, docs: List[Dict[str, Any]], selected: Set[str]) -> List[Dict[str, Any]]:
+        """Drop stored fields that were read only to compute derived ones"""
+        extra = {source for name in selected for source in self.derived.get(name, ())} - selected
+        for doc in docs:
+            for name in extra:
+                doc.pop(name, None)
+        return docs
+
+
+def select_qualified(fields: Optional[str], fieldsets: Mapping[str, FieldSet],
+                     only: Optional[str] = None) -> Dict[str, Set[str]]:
+    """Per-entity selections from 'entity.field' names; bare names apply to the only entity"""
+    requested: Dict[str, list] = {}
+    for name in (fields or '').split(','):
+        name = name.strip()
+        if not name:
+            continue
+        entity, dot, field = name.rpartition('.')
+        if not dot:
+            if only is None:
+                raise ValueError(f"Field {name!r} must be written as entity.field, e.g. tasks.{name}")
+            entity, field = only, name
+        if entity not in fieldsets:
+            raise ValueError(f"Unknown entity {entity!r} in fields; expected any of {', '.join(fieldsets)}")
+        requested.setdefault(entity, []).append(field)
+    return {
+        entity: fieldset.select(','.join(requested.get(entity, [])))
+        for entity, fieldset in fieldsets.items()
+    }
+
+
+TASK_FIELDS = FieldSet(
+    'task',
+    allowed=('task_id', 'title', 'description', 'assigned_agent_id', 'agent_name', 'priority', 'status',
+             'progress', 'stage', 'eta_minutes', 'result', 'result_preview', 'result_size', 'findings',
+             'created_at', 'started_at', 'completed_at'),
+    # What the dashboard task list shows; description and the LLM result only on request
+    default=('task_id', 'title', 'assigned_agent_id', 'agent_name', 'priority', 'status', 'progress',
+             'stage', 'eta_minutes', 'created_at', 'completed_at'),
+    # Results and errors live in the result store; unmigrated tasks still hold them inline
+    derived={'agent_name': ('assigned_agent_id',), 'result': ('result', 'task_id')}
+)
+
+AGENT_FIELDS = FieldSet(
+    'agent',
+    allowed=('agent_id', 'name', 'type', 'status', 'model_provider', 'model_name', 'avatar', 'color',
+             'current_task_id', 'tasks_completed', 'success_rate', 'specialization', 'created_at'),
+    default=('agent_id', 'name', 'type', 'status', 'avatar', 'color', 'specialization')
+)
+
+ACTIVITY_FIELDS = FieldSet(
+    'activity',
+    allowed=('activity_id', 'agent_id', 'agent_name', 'action', 'activity_type', 'timestamp'),
+    default=('activity_id', 'agent_id', 'agent_name', 'action', 'activity_type', 'timestamp'),
+    derived={'agent_name': ('agent_id',)}
+)
+
+MESSAGE_FIELDS = FieldSet(
+    'message',
+    allowed=('message_id', 'from_agent_id', 'to_agent_id', 'message', 'message_type', 'timestamp', 'read'),
+    default=('message_id', 'from_agent_id', 'to_agent_id', 'message', 'message_type', 'timestamp')
+)
+
+SEARCH_FIELDS = {'tasks': TASK_FIELDS, 'agents': AGENT_FIELDS, 'activities': ACTIVITY_FIELDS,
+                 'messages': MESSAGE_FIELDS}
@@ -0,0 +1,89 @@
+"""
+Cached health snapshots for liveness and readiness probes
+A background loop refreshes the system health snapshot, so probes answer from memory
+instead of querying MongoDB on every request
+"""
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class HealthMonitor:
+    """Periodically refreshed health snapshot of this worker"""
+
+    def __init__(self, check: Callable[[], Awaitable[Dict[str, Any]]], refresh_interval: float = 10.0,
+                 max_staleness: float = 60.0):
+        self.check = check
+        self.refresh_interval = refresh_interval
+        self.max_staleness = max_staleness  # older snapshots mean the refresh loop is stuck
+        self.snapshot: Optional[Dict[str, Any]] = None
+        self.refreshed_at: Optional[float] = None
+        self.started_at = time.monotonic()
+        self._task: Optional[asyncio.Task] = None
+        self._stats = {'refreshes': 0, 'refresh_errors': 0, 'last_refresh_ms': None}
+
+    async def refresh(self) -> Dict[str, Any]:
+        """Run the health check now and keep its result as the snapshot"""
+        started = time.perf_counter()
+        try:
+            snapshot = await self.check()
+        except Exception as e:
+            self._stats['refresh_errors'] += 1
+            logger.error(f"Error refreshing health snapshot: {str(e)}")
+            snapshot = {'status': 'unhealthy', 'error': str(e), 'timestamp': datetime.utcnow().isoformat()}
+        self._stats['refreshes'] += 1
+        self._stats['last_refresh_ms'] = round((time.perf_counter() - started) * 1000, 1)
+        self.snapshot = snapshot
+        self.refreshed_at = time.monotonic()
+        return snapshot
+
+    def age(self) -> Optional[float]:
+        return None if self.refreshed_at is None else time.monotonic() - self.refreshed_at
+
+    def live(self) -> Dict[str, Any]:
+        """Liveness: the event loop is serving requests; no I/O"""
+        return {'status': 'alive', 'uptime_s': round(time.monotonic() - self.started_at, 1)}
+
+    def ready(self) -> Tuple[bool, Dict[str, Any]]:
+        """Readiness from the last snapshot: present, fresh and not unhealthy"""
+        age = self.age()
+        if self.snapshot is None:
+            return False, {'status': 'starting', 'reason': 'no health snapshot yet'}
+        body = {
+            'status': self.snapshot.get('status', 'unknown'),
+            'overall_score': self.snapshot.get('overall_score'),
+            'snapshot_age_s': round(age, 1),
+            'checked_at': self.snapshot.get('timestamp')
+        }
+        if age > self.max_staleness:
+            return False, {**body, 'reason': f"health snapshot is {age:.0f}s old"}
+        if body['status'] == 'unhealthy':
+            return False, {**body, 'reason': self.snapshot.get('error', 'system unhealthy')}
+        return True, body
+
+    def start(self):
+        """Start refreshing the snapshot in the background"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await self.refresh()
+            await asyncio.sleep(self.refresh_interval)
+
+    def stats(self) -> Dict[str, Any]:
+        age = self.age()
+        return {**self._stats, 'snapshot_age_s': None if age is None else round(age, 1)}
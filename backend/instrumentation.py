@@ -0,0 +1,245 @@
+"""
+Prometheus-style instrumentation
+Counters, gauges and histograms rendered in the text exposition format, plus a
+PyMongo command listener that times every Mongo command per collection
+"""
+import bisect
+import logging
+import threading
+from abc import ABC, abstractmethod
+from typing import Dict, Iterable, List, Tuple
+
+from pymongo import monitoring
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0)
+LLM_BUCKETS = (0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+
+
+def escape_label(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(names: Iterable[str], values: Iterable, extra: str = '') -> str:
+    pairs = [f'{name}="{escape_label(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric(ABC):
+    """A named metric family with a fixed set of label names"""
+
+    kind = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        # PyMongo listeners run on Motor's executor threads
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple:
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    @abstractmethod
+    def samples(self) -> List[str]:
+        """Exposition lines of every label set"""
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return '\n'.join(lines)
+
+
+class Counter(Metric):
+    """Monotonically increasing count per label set"""
+
+    kind = 'counter'
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return [f"{self.name}{format_labels(self.labelnames, key)} {format_value(value)}" for key, value in values]
+
+
+class Gauge(Counter):
+    """Value that can go up and down per label set"""
+
+    kind = 'gauge'
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    """Cumulative bucket counts, sum and count of observations per label set"""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+        self._values: Dict[Tuple, List] = {}  # key -> [bucket counts, sum, count]
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = [(key, list(counts), total, count) for key, (counts, total, count) in self._values.items()]
+        lines = []
+        for key, counts, total, count in values:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = format_labels(self.labelnames, key, f'le="{format_value(bound)}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Holds metric families and renders them for scraping"""
+
+    CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def _register(self, metric: Metric) -> Metric:
+        existing = self._metrics.get(metric.name)
+        if existing:
+            return existing
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        return '\n'.join(metric.render() for metric in self._metrics.values()) + '\n'
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    """Times every Mongo command by collection and command name"""
+
+    def __init__(self, registry: MetricsRegistry):
+        self.duration = registry.histogram(
+            'mongo_command_duration_seconds', 'MongoDB command latency', ('collection', 'command')
+        )
+        self.failures = registry.counter(
+            'mongo_command_failures_total', 'MongoDB commands that failed', ('collection', 'command')
+        )
+        self._pending: Dict[Tuple, str] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _collection(event) -> str:
+        target = event.command.get(event.command_name)
+        if event.command_name == 'getMore':
+            target = event.command.get('collection')
+        return target if isinstance(target, str) else ''
+
+    def started(self, event):
+        with self._lock:
+            self._pending[(event.connection_id, event.request_id)] = self._collection(event)
+
+    def _finish(self, event) -> str:
+        with self._lock:
+            return self._pending.pop((event.connection_id, event.request_id), '')
+
+    def succeeded(self, event):
+        collection = self._finish(event)
+        self.duration.observe(event.duration_micros / 1e6, collection=collection, command=event.command_name)
+
+    def failed(self, event):
+        collection = self._finish(event)
+        self.duration.observe(event.duration_micros / 1e6, collection=collection, command=event.command_name)
+        self.failures.inc(collection=collection, command=event.command_name)
+
+
+# Global registry shared by the server, agents and job runner
+metrics = MetricsRegistry()
+
+http_request_duration = metrics.histogram(
+    'http_request_duration_seconds', 'HTTP request latency by route template', ('method', 'route', 'status')
+)
+http_request_cancellations = metrics.counter(
+    'http_request_cancellations_total', 'Requests cancelled on deadline or client disconnect', ('route', 'reason')
+)
+llm_request_duration = metrics.histogram(
+    'llm_request_duration_seconds', 'LLM call latency', ('provider', 'model', 'agent'), buckets=LLM_BUCKETS
+)
+llm_request_errors = metrics.counter(
+    'llm_request_errors_total', 'LLM calls that raised', ('provider', 'model', 'agent')
+)
+llm_provider_events = metrics.counter(
+    'llm_provider_events_total', 'LLM failovers, hedges and circuit openings', ('provider', 'event')
+)
+llm_circuit_open = metrics.gauge(
+    'llm_circuit_open', 'Whether the circuit breaker of an LLM provider is open', ('provider',)
+)
+llm_tokens = metrics.counter(
+    'llm_tokens_total', 'LLM tokens sent and received', ('provider', 'model', 'agent', 'direction')
+)
+job_duration = metrics.histogram(
+    'scheduler_job_duration_seconds', 'Scheduled job run duration', ('job', 'status')
+)
+job_skipped = metrics.counter(
+    'scheduler_job_skipped_total', 'Scheduled job runs skipped', ('job', 'reason')
+)
+startup_duration = metrics.gauge(
+    'app_startup_phase_seconds', 'Duration of each startup phase of this worker', ('phase',)
+)
+socketio_connected_clients = metrics.gauge(
+    'socketio_connected_clients', 'Socket.IO clients connected to this worker'
+)
+socketio_connections = metrics.counter(
+    'socketio_connections_total', 'Socket.IO connects and disconnects', ('event',)
+)
+socketio_emits = metrics.counter(
+    'socketio_emits_total', 'Socket.IO frames emitted to clients', ('event',)
+)
+socketio_evictions = metrics.counter(
+    'socketio_evictions_total', 'Slow Socket.IO clients disconnected'
+)
+
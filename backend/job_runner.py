@@ -0,0 +1,200 @@
+"""
+Scheduled job runner
+Applies each job's writes as one bulk_write, prevents overlapping runs, elects a
+single leader across workers and records per-run timing and row counts
+"""
+import logging
+import os
+import socket
+import time
+import uuid
+from collections import defaultdict, deque
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from instrumentation import job_duration, job_skipped
+
+logger = logging.getLogger(__name__)
+
+LEADER_LOCK_ID = 'scheduler-leader'
+MIGRATION_MARKER = 'migration:{}'  # system_state _id recording a completed one-time migration
+
+
+class JobResult:
+    """Writes produced by one job run"""
+
+    def __init__(self, writes: Optional[Dict[str, List[Any]]] = None, rows: int = 0,
+                 after_commit: Optional[Callable[[], Awaitable[None]]] = None):
+        self.writes = writes or {}  # collection -> pymongo write operations
+        self.rows = rows  # rows written outside the bulk writes (e.g. write-behind)
+        self.after_commit = after_commit  # e.g. broadcasts, run once the writes succeeded
+
+
+class JobRunner:
+    """Runs scheduler jobs with overlap protection, leader election and metrics"""
+
+    def __init__(self, db, scheduler, lease_seconds: int = 60, leader_lock: bool = True,
+                 writer=None, history_size: int = 50):
+        self.db = db
+        self.scheduler = scheduler
+        self.lease = timedelta(seconds=lease_seconds)
+        self.leader_lock = leader_lock
+        self.writer = writer
+        self.owner_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+        self.is_leader = not leader_lock
+        self._jobs: Dict[str, Callable[[], Awaitable[Optional[JobResult]]]] = {}
+        self._running = set()
+        self._migrated = set()
+        self._history: Dict[str, deque] = defaultdict(lambda: deque(maxlen=history_size))
+        self._counters: Dict[str, Dict[str, int]] = defaultdict(
+            lambda: {'runs': 0, 'failures': 0, 'rows': 0, 'skipped_overlap': 0, 'skipped_not_leader': 0}
+        )
+
+    def add_job(self, name: str, func: Callable[[], Awaitable[Optional[JobResult]]], **trigger):
+        """Register a job on the scheduler with an interval trigger"""
+        self._jobs[name] = func
+        self.scheduler.add_job(
+            self.run, 'interval', args=[name], id=name,
+            max_instances=1, coalesce=True, replace_existing=True, **trigger
+        )
+
+    def add_migration(self, name: str, func: Callable[[], Awaitable[int]], version: int = 1, **trigger):
+        """Register a one-time migration; the leader retries it until one run completes"""
+        async def migrate() -> Optional[JobResult]:
+            if name in self._migrated:
+                return None
+            marker_id = MIGRATION_MARKER.format(name)
+            marker = await self.db.system_state.find_one({'_id': marker_id}, {'version': 1})
+            if not marker or marker.get('version', 0) < version:
+                rows = await func() or 0
+                await self.db.system_state.update_one(
+                    {'_id': marker_id},
+                    {'$set': {'version': version, 'rows': rows, 'owner': self.owner_id,
+                              'completed_at': datetime.utcnow()}},
+                    upsert=True
+                )
+                logger.info(f"Migration {name} v{version} completed ({rows} rows)")
+            else:
+                rows = 0
+            # Later runs on this worker return without a query
+            self._migrated.add(name)
+            return JobResult(rows=rows)
+
+        self.add_job(name, migrate, **(trigger or {'seconds': 30}))
+
+    def start(self):
+        """Start the scheduler, renewing the leader lease well before it expires"""
+        if self.leader_lock:
+            self.scheduler.add_job(
+                self.renew_leadership, 'interval',
+                seconds=max(1, int(self.lease.total_seconds() / 3)),
+                id='scheduler-leader-lease', max_instances=1, coalesce=True,
+                replace_existing=True, next_run_time=datetime.now()
+            )
+        self.scheduler.start()
+
+    async def shutdown(self):
+        """Stop the scheduler and hand leadership to another worker"""
+        self.scheduler.shutdown()
+        if self.leader_lock and self.is_leader:
+            try:
+                await self.db.scheduler_locks.delete_one({'_id': LEADER_LOCK_ID, 'owner': self.owner_id})
+            except Exception as e:
+                logger.error(f"Error releasing scheduler leadership: {str(e)}")
+        self.is_leader = not self.leader_lock
+
+    async def renew_leadership(self) -> bool:
+        """Acquire or extend the leader lease; only the leader runs jobs"""
+        if not self.leader_lock:
+            return True
+        now = datetime.utcnow()
+        try:
+            lock = await self.db.scheduler_locks.find_one_and_update(
+                {'_id': LEADER_LOCK_ID, '$or': [{'owner': self.owner_id}, {'expires_at': {'$lt': now}}]},
+                {'$set': {'owner': self.owner_id, 'expires_at': now + self.lease, 'renewed_at': now}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+            leader = bool(lock and lock.get('owner') == self.owner_id)
+        except DuplicateKeyError:
+            leader = False  # Another worker holds a live lease
+        except Exception as e:
+            logger.error(f"Error renewing scheduler leadership: {str(e)}")
+            leader = False
+
+        if leader != self.is_leader:
+            logger.info(f"Scheduler leadership {'acquired' if leader else 'lost'} by {self.owner_id}")
+        self.is_leader = leader
+        return leader
+
+    async def run(self, name: str):
+        """Run one job now unless it is already running or this worker is not leader"""
+        counters = self._counters[name]
+        if name in self._running:
+            counters['skipped_overlap'] += 1
+            job_skipped.inc(job=name, reason='overlap')
+            return
+        if self.leader_lock and not self.is_leader:
+            counters['skipped_not_leader'] += 1
+            job_skipped.inc(job=name, reason='not_leader')
+            return
+
+        self._running.add(name)
+        started_at = datetime.utcnow()
+        started = time.perf_counter()
+        record = {'job': name, 'owner': self.owner_id, 'started_at': started_at, 'status': 'success', 'rows': 0}
+        try:
+            result = await self._jobs[name]() or JobResult()
+            record['rows'] = result.rows + await self._apply_writes(result.writes)
+            if result.after_commit:
+                await result.after_commit()
+        except Exception as e:
+            record['status'] = 'failed'
+            record['error'] = str(e)
+            counters['failures'] += 1
+            logger.error(f"Error running job {name}: {str(e)}")
+        finally:
+            self._running.discard(name)
+
+        elapsed = time.perf_counter() - started
+        record['duration_ms'] = round(elapsed * 1000, 2)
+        job_duration.observe(elapsed, job=name, status=record['status'])
+        counters['runs'] += 1
+        counters['rows'] += record['rows']
+        self._history[name].append(record)
+        if self.writer:
+            await self.writer.enqueue('job_runs', dict(record))
+
+    async def _apply_writes(self, writes: Dict[str, List[Any]]) -> int:
+        """Execute each collection's operations as a single bulk_write"""
+        rows = 0
+        for collection, operations in writes.items():
+            if not operations:
+                continue
+            result = await self.db[collection].bulk_write(operations, ordered=False)
+            rows += result.inserted_count + result.modified_count + result.upserted_count + result.deleted_count
+        return rows
+
+    def stats(self) -> Dict[str, Any]:
+        """Per-job run counts, durations and recent runs"""
+        jobs = {}
+        for name in self._jobs:
+            history = list(self._history[name])
+            durations = [run['duration_ms'] for run in history]
+            jobs[name] = {
+                **self._counters[name],
+                'running': name in self._running,
+                'avg_duration_ms': round(sum(durations) / len(durations), 2) if durations else 0,
+                'max_duration_ms': max(durations) if durations else 0,
+                'last_run': history[-1] if history else None
+            }
+        return {
+            'owner_id': self.owner_id,
+            'leader_lock': self.leader_lock,
+            'is_leader': self.is_leader,
+            'jobs': jobs
+        }
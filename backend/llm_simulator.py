@@ -0,0 +1,310 @@
+"""
+LLM provider backends: live, simulated, record and replay
+The simulator mimics LlmChat with per-provider latency profiles, token streaming and
+error injection, so orchestration can be load-tested offline and reproducibly
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import os
+import random
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+LLM_BACKENDS = ('live', 'simulated', 'record', 'replay')
+
+# Time to first token is log-normal around its median; output is streamed at a steady rate
+LATENCY_PROFILES: Dict[str, Dict[str, float]] = {
+    'openai': {
+        'ttft_median_s': 1.2, 'ttft_sigma': 0.5, 'tokens_per_second': 60,
+        'output_tokens_mean': 380, 'output_tokens_sd': 120, 'error_rate': 0.01
+    },
+    'anthropic': {
+        'ttft_median_s': 0.9, 'ttft_sigma': 0.45, 'tokens_per_second': 70,
+        'output_tokens_mean': 420, 'output_tokens_sd': 140, 'error_rate': 0.01
+    },
+    'gemini': {
+        'ttft_median_s': 0.8, 'ttft_sigma': 0.6, 'tokens_per_second': 90,
+        'output_tokens_mean': 350, 'output_tokens_sd': 130, 'error_rate': 0.015
+    }
+}
+DEFAULT_PROFILE = LATENCY_PROFILES['openai']
+
+# Injected failures and their share of all injected errors
+ERROR_KINDS = (('rate_limit', 0.5), ('timeout', 0.2), ('server_error', 0.3))
+
+TOKENS_PER_CHUNK = 4
+
+VOCABULARY = (
+    "analysis risk threat vulnerability mitigation control finding severity exposure patch "
+    "configuration endpoint authentication encryption policy compliance audit recommendation "
+    "network service dependency deployment monitoring incident access token certificate "
+    "baseline remediation priority impact evidence scope review architecture module"
+).split()
+
+
+class UserMessage:
+    """Prompt for the offline backends, shaped like emergentintegrations' UserMessage"""
+
+    def __init__(self, text: str):
+        self.text = text
+
+
+class SimulatedLlmError(Exception):
+    """Failure injected by the simulator, shaped like a provider error"""
+
+    def __init__(self, kind: str, provider: str):
+        self.kind = kind
+        self.provider = provider
+        super().__init__(f"Simulated {provider} {kind.replace('_', ' ')}")
+
+
+class SimulatorConfig:
+    """Simulator settings read from the environment"""
+
+    def __init__(self):
+        self.seed = int(os.environ.get('LLM_SIMULATOR_SEED', '42'))
+        # 0 skips the sleeps entirely; 0.1 runs ten times faster than the profiles
+        self.time_scale = float(os.environ.get('LLM_SIMULATOR_TIME_SCALE', '1.0'))
+        error_rate = os.environ.get('LLM_SIMULATOR_ERROR_RATE')
+        self.error_rate = float(error_rate) if error_rate is not None else None
+        self.recordings_path = Path(os.environ.get(
+            'LLM_RECORDINGS_PATH', str(Path(__file__).parent / 'llm_recordings.jsonl')
+        ))
+        self.replay_miss = os.environ.get('LLM_REPLAY_MISS', 'simulate')  # simulate | error
+        self.profiles = {name: dict(profile) for name, profile in LATENCY_PROFILES.items()}
+        overrides = os.environ.get('LLM_SIMULATOR_PROFILES')
+        if overrides:
+            # JSON file of {provider: {setting: value}} merged over the defaults
+            with open(overrides) as f:
+                for name, profile in json.load(f).items():
+                    self.profiles.setdefault(name, dict(DEFAULT_PROFILE)).update(profile)
+
+    def profile(self, provider: str) -> Dict[str, float]:
+        return self.profiles.get(provider, DEFAULT_PROFILE)
+
+
+_config: Optional[SimulatorConfig] = None
+
+
+def simulator_config() -> SimulatorConfig:
+    """Process-wide simulator settings, read once"""
+    global _config
+    if _config is None:
+        _config = SimulatorConfig()
+    return _config
+
+
+class SimulatedLlmChat:
+    """Drop-in for LlmChat that synthesizes responses with realistic timing"""
+
+    # Calls per prompt, so repeated prompts differ but a rerun replays the same sequence
+    _occurrences: Dict[str, int] = defaultdict(int)
+    _lock = threading.Lock()
+
+    def __init__(self, api_key: Optional[str] = None, session_id: Optional[str] = None,
+                 system_message: str = "", config: Optional[SimulatorConfig] = None):
+        self.session_id = session_id
+        self.system_message = system_message or ""
+        self.config = config or simulator_config()
+        self.provider = 'openai'
+        self.model = 'gpt-5'
+
+    def with_model(self, provider: str, model: str) -> 'SimulatedLlmChat':
+        self.provider = provider
+        self.model = model
+        return self
+
+    def _rng(self, text: str) -> random.Random:
+        key = hashlib.sha256(
+            f"{self.config.seed}|{self.provider}|{self.model}|{self.system_message}|{text}".encode()
+        ).hexdigest()
+        with self._lock:
+            occurrence = self._occurrences[key]
+            self._occurrences[key] += 1
+        return random.Random(f"{key}:{occurrence}")
+
+    def plan(self, text: str) -> Dict[str, Any]:
+        """Decide latency, output and any injected error for one call"""
+        rng = self._rng(text)
+        profile = self.config.profile(self.provider)
+        error_rate = self.config.error_rate if self.config.error_rate is not None else profile['error_rate']
+
+        error = None
+        if rng.random() < error_rate:
+            roll, cumulative = rng.random(), 0.0
+            for kind, share in ERROR_KINDS:
+                cumulative += share
+                if roll < cumulative:
+                    error = kind
+                    break
+
+        output_tokens = max(20, int(rng.gauss(profile['output_tokens_mean'], profile['output_tokens_sd'])))
+        return {
+            'ttft': math.exp(math.log(profile['ttft_median_s']) + profile['ttft_sigma'] * rng.gauss(0, 1)),
+            'token_interval': 1 / profile['tokens_per_second'],
+            'tokens': self._synthesize(rng, text, output_tokens),
+            'error': error,
+            'error_at': rng.uniform(0.2, 0.8)  # fraction streamed before a server_error
+        }
+
+    def _synthesize(self, rng: random.Random, text: str, count: int) -> List[str]:
+        topic = " ".join(text.split()[:8])
+        tokens = f"[{self.provider}/{self.model}] Regarding {topic}:".split()
+        while len(tokens) < count:
+            sentence = rng.sample(VOCABULARY, rng.randint(6, 12))
+            sentence[0] = sentence[0].capitalize()
+            sentence[-1] += "."
+            tokens.extend(sentence)
+        return [token + " " for token in tokens[:count]]
+
+    async def _sleep(self, seconds: float):
+        if self.config.time_scale > 0:
+            await asyncio.sleep(seconds * self.config.time_scale)
+
+    async def stream_message(self, user_message) -> AsyncIterator[str]:
+        """Yield the response in chunks of a few tokens as a provider stream would"""
+        plan = self.plan(user_message.text)
+        if plan['error'] == 'rate_limit':
+            await self._sleep(0.05)
+            raise SimulatedLlmError('rate_limit', self.provider)
+        if plan['error'] == 'timeout':
+            await self._sleep(plan['ttft'] * 3)
+            raise SimulatedLlmError('timeout', self.provider)
+
+        await self._sleep(plan['ttft'])
+        tokens = plan['tokens']
+        fail_at = int(len(tokens) * plan['error_at']) if plan['error'] == 'server_error' else None
+        for start in range(0, len(tokens), TOKENS_PER_CHUNK):
+            if fail_at is not None and start >= fail_at:
+                raise SimulatedLlmError('server_error', self.provider)
+            chunk = tokens[start:start + TOKENS_PER_CHUNK]
+            await self._sleep(plan['token_interval'] * len(chunk))
+            yield "".join(chunk)
+
+    async def send_message(self, user_message) -> str:
+        """Complete response, after the full simulated generation time"""
+        chunks = [chunk async for chunk in self.stream_message(user_message)]
+        return "".join(chunks).strip()
+
+
+class RecordingLlmChat:
+    """Live LlmChat that appends every prompt, response and latency to a JSONL file"""
+
+    _write_lock = threading.Lock()
+
+    def __init__(self, api_key: Optional[str] = None, session_id: Optional[str] = None,
+                 system_message: str = "", config: Optional[SimulatorConfig] = None):
+        from emergentintegrations.llm.chat import LlmChat
+        self.config = config or simulator_config()
+        self.system_message = system_message or ""
+        self.chat = LlmChat(api_key=api_key, session_id=session_id, system_message=system_message)
+        self.provider = None
+        self.model = None
+
+    def with_model(self, provider: str, model: str) -> 'RecordingLlmChat':
+        self.provider = provider
+        self.model = model
+        self.chat = self.chat.with_model(provider, model)
+        return self
+
+    async def send_message(self, user_message) -> str:
+        started = time.perf_counter()
+        response = await self.chat.send_message(user_message)
+        record = {
+            'provider': self.provider,
+            'model': self.model,
+            'system_message': self.system_message,
+            'message': user_message.text,
+            'response': response,
+            'latency_ms': round((time.perf_counter() - started) * 1000, 2),
+            'recorded_at': datetime.utcnow().isoformat()
+        }
+        with self._write_lock:
+            with open(self.config.recordings_path, 'a') as f:
+                f.write(json.dumps(record) + "\n")
+        return response
+
+
+class ReplayLlmChat(SimulatedLlmChat):
+    """Serves recorded responses with their recorded latency, streamed token by token"""
+
+    _recordings: Dict[str, Dict[Tuple, List[Dict[str, Any]]]] = {}
+
+    @classmethod
+    def recordings(cls, path: Path) -> Dict[Tuple, List[Dict[str, Any]]]:
+        key = str(path)
+        if key not in cls._recordings:
+            index = defaultdict(list)
+            if path.exists():
+                with open(path) as f:
+                    for line in f:
+                        if line.strip():
+                            record = json.loads(line)
+                            index[(record['provider'], record['model'], record['system_message'],
+                                   record['message'])].append(record)
+            else:
+                logger.warning(f"No LLM recordings at {path}; every prompt is a replay miss")
+            cls._recordings[key] = index
+        return cls._recordings[key]
+
+    async def stream_message(self, user_message) -> AsyncIterator[str]:
+        recorded = self.recordings(self.config.recordings_path).get(
+            (self.provider, self.model, self.system_message, user_message.text)
+        )
+        if not recorded:
+            if self.config.replay_miss == 'error':
+                raise LookupError(f"No recorded {self.provider}/{self.model} response for prompt")
+            async for chunk in super().stream_message(user_message):
+                yield chunk
+            return
+
+        # Cycle through repeated recordings of the same prompt
+        key = f"replay|{self.provider}|{self.model}|{self.system_message}|{user_message.text}"
+        with self._lock:
+            occurrence = self._occurrences[key]
+            self._occurrences[key] += 1
+        record = recorded[occurrence % len(recorded)]
+
+        tokens = [token + " " for token in record['response'].split(" ")]
+        per_chunk = record['latency_ms'] / 1000 / max(1, math.ceil(len(tokens) / TOKENS_PER_CHUNK))
+        for start in range(0, len(tokens), TOKENS_PER_CHUNK):
+            await self._sleep(per_chunk)
+            yield "".join(tokens[start:start + TOKENS_PER_CHUNK])
+
+
+def llm_backend() -> str:
+    backend = os.environ.get('LLM_BACKEND', 'live')
+    if backend not in LLM_BACKENDS:
+        raise ValueError(f"Unknown LLM_BACKEND {backend!r}; expected one of {', '.join(LLM_BACKENDS)}")
+    return backend
+
+
+def create_llm_chat(api_key: Optional[str], session_id: str, system_message: str):
+    """LlmChat for the configured LLM_BACKEND"""
+    backend = llm_backend()
+    if backend == 'simulated':
+        return SimulatedLlmChat(api_key=api_key, session_id=session_id, system_message=system_message)
+    if backend == 'replay':
+        return ReplayLlmChat(api_key=api_key, session_id=session_id, system_message=system_message)
+    if backend == 'record':
+        return RecordingLlmChat(api_key=api_key, session_id=session_id, system_message=system_message)
+    from emergentintegrations.llm.chat import LlmChat
+    return LlmChat(api_key=api_key, session_id=session_id, system_message=system_message)
+
+
+def create_user_message(text: str):
+    """UserMessage for the configured LLM_BACKEND; offline backends need no provider SDK"""
+    if llm_backend() in ('simulated', 'replay'):
+        return UserMessage(text=text)
+    # Imported on first use: it loads every provider SDK, which dominates cold start
+    from emergentintegrations.llm.chat import UserMessage as LiveUserMessage
+    return LiveUserMessage(text=text)
@@ -7,8 +7,25 @@ from datetime import datetime, timedelta
 from typing import Dict, Any, List
 import logging
 
+from task_queries import task_filter
+
 logger = logging.getLogger(__name__)
 
+# Task fields the metrics read; result text stays in the result store
+TASK_METRIC_FIELDS = {'_id': 0, 'status': 1, 'created_at': 1, 'completed_at': 1, 'findings': 1}
+
+def stuck_tasks_filter(now: datetime) -> Dict[str, Any]:
+    """Tasks in progress for more than two hours"""
+    return {'status': 'in_progress', 'created_at': {'$lt': now - timedelta(hours=2)}}
+
+def recent_errors_filter(now: datetime) -> Dict[str, Any]:
+    """Error logs from the last hour"""
+    return {'timestamp': {'$gte': now - timedelta(hours=1)}}
+
+def deployments_filter(today: datetime) -> Dict[str, Any]:
+    """Deployment tasks completed since the start of today"""
+    return {'title': {'$regex': 'deploy', '$options': 'i'}, 'completed_at': {'$gte': today}, 'status': 'completed'}
+
 class MetricsEngine:
     """Real-time metrics calculation from actual system data"""
     
@@ -21,7 +38,7 @@ class MetricsEngine:
             # Get all security-related tasks
             security_tasks = await self.db.tasks.find({
                 'title': {'$regex': 'security|vulnerability|scan|threat', '$options': 'i'}
-            }).to_list(1000)
+            }, TASK_METRIC_FIELDS).to_list(1000)
             
             # Get all activities related to security
             security_activities = await self.db.activities.find({
@@ -34,12 +51,10 @@ class MetricsEngine:
             
             for task in security_tasks:
                 if task.get('status') == 'completed':
-                    result = task.get('result', '')
-                    # Count vulnerabilities mentioned in results
-                    vuln_count = result.lower().count('vulnerability')
-                    vulnerabilities_found += vuln_count
-                    if 'fixed' in result.lower() or 'resolved' in result.lower():
-                        vulnerabilities_fixed += vuln_count
+                    # Extracted from the result when the task completed
+                    findings = task.get('findings') or {}
+                    vulnerabilities_found += findings.get('vulnerabilities', 0)
+                    vulnerabilities_fixed += findings.get('fixed', 0)
             
             # Calculate threats blocked
             threats_blocked = len([a for a in security_activities 
@@ -58,9 +73,9 @@ class MetricsEngine:
                 response_times = [(t['completed_at'] - t['created_at']).total_seconds() 
                                 for t in completed_tasks]
                 avg_response = sum(response_times) / len(response_times)
-                avg_response_str = f\"{avg_response:.1f}s\"
+                avg_response_str = f"{avg_response:.1f}s"
             else:
-                avg_response_str = \"0.0s\"
+                avg_response_str = "0.0s"
             
             # Calculate security score based on multiple factors
             total_tasks = len(security_tasks)
@@ -84,7 +99,7 @@ class MetricsEngine:
             }
             
         except Exception as e:
-            logger.error(f\"Error calculating security metrics: {str(e)}\")
+            logger.error(f"Error calculating security metrics: {str(e)}")
             return {
                 'vulnerabilitiesFound': 0,
                 'vulnerabilitiesFixed': 0,
@@ -115,11 +130,7 @@ class MetricsEngine:
             
             # Deployments today
             today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
-            deployments_today = await self.db.tasks.count_documents({
-                'title': {'$regex': 'deploy', '$options': 'i'},
-                'completed_at': {'$gte': today},
-                'status': 'completed'
-            })
+            deployments_today = await self.db.tasks.count_documents(deployments_filter(today))
             
             # Calculate test coverage from project data
             if projects:
@@ -150,7 +161,7 @@ class MetricsEngine:
             }
             
         except Exception as e:
-            logger.error(f\"Error calculating development metrics: {str(e)}\")
+            logger.error(f"Error calculating development metrics: {str(e)}")
             return {
                 'projectsCompleted': 0,
                 'codeReviews': 0,
@@ -162,12 +173,10 @@ class MetricsEngine:
             }
     
     async def calculate_agent_efficiency(self, agent_id: str) -> Dict[str, Any]:
-        \"\"\"Calculate individual agent efficiency metrics\"\"\"
+        """Calculate individual agent efficiency metrics"""
         try:
             # Get agent's tasks
-            agent_tasks = await self.db.tasks.find({
-                'assigned_agent_id': agent_id
-            }).to_list(1000)
+            agent_tasks = await self.db.tasks.find(task_filter(agent_id=agent_id), TASK_METRIC_FIELDS).to_list(1000)
             
             if not agent_tasks:
                 return {
@@ -196,8 +205,7 @@ class MetricsEngine:
             # Quality score based on task results
             quality_indicators = 0
             for task in completed:
-                result = task.get('result', '').lower()
-                if any(word in result for word in ['excellent', 'comprehensive', 'thorough', 'detailed']):
+                if (task.get('findings') or {}).get('quality_indicators'):
                     quality_indicators += 1
             
             quality_score = (quality_indicators / len(completed) * 100) if completed else 0
@@ -211,7 +219,7 @@ class MetricsEngine:
             }
             
         except Exception as e:
-            logger.error(f\"Error calculating agent efficiency: {str(e)}\")
+            logger.error(f"Error calculating agent efficiency: {str(e)}")
             return {
                 'efficiency_score': 0,
                 'avg_completion_time': 0,
@@ -219,27 +227,22 @@ class MetricsEngine:
             }
     
     async def get_system_health(self) -> Dict[str, Any]:
-        \"\"\"Get comprehensive system health metrics\"\"\"
+        """Get comprehensive system health metrics"""
         try:
             # Database health
             await self.db.command('ping')
             db_healthy = True
             
             # Task processing health
-            pending_tasks = await self.db.tasks.count_documents({'status': 'pending'})
-            stuck_tasks = await self.db.tasks.count_documents({
-                'status': 'in_progress',
-                'created_at': {'$lt': datetime.utcnow() - timedelta(hours=2)}
-            })
+            pending_tasks = await self.db.tasks.count_documents(task_filter(status='pending'))
+            stuck_tasks = await self.db.tasks.count_documents(stuck_tasks_filter(datetime.utcnow()))
             
             # Agent health
-            agents = await self.db.agents.find({}).to_list(100)
+            agents = await self.db.agents.find({}, {'_id': 0, 'status': 1}).to_list(100)
             active_agents = len([a for a in agents if a.get('status') == 'active'])
             
             # Recent errors
-            error_logs = await self.db.error_logs.count_documents({
-                'timestamp': {'$gte': datetime.utcnow() - timedelta(hours=1)}
-            })
+            error_logs = await self.db.error_logs.count_documents(recent_errors_filter(datetime.utcnow()))
             
             # Calculate overall health score
             health_factors = {
@@ -263,7 +266,7 @@ class MetricsEngine:
             }
             
         except Exception as e:
-            logger.error(f\"Error getting system health: {str(e)}\")
+            logger.error(f"Error getting system health: {str(e)}")
             return {
                 'status': 'unhealthy',
                 'overall_score': 0,
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import Any, Dict, List, Literal, Optional, Union, get_args
 from datetime import datetime
 import uuid
 
@@ -33,11 +33,13 @@ class Task(BaseModel):
     priority: str
     status: str = "pending"  # pending, in_progress, completed, failed
     progress: int = 0
+    stage: str = "queued"  # queued, prompt_sent, streaming, response_received, result_stored, persisted
     eta_minutes: int = 0
     result: Optional[str] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
     started_at: Optional[datetime] = None
     completed_at: Optional[datetime] = None
+    failed_at: Optional[datetime] = None
 
 # Hive Mind Message Models
 class HiveMessage(BaseModel):
@@ -91,4 +93,22 @@ class ChatMessage(BaseModel):
 class ChatResponse(BaseModel):
     response: str
     agent_name: str
+    session_id: Optional[str] = None
     timestamp: datetime = Field(default_factory=datetime.utcnow)
+
+# Compliance Models
+# Standards with rules in security_engine.SecurityAnalyzer.COMPLIANCE_RULES
+ComplianceStandard = Literal['GDPR', 'HIPAA', 'SOC2', 'ISO27001']
+COMPLIANCE_STANDARDS = list(get_args(ComplianceStandard))
+
+class ComplianceCheck(BaseModel):
+    config: Optional[Dict[str, Any]] = None  # setting name -> value; null is no settings
+    standards: List[ComplianceStandard] = Field(default_factory=lambda: list(COMPLIANCE_STANDARDS))
+
+class ComplianceHost(BaseModel):
+    host_id: Optional[Union[str, int]] = None
+    config: Optional[Dict[str, Any]] = None
+
+class ComplianceBatch(BaseModel):
+    hosts: List[ComplianceHost] = Field(min_length=1)
+    standards: List[ComplianceStandard] = Field(default_factory=lambda: list(COMPLIANCE_STANDARDS))
@@ -0,0 +1,183 @@
+"""
+Socket.IO client manager that relays events between workers through MongoDB
+Tails a capped collection so several uvicorn workers share one broadcast bus; messages
+carry a sequence number from a shared counter so a reopened cursor resumes without gaps
+"""
+import asyncio
+import logging
+import time
+import uuid
+from collections import OrderedDict, deque
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from socketio.async_pubsub_manager import AsyncPubSubManager
+from pymongo import CursorType, ReturnDocument
+from pymongo.errors import CollectionInvalid
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncMongoManager(AsyncPubSubManager):
+    """Pub/sub client manager backed by a MongoDB capped collection"""
+
+    name = 'asyncmongo'
+
+    def __init__(self, db, channel: str = 'socketio', capped_size: int = 16 * 1024 * 1024,
+                 capped_max: int = 10000, poll_interval: float = 0.1,
+                 dedupe_window: int = 5000, write_only: bool = False):
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+        self.db = db
+        self.collection_name = f"{channel}_bus"
+        self.capped_size = capped_size
+        self.capped_max = capped_max
+        self.poll_interval = poll_interval
+        self.dedupe_window = dedupe_window
+
+        # Raw event batches from other workers, routed locally by the receiver
+        self.relay_handler: Optional[Callable[[List[Dict[str, Any]]], Awaitable[None]]] = None
+
+        self._collection_ready = False
+        # Every sequence number up to the watermark was received; later ones seen out of order
+        self._watermark = 0
+        self._ahead = set()
+        self._seen_events = OrderedDict()
+        self._latencies_ms = deque(maxlen=1000)
+        self._stats = {'published': 0, 'received': 0, 'duplicates': 0, 'publish_errors': 0}
+
+    @property
+    def collection(self):
+        return self.db[self.collection_name]
+
+    @property
+    def sequence_id(self) -> str:
+        return f"{self.collection_name}_seq"  # counter document in system_state
+
+    async def _ensure_collection(self):
+        """Create the capped collection on first use"""
+        if self._collection_ready:
+            return
+        try:
+            await self.db.create_collection(
+                self.collection_name, capped=True, size=self.capped_size, max=self.capped_max
+            )
+        except CollectionInvalid:
+            pass  # Already created by another worker
+        self._collection_ready = True
+
+    async def _publish(self, data: Dict[str, Any]):
+        """Append a message to the capped collection"""
+        try:
+            await self._ensure_collection()
+            counter = await self.db.system_state.find_one_and_update(
+                {'_id': self.sequence_id}, {'$inc': {'seq': 1}},
+                upsert=True, return_document=ReturnDocument.AFTER
+            )
+            await self.collection.insert_one({
+                'seq': counter['seq'],
+                'event_id': uuid.uuid4().hex,
+                'host_id': self.host_id,
+                'published_at': time.time(),
+                'message': data
+            })
+            self._stats['published'] += 1
+        except Exception as e:
+            self._stats['publish_errors'] += 1
+            logger.error(f"Error publishing to {self.collection_name}: {str(e)}")
+
+    async def relay(self, events: List[Dict[str, Any]]):
+        """Publish a batch of update events for other workers to deliver"""
+        await self._publish({'method': 'relay', 'events': events, 'host_id': self.host_id})
+
+    async def _listen(self):
+        """Tail the capped collection and yield messages from other workers"""
+        await self._ensure_collection()
+
+        # Only relay messages published after this worker started listening
+        counter = await self.db.system_state.find_one({'_id': self.sequence_id})
+        self._watermark = counter['seq'] if counter else 0
+        self._ahead.clear()
+
+        while True:
+            # Workers insert in a different order than they draw sequence numbers, and
+            # ObjectIds are not monotonic across hosts, so resume from the first gap
+            cursor = self.collection.find(
+                {'seq': {'$gt': self._watermark}}, cursor_type=CursorType.TAILABLE_AWAIT
+            )
+            while cursor.alive:
+                async for doc in cursor:
+                    if not self._advance(doc['seq']):
+                        self._stats['duplicates'] += 1
+                        continue
+                    message = self._accept(doc)
+                    if message is None:
+                        continue
+                    if message.get('method') == 'relay':
+                        await self._handle_relay(message)
+                        continue
+                    yield message
+                await asyncio.sleep(self.poll_interval)
+            # Cursor dies on an empty collection or after a capped rollover
+            await asyncio.sleep(self.poll_interval)
+
+    def _advance(self, seq: int) -> bool:
+        """Record a received sequence number; False if it was already received"""
+        if seq <= self._watermark or seq in self._ahead:
+            return False
+        self._ahead.add(seq)
+        if len(self._ahead) > self.dedupe_window:
+            # A publish that drew a number but never inserted leaves a gap; stop waiting for it
+            self._watermark = min(self._ahead) - 1
+        while self._watermark + 1 in self._ahead:
+            self._watermark += 1
+            self._ahead.discard(self._watermark)
+        return True
+
+    async def _handle_relay(self, message: Dict[str, Any]):
+        if not self.relay_handler:
+            return
+        try:
+            await self.relay_handler(message.get('events') or [])
+        except Exception as e:
+            logger.error(f"Error delivering relayed events: {str(e)}")
+
+    def _accept(self, doc: Dict[str, Any]):
+        """Deduplicate a bus document and record its fan-out latency"""
+        if doc.get('host_id') == self.host_id:
+            return None
+
+        event_id = doc.get('event_id')
+        if event_id in self._seen_events:
+            self._stats['duplicates'] += 1
+            return None
+        self._seen_events[event_id] = True
+        if len(self._seen_events) > self.dedupe_window:
+            self._seen_events.popitem(last=False)
+
+        self._stats['received'] += 1
+        published_at = doc.get('published_at')
+        if published_at:
+            self._latencies_ms.append(max(0.0, (time.time() - published_at) * 1000))
+        return doc.get('message')
+
+    def stats(self) -> Dict[str, Any]:
+        """Bus throughput, deduplication and fan-out latency"""
+        latencies = sorted(self._latencies_ms)
+
+        def percentile(p):
+            if not latencies:
+                return 0
+            return round(latencies[min(len(latencies) - 1, int(len(latencies) * p))], 2)
+
+        return {
+            'backend': self.name,
+            'host_id': self.host_id,
+            'collection': self.collection_name,
+            'sequence': {'watermark': self._watermark, 'ahead': len(self._ahead)},
+            **self._stats,
+            'fanout_latency_ms': {
+                'p50': percentile(0.5),
+                'p95': percentile(0.95),
+                'max': round(latencies[-1], 2) if latencies else 0,
+                'samples': len(latencies)
+            }
+        }
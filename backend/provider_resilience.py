@@ -0,0 +1,227 @@
+"""
+LLM provider failover and hedged requests
+Per-provider circuit breakers skip providers that keep failing, calls fall back along a
+configured model chain, and a slow call can be hedged with a second provider
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import deadlines
+from deadlines import DeadlineExceeded
+from instrumentation import llm_circuit_open, llm_provider_events
+
+logger = logging.getLogger(__name__)
+
+# Every model an agent may fall back to, in order of preference
+DEFAULT_FALLBACK_MODELS = "openai:gpt-5,anthropic:claude-4-sonnet-20250514,gemini:gemini-2.5-pro"
+
+LATENCY_WINDOW = 200
+MIN_LATENCY_SAMPLES = 20
+
+
+def parse_models(spec: str) -> List[Tuple[str, str]]:
+    """'provider:model,provider:model' as a list of pairs"""
+    models = []
+    for entry in spec.split(','):
+        if entry.strip():
+            provider, _, model = entry.strip().partition(':')
+            if not model:
+                raise ValueError(f"Fallback model {entry!r} must be written as provider:model")
+            models.append((provider, model))
+    return models
+
+
+class ProviderUnavailable(Exception):
+    """Every provider in the chain failed or has its circuit open"""
+
+
+class CircuitBreaker:
+    """Opens after consecutive failures; after the reset timeout calls probe the provider again"""
+
+    def __init__(self, provider: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.provider = provider
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.times_opened = 0
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return 'closed'
+        return 'half_open' if time.monotonic() - self.opened_at >= self.reset_timeout else 'open'
+
+    def allow(self) -> bool:
+        return self.state != 'open'
+
+    def record_success(self):
+        self.failures = 0
+        if self.opened_at is not None:
+            logger.info(f"Circuit closed for LLM provider {self.provider}")
+            self.opened_at = None
+            llm_circuit_open.set(0, provider=self.provider)
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == 'half_open' or (self.opened_at is None and self.failures >= self.failure_threshold):
+            # A failed probe re-opens the circuit for another reset timeout
+            self.opened_at = time.monotonic()
+            self.times_opened += 1
+            llm_circuit_open.set(1, provider=self.provider)
+            llm_provider_events.inc(provider=self.provider, event='circuit_open')
+            logger.warning(f"Circuit opened for LLM provider {self.provider} after {self.failures} failures")
+
+
+class LatencyWindow:
+    """Recent successful call durations of one provider/model"""
+
+    def __init__(self, size: int = LATENCY_WINDOW):
+        self.samples = deque(maxlen=size)
+
+    def add(self, seconds: float):
+        self.samples.append(seconds)
+
+    def percentile(self, p: float) -> Optional[float]:
+        if len(self.samples) < MIN_LATENCY_SAMPLES:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+
+class ProviderPool:
+    """Runs an LLM call on the first healthy model of a fallback chain, optionally hedged"""
+
+    def __init__(self, fallback_models: str = DEFAULT_FALLBACK_MODELS, failure_threshold: int = 5,
+                 reset_timeout: float = 30.0, attempt_timeout: float = 60.0, hedge: bool = False,
+                 hedge_percentile: float = 0.95, hedge_min_delay: float = 1.0, hedge_initial_delay: float = 10.0):
+        self.fallback_models = parse_models(fallback_models)
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.attempt_timeout = attempt_timeout
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_initial_delay = hedge_initial_delay  # until enough latency samples exist
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self.latencies: Dict[Tuple[str, str], LatencyWindow] = {}
+        self._stats = {'calls': 0, 'failovers': 0, 'hedges': 0, 'hedges_won': 0, 'unavailable': 0}
+
+    def breaker(self, provider: str) -> CircuitBreaker:
+        if provider not in self.breakers:
+            self.breakers[provider] = CircuitBreaker(provider, self.failure_threshold, self.reset_timeout)
+        return self.breakers[provider]
+
+    def latency(self, provider: str, model: str) -> LatencyWindow:
+        return self.latencies.setdefault((provider, model), LatencyWindow())
+
+    def chain(self, provider: str, model: str) -> List[Tuple[str, str]]:
+        """The agent's own model first, then the fallbacks, skipping open circuits"""
+        models = [(provider, model)] + [pair for pair in self.fallback_models if pair != (provider, model)]
+        return [pair for pair in models if self.breaker(pair[0]).allow()]
+
+    def hedge_delay(self, provider: str, model: str) -> float:
+        """Wait this long for a call before hedging it: its recent tail latency"""
+        p = self.latency(provider, model).percentile(self.hedge_percentile)
+        return max(self.hedge_min_delay, p if p is not None else self.hedge_initial_delay)
+
+    async def _run(self, provider: str, model: str, attempt: Callable[[str, str], Awaitable[Any]]):
+        breaker = self.breaker(provider)
+        deadlines.check()
+        timeout = deadlines.bounded(self.attempt_timeout)
+        started = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(attempt(provider, model), timeout)
+        except asyncio.CancelledError:
+            raise  # Lost a hedge race; says nothing about the provider
+        except asyncio.TimeoutError:
+            if timeout < self.attempt_timeout:
+                # The request ran out of time, not necessarily the provider
+                raise DeadlineExceeded(f"Request deadline exceeded waiting for {provider}/{model}")
+            breaker.record_failure()
+            raise
+        except Exception:
+            breaker.record_failure()
+            raise
+        breaker.record_success()
+        self.latency(provider, model).add(time.perf_counter() - started)
+        return result
+
+    async def call(self, provider: str, model: str, attempt: Callable[[str, str], Awaitable[Any]],
+                   hedge: bool = True) -> Any:
+        """First successful result of attempt(provider, model) along the chain
+
+        Failed attempts fall through to the next model. With hedging on, a call still
+        running after its hedge delay gets a second attempt on the next model and the
+        first answer wins; the other attempt is cancelled.
+        """
+        self._stats['calls'] += 1
+        chain = self.chain(provider, model)
+        if not chain:
+            self._stats['unavailable'] += 1
+            raise ProviderUnavailable(f"All LLM provider circuits are open for {provider}/{model}")
+
+        pending: Dict[asyncio.Task, Tuple[str, str]] = {}
+        errors = []
+        launched = 0
+        hedged = False
+
+        def launch():
+            nonlocal launched
+            pair = chain[launched]
+            launched += 1
+            pending[asyncio.ensure_future(self._run(pair[0], pair[1], attempt))] = pair
+            return pair
+
+        current = launch()
+        try:
+            while pending:
+                can_hedge = hedge and self.hedge and len(pending) == 1 and launched < len(chain)
+                timeout = self.hedge_delay(*current) if can_hedge else None
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    self._stats['hedges'] += 1
+                    hedged = True
+                    current = launch()
+                    llm_provider_events.inc(provider=current[0], event='hedge')
+                    continue
+
+                for task in done:
+                    pair = pending.pop(task)
+                    if isinstance(task.exception(), DeadlineExceeded):
+                        raise task.exception()
+                    if task.exception() is None:
+                        if hedged and pair == current:
+                            self._stats['hedges_won'] += 1
+                            llm_provider_events.inc(provider=pair[0], event='hedge_won')
+                        return task.result()
+                    errors.append(f"{pair[0]}/{pair[1]}: {task.exception()}")
+
+                if not pending and launched < len(chain):
+                    self._stats['failovers'] += 1
+                    current = launch()
+                    llm_provider_events.inc(provider=current[0], event='failover')
+                    logger.warning(f"LLM call failed over to {current[0]}/{current[1]}: {errors[-1]}")
+        finally:
+            for task in pending:
+                task.cancel()
+
+        self._stats['unavailable'] += 1
+        raise ProviderUnavailable("; ".join(errors))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'hedge': self.hedge,
+            **self._stats,
+            'circuits': {
+                provider: {'state': breaker.state, 'failures': breaker.failures, 'times_opened': breaker.times_opened}
+                for provider, breaker in self.breakers.items()
+            },
+            'hedge_delay_s': {
+                f"{provider}/{model}": round(self.hedge_delay(provider, model), 3)
+                for provider, model in self.latencies
+            }
+        }
@@ -0,0 +1,361 @@
+"""
+Real-time event delivery engine
+Coalesces broadcast events per tick and routes them to interested clients by topic
+"""
+import asyncio
+import fnmatch
+import logging
+import re
+from collections import OrderedDict, defaultdict
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class CoalescingBuffer:
+    """Ordered buffer of update events where newer updates replace superseded ones"""
+
+    # Events that replace a pending event of the same type for the same entity
+    COALESCE_KEYS = {
+        'task_progress': 'task_id',
+        'certification_progress': 'name'
+    }
+
+    # Events that make a pending event of another type for the same entity obsolete
+    SUPERSEDES = {
+        'task_completed': ('task_progress', 'task_id'),
+        'task_failed': ('task_progress', 'task_id')
+    }
+
+    def __init__(self, coalesce: bool = True):
+        self.coalesce = coalesce
+        self._events = OrderedDict()
+        self._sequence = 0
+
+    def __len__(self):
+        return len(self._events)
+
+    def add(self, event: Dict[str, Any]) -> int:
+        """Append an event, returns how many pending events it replaced"""
+        replaced = 0
+        key = None
+        if self.coalesce:
+            event_type, data = event['type'], event.get('data') or {}
+
+            superseded = self.SUPERSEDES.get(event_type)
+            if superseded:
+                stale_type, field = superseded
+                if self._events.pop((stale_type, data.get(field)), None) is not None:
+                    replaced += 1
+
+            field = self.COALESCE_KEYS.get(event_type)
+            if field and data.get(field) is not None:
+                key = (event_type, data[field])
+                if self._events.pop(key, None) is not None:
+                    replaced += 1
+
+        if key is None:
+            self._sequence += 1
+            key = ('event', self._sequence)
+        self._events[key] = event
+        return replaced
+
+    def drop_oldest(self) -> None:
+        self._events.popitem(last=False)
+
+    def drain(self) -> List[Dict[str, Any]]:
+        """Remove and return every pending event in order"""
+        events = list(self._events.values())
+        self._events.clear()
+        return events
+
+
+class EventCoalescer:
+    """Buffers update events and flushes them as one batched frame per tick"""
+
+    def __init__(self, emit: Callable[[List[Dict[str, Any]]], Awaitable[None]],
+                 tick_interval: float = 0.1, max_batch: int = 500):
+        self._emit = emit
+        self.tick_interval = tick_interval
+        self.max_batch = max_batch
+
+        self._pending = CoalescingBuffer()
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stats = {'published': 0, 'coalesced': 0, 'frames': 0, 'events_sent': 0, 'emit_errors': 0}
+
+    def publish(self, event_type: str, data: Dict[str, Any]):
+        """Queue an event for the next frame, collapsing superseded updates"""
+        self._stats['published'] += 1
+        self._stats['coalesced'] += self._pending.add({'type': event_type, 'data': data})
+
+        if len(self._pending) >= self.max_batch and self._wake:
+            self._wake.set()
+
+    async def flush(self):
+        """Send every pending event as a single frame"""
+        if not self._pending:
+            return
+        events = self._pending.drain()
+        try:
+            await self._emit(events)
+            self._stats['frames'] += 1
+            self._stats['events_sent'] += len(events)
+        except Exception as e:
+            self._stats['emit_errors'] += 1
+            logger.error(f"Error emitting update batch: {str(e)}")
+
+    def start(self):
+        """Start the tick loop on the running event loop"""
+        if self._task is None:
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the tick loop and flush whatever is still pending"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.tick_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        """Coalescing and frame counters"""
+        return {
+            'tick_interval_ms': int(self.tick_interval * 1000),
+            'pending': len(self._pending),
+            **self._stats
+        }
+
+
+class TopicRouter:
+    """Routes events to clients subscribed to matching topics
+
+    Topics look like ``event:task_progress``, ``agent:agent-1`` or ``task:task-1a2b3c4d``.
+    Subscriptions are exact topics or wildcard patterns such as ``task:*``, ``event:task_*`` or ``*``.
+    """
+
+    # Event data fields that scope an event to a topic
+    SCOPE_FIELDS = {
+        'agent_id': 'agent',
+        'assigned_agent_id': 'agent',
+        'from_agent_id': 'agent',
+        'to_agent_id': 'agent',
+        'task_id': 'task'
+    }
+
+    MAX_TOPICS_PER_CLIENT = 100
+
+    def __init__(self):
+        self._exact = defaultdict(set)
+        self._wildcards = defaultdict(set)
+        self._compiled = {}
+        self._client_topics = defaultdict(set)
+        self._stats = {'events_routed': 0, 'deliveries': 0}
+
+    @classmethod
+    def event_topics(cls, event: Dict[str, Any]) -> List[str]:
+        """Concrete topics an event is published on"""
+        topics = [f"event:{event['type']}"]
+        data = event.get('data') or {}
+        for field, kind in cls.SCOPE_FIELDS.items():
+            value = data.get(field)
+            if value and value not in ('all', 'system'):
+                topics.append(f"{kind}:{value}")
+        return list(dict.fromkeys(topics))
+
+    def subscribe(self, sid: str, topics: Iterable[str]) -> List[str]:
+        """Add topic subscriptions for a client, returns its full subscription list"""
+        current = self._client_topics[sid]
+        for topic in topics:
+            if not isinstance(topic, str) or not topic or topic in current:
+                continue
+            if len(current) >= self.MAX_TOPICS_PER_CLIENT:
+                break
+            current.add(topic)
+            if self._is_wildcard(topic):
+                self._wildcards[topic].add(sid)
+                if topic not in self._compiled:
+                    self._compiled[topic] = re.compile(fnmatch.translate(topic))
+            else:
+                self._exact[topic].add(sid)
+        return sorted(current)
+
+    def unsubscribe(self, sid: str, topics: Optional[Iterable[str]] = None) -> List[str]:
+        """Remove topic subscriptions for a client (all of them when topics is None)"""
+        current = self._client_topics.get(sid, set())
+        for topic in list(current if topics is None else topics):
+            if topic not in current:
+                continue
+            current.discard(topic)
+            index = self._wildcards if self._is_wildcard(topic) else self._exact
+            index[topic].discard(sid)
+            if not index[topic]:
+                del index[topic]
+                self._compiled.pop(topic, None)
+        if not current:
+            self._client_topics.pop(sid, None)
+        return sorted(current)
+
+    def route(self, events: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+        """Group events into per-client batches, preserving event order"""
+        batches = defaultdict(list)
+        for event in events:
+            topics = self.event_topics(event)
+            recipients = set()
+            for topic in topics:
+                recipients.update(self._exact.get(topic, ()))
+            for pattern, sids in self._wildcards.items():
+                matcher = self._compiled[pattern]
+                if any(matcher.match(topic) for topic in topics):
+                    recipients.update(sids)
+            for sid in recipients:
+                batches[sid].append(event)
+            self._stats['events_routed'] += 1
+            self._stats['deliveries'] += len(recipients)
+        return batches
+
+    @staticmethod
+    def _is_wildcard(topic: str) -> bool:
+        return any(char in topic for char in '*?[')
+
+    def stats(self) -> Dict[str, Any]:
+        """Subscription and routing counters"""
+        return {
+            'subscribed_clients': len(self._client_topics),
+            'exact_topics': len(self._exact),
+            'wildcard_patterns': len(self._wildcards),
+            **self._stats
+        }
+
+
+class OutboundQueues:
+    """Bounded per-client outbound queues with slow-consumer eviction
+
+    Events wait here instead of in the unbounded Engine.IO send queue. A client only
+    receives a frame when its transport queue is short; otherwise its events are
+    coalesced (or the oldest dropped) and a client congested for too long is evicted.
+    """
+
+    POLICIES = ('coalesce', 'drop_oldest')
+
+    def __init__(self, send: Callable[[str, List[Dict[str, Any]]], Awaitable[None]],
+                 transport_depth: Callable[[str], int],
+                 evict: Callable[[str], Awaitable[None]],
+                 max_events: int = 500, policy: str = 'coalesce',
+                 max_transport_depth: int = 16, evict_after: float = 30.0,
+                 drain_interval: float = 0.1):
+        if policy not in self.POLICIES:
+            raise ValueError(f"Unknown outbound queue policy: {policy}")
+        self._send = send
+        self._transport_depth = transport_depth
+        self._evict = evict
+        self.max_events = max_events
+        self.policy = policy
+        self.max_transport_depth = max_transport_depth
+        self.evict_after = evict_after
+        self.drain_interval = drain_interval
+
+        self._queues: Dict[str, CoalescingBuffer] = {}
+        self._congested_since: Dict[str, float] = {}
+        self._dropped_by_client = defaultdict(int)
+        self._task: Optional[asyncio.Task] = None
+        self._stats = {'enqueued': 0, 'coalesced': 0, 'dropped': 0, 'frames': 0, 'evictions': 0, 'send_errors': 0}
+
+    def enqueue(self, sid: str, events: List[Dict[str, Any]]):
+        """Queue events for a client, applying the overflow policy"""
+        queue = self._queues.get(sid)
+        if queue is None:
+            queue = self._queues[sid] = CoalescingBuffer(coalesce=self.policy == 'coalesce')
+        for event in events:
+            self._stats['coalesced'] += queue.add(event)
+            self._stats['enqueued'] += 1
+            if len(queue) > self.max_events:
+                queue.drop_oldest()
+                self._stats['dropped'] += 1
+                self._dropped_by_client[sid] += 1
+
+    def remove(self, sid: str):
+        """Forget a disconnected client"""
+        self._queues.pop(sid, None)
+        self._congested_since.pop(sid, None)
+        self._dropped_by_client.pop(sid, None)
+
+    async def drain(self):
+        """Send pending events to every client whose transport can take them"""
+        now = asyncio.get_running_loop().time()
+        for sid in list(self._queues):
+            queue = self._queues.get(sid)
+            if not queue:
+                continue
+
+            if self._transport_depth(sid) > self.max_transport_depth:
+                since = self._congested_since.setdefault(sid, now)
+                if now - since >= self.evict_after:
+                    await self._evict_client(sid)
+                continue
+
+            self._congested_since.pop(sid, None)
+            events = queue.drain()
+            try:
+                await self._send(sid, events)
+                self._stats['frames'] += 1
+            except Exception as e:
+                self._stats['send_errors'] += 1
+                logger.error(f"Error sending update batch to {sid}: {str(e)}")
+
+    async def _evict_client(self, sid: str):
+        dropped = self._dropped_by_client.get(sid, 0)
+        self.remove(sid)
+        self._stats['evictions'] += 1
+        logger.warning(f"Evicting slow realtime client {sid} (dropped {dropped} events)")
+        try:
+            await self._evict(sid)
+        except Exception as e:
+            logger.error(f"Error evicting client {sid}: {str(e)}")
+
+    def start(self):
+        """Start retrying congested clients in the background"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.drain_interval)
+            await self.drain()
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth, drop and eviction metrics"""
+        depths = {sid: len(queue) for sid, queue in self._queues.items() if queue}
+        deepest = sorted(depths.items(), key=lambda item: item[1], reverse=True)[:10]
+        return {
+            'policy': self.policy,
+            'max_events': self.max_events,
+            'clients': len(self._queues),
+            'queued_events': sum(depths.values()),
+            'max_queue_depth': deepest[0][1] if deepest else 0,
+            'deepest_queues': dict(deepest),
+            'congested_clients': len(self._congested_since),
+            **self._stats
+        }
@@ -0,0 +1,156 @@
+"""
+Version-based response cache for read-heavy endpoints
+Writes bump per-resource version counters; ETags are derived from the versions a response depends on.
+Versions are shared across workers through the cache_versions collection
+"""
+import asyncio
+import hashlib
+import logging
+import time
+import uuid
+from collections import OrderedDict, defaultdict
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+from urllib.parse import urlencode
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pymongo import UpdateOne
+
+from deadlines import detach
+
+logger = logging.getLogger(__name__)
+
+# Resources written before each real-time event is broadcast; events relayed from
+# other workers invalidate the same resources here
+EVENT_RESOURCES = {
+    'new_activity': ('activities',),
+    'new_task': ('tasks', 'agents'),
+    'task_progress': ('tasks',),
+    'task_completed': ('tasks', 'agents'),
+    'task_failed': ('tasks',),
+    'certification_progress': ('certifications',),
+    'new_hive_message': ('hive_messages',)
+}
+
+
+class ResponseCache:
+    """Caches rendered GET responses and answers If-None-Match with 304"""
+
+    def __init__(self, db=None, max_entries: int = 512, sync_interval: float = 1.0):
+        self.db = db  # None keeps versions local to this worker
+        self.max_entries = max_entries
+        self.sync_interval = sync_interval  # how stale other workers' writes may be seen
+        # ETags issued by another worker or before a restart never match this process
+        self.epoch = uuid.uuid4().hex[:8]
+        self._versions: Dict[str, int] = defaultdict(int)
+        self._shared: Dict[str, int] = {}  # versions in cache_versions as of the last sync
+        self._synced_at = float('-inf')
+        self._unpublished = set()
+        self._publisher: Optional[asyncio.Task] = None
+        self._entries: OrderedDict = OrderedDict()  # key -> (etag, body)
+        self._stats = {'not_modified': 0, 'hits': 0, 'misses': 0, 'invalidations': 0,
+                       'syncs': 0, 'sync_errors': 0, 'publish_errors': 0}
+
+    @property
+    def shared_versions(self):
+        return self.db.cache_versions
+
+    def invalidate(self, *resources: str):
+        """Bump the version of every written resource, here at once and for other workers shortly"""
+        for resource in resources:
+            self._versions[resource] += 1
+        self._stats['invalidations'] += 1
+        if self.db is not None:
+            self._unpublished.update(resources)
+            if self._publisher is None or self._publisher.done():
+                # Outside the request, so its deadline cannot cancel the publish
+                self._publisher = detach(self._publish())
+
+    async def _publish(self):
+        """Bump the shared versions; invalidations made meanwhile go out in the next round"""
+        while self._unpublished:
+            resources = sorted(self._unpublished)
+            self._unpublished.clear()
+            try:
+                await self.shared_versions.bulk_write([
+                    UpdateOne({'_id': resource}, {'$inc': {'version': 1}}, upsert=True) for resource in resources
+                ], ordered=False)
+            except Exception as e:
+                self._stats['publish_errors'] += 1
+                logger.error(f"Error publishing response cache versions: {str(e)}")
+
+    async def sync(self):
+        """Read the shared versions, at most once per sync_interval"""
+        if self.db is None or time.monotonic() - self._synced_at < self.sync_interval:
+            return
+        self._synced_at = time.monotonic()  # before awaiting, so concurrent requests skip
+        try:
+            docs = await self.shared_versions.find({}, {'version': 1}).to_list(None)
+            self._shared = {doc['_id']: doc['version'] for doc in docs}
+            self._stats['syncs'] += 1
+        except Exception as e:
+            self._stats['sync_errors'] += 1
+            logger.error(f"Error reading response cache versions: {str(e)}")
+
+    def invalidate_events(self, events: List[Dict[str, Any]]):
+        """Invalidate the resources behind a batch of real-time events"""
+        resources = set()
+        for event in events:
+            resources.update(EVENT_RESOURCES.get(event.get('type'), ()))
+        if resources:
+            self.invalidate(*resources)
+
+    async def on_flush(self, resource: str, batch: List[Dict[str, Any]]):
+        """Write-behind hook: documents become visible once their batch is written"""
+        self.invalidate(resource)
+
+    def etag(self, key: str, resources: Iterable[str], max_age: Optional[int] = None) -> str:
+        versions = ','.join(
+            f"{resource}:{self._shared.get(resource, 0)}.{self._versions[resource]}" for resource in sorted(resources)
+        )
+        # Time-dependent responses also change when their max_age window rolls over
+        window = int(time.time() // max_age) if max_age else 0
+        digest = hashlib.sha1(f"{key}|{versions}|{window}".encode()).hexdigest()[:16]
+        return f'W/"{self.epoch}-{digest}"'
+
+    async def respond(self, request: Request, resources: Iterable[str],
+                      load: Callable[[], Awaitable[Any]], max_age: Optional[int] = None) -> Response:
+        """Serve a GET from cache, 304 or load(), tagged with the current ETag"""
+        key = f"{request.url.path}?{urlencode(sorted(request.query_params.multi_items()))}"
+        await self.sync()
+        # Computed before loading so a write during load() leaves the entry stale
+        etag = self.etag(key, resources, max_age)
+        headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+
+        if_none_match = request.headers.get('if-none-match', '')
+        if etag in [tag.strip() for tag in if_none_match.split(',')]:
+            self._stats['not_modified'] += 1
+            return Response(status_code=304, headers=headers)
+
+        entry = self._entries.get(key)
+        if entry and entry[0] == etag:
+            self._stats['hits'] += 1
+            self._entries.move_to_end(key)
+            body = entry[1]
+        else:
+            self._stats['misses'] += 1
+            body = JSONResponse(jsonable_encoder(await load())).body
+            self._entries[key] = (etag, body)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+        return Response(content=body, media_type='application/json', headers=headers)
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit, 304 and invalidation counts"""
+        served = self._stats['not_modified'] + self._stats['hits'] + self._stats['misses']
+        return {
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            **self._stats,
+            'hit_rate': round((self._stats['not_modified'] + self._stats['hits']) / served, 4) if served else 0,
+            'versions': dict(self._versions),
+            'shared_versions': dict(self._shared)
+        }
@@ -0,0 +1,127 @@
+"""
+Task result storage outside the tasks collection
+LLM results are zlib-compressed into task_results, or into GridFS when even the compressed
+result is large, so task documents stay small and results are read only when asked for
+"""
+import asyncio
+import logging
+import zlib
+from datetime import datetime
+from typing import Any, Dict, Iterable, Optional
+
+from motor.motor_asyncio import AsyncIOMotorGridFSBucket
+
+logger = logging.getLogger(__name__)
+
+ENCODING = 'zlib'
+GRIDFS_BUCKET = 'task_results_fs'
+PREVIEW_CHARS = 280
+OFFLOAD_BYTES = 256 * 1024  # compress larger results off the event loop
+# Finished tasks still holding their result or error inline, from before the store existed
+INLINE_RESULTS = {'status': {'$in': ['completed', 'failed']}, 'result': {'$type': 'string'}}
+
+
+def preview(text: str, chars: int = PREVIEW_CHARS) -> str:
+    """The start of a result on one line, for lists and search"""
+    text = ' '.join(text.split())
+    return text if len(text) <= chars else text[:chars - 1].rstrip() + '…'
+
+
+class ResultStore:
+    """Compressed task results keyed by task_id, loaded lazily"""
+
+    def __init__(self, db, compression_level: int = 6, gridfs_threshold: int = 4 * 1024 * 1024):
+        self.db = db
+        self.compression_level = compression_level
+        self.gridfs_threshold = gridfs_threshold  # compressed bytes; documents are capped at 16 MB
+        self._stats = {'saved': 0, 'gridfs': 0, 'loaded': 0, 'migrated': 0, 'bytes_in': 0, 'bytes_stored': 0}
+
+    @property
+    def results(self):
+        return self.db.task_results
+
+    def bucket(self) -> AsyncIOMotorGridFSBucket:
+        return AsyncIOMotorGridFSBucket(self.db, bucket_name=GRIDFS_BUCKET)
+
+    async def _compress(self, raw: bytes) -> bytes:
+        if len(raw) >= OFFLOAD_BYTES:
+            return await asyncio.to_thread(zlib.compress, raw, self.compression_level)
+        return zlib.compress(raw, self.compression_level)
+
+    async def save(self, task_id: str, text: str) -> Dict[str, Any]:
+        """Store a task's result; returns the summary fields to set on the task"""
+        raw = text.encode('utf-8')
+        data = await self._compress(raw)
+        doc = {
+            'task_id': task_id,
+            'encoding': ENCODING,
+            'size': len(raw),
+            'stored_size': len(data),
+            'created_at': datetime.utcnow()
+        }
+        previous = await self.results.find_one({'task_id': task_id}, {'_id': 0, 'gridfs_id': 1})
+        if len(data) >= self.gridfs_threshold:
+            doc['gridfs_id'] = await self.bucket().upload_from_stream(
+                task_id, data, metadata={'task_id': task_id, 'encoding': ENCODING}
+            )
+            self._stats['gridfs'] += 1
+        else:
+            doc['data'] = data
+        await self.results.replace_one({'task_id': task_id}, doc, upsert=True)
+        if previous and previous.get('gridfs_id'):
+            await self.bucket().delete(previous['gridfs_id'])
+
+        self._stats['saved'] += 1
+        self._stats['bytes_in'] += len(raw)
+        self._stats['bytes_stored'] += len(data)
+        return {'result_size': len(raw), 'result_preview': preview(text)}
+
+    async def _decode(self, doc: Dict[str, Any]) -> str:
+        data = doc.get('data')
+        if data is None:
+            stream = await self.bucket().open_download_stream(doc['gridfs_id'])
+            data = await stream.read()
+        self._stats['loaded'] += 1
+        return zlib.decompress(data).decode('utf-8')
+
+    async def load(self, task_id: str) -> Optional[str]:
+        """A task's result, or None if none was stored"""
+        doc = await self.results.find_one({'task_id': task_id}, {'_id': 0})
+        return await self._decode(doc) if doc else None
+
+    async def load_many(self, task_ids: Iterable[str]) -> Dict[str, str]:
+        """Results of several tasks by task_id; tasks without one are left out"""
+        task_ids = list(task_ids)
+        if not task_ids:
+            return {}
+        docs = await self.results.find({'task_id': {'$in': task_ids}}, {'_id': 0}).to_list(None)
+        return {doc['task_id']: await self._decode(doc) for doc in docs}
+
+    async def migrate_inline(self, batch_size: int = 100) -> int:
+        """Move results and errors still stored inline on finished tasks into the store"""
+        migrated = 0
+        while True:
+            tasks = await self.db.tasks.find(
+                INLINE_RESULTS,
+                {'_id': 0, 'task_id': 1, 'result': 1}
+            ).limit(batch_size).to_list(batch_size)
+            if not tasks:
+                break
+            for task in tasks:
+                summary = await self.save(task['task_id'], task['result'])
+                await self.db.tasks.update_one(
+                    {'task_id': task['task_id']},
+                    {'$set': summary, '$unset': {'result': ''}}
+                )
+            migrated += len(tasks)
+        self._stats['migrated'] += migrated
+        if migrated:
+            logger.info(f"Moved {migrated} inline task results to {self.results.name}")
+        return migrated
+
+    def stats(self) -> Dict[str, Any]:
+        stored = self._stats['bytes_stored']
+        return {
+            **self._stats,
+            'compression_ratio': round(self._stats['bytes_in'] / stored, 2) if stored else None
+        }
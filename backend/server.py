@@ -1,6 +1,11 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Query
+import time
+IMPORT_STARTED = time.perf_counter()  # cold start timing includes module imports
+
+from fastapi import FastAPI, APIRouter, Depends, HTTPException, Query, Request
 from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response
 from dotenv import load_dotenv
+from starlette.datastructures import State
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
 import socketio
@@ -10,45 +15,267 @@ from pathlib import Path
 from typing import List, Optional
 from datetime import datetime, timedelta
 import asyncio
+from collections import Counter
+from functools import partial
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from pymongo import UpdateOne
 import random
+import uuid
 
 from models import (
     Agent, Task, TaskCreate, HiveMessage, HiveBroadcast,
-    Project, Activity, Certification, ChatMessage, ChatResponse
+    Project, Activity, Certification, ChatMessage, ChatResponse,
+    ComplianceCheck, ComplianceBatch
 )
-from agent_system import orchestrator
-from security_engine import security_analyzer
+from pydantic import ValidationError
+from agent_system import HiveMindOrchestrator, CHAT_ERROR_PREFIX
 from metrics_engine import MetricsEngine
+from mongo_manager import AsyncMongoManager
+from db_indexes import ensure_indexes
+from activity_store import ActivityStore, GRANULARITIES
+from write_behind import WriteBehindBuffer
+from job_runner import JobResult, JobRunner
+from task_queries import TASK_LIST_LIMIT, TASK_LIST_SORT, task_filter
+from task_router import TaskRouter
+from response_cache import ResponseCache
+from conversation_store import ConversationStore
+from usage_accounting import UsageAccountant, UsageBudgetExceeded, warm_encoding
+from provider_resilience import DEFAULT_FALLBACK_MODELS, ProviderPool
+from deadlines import DeadlineExceeded, DeadlineMiddleware, detach
+from result_store import ResultStore
+from task_findings import FINDINGS_VERSION, backfill_findings, extract_findings
+from analytics_series import TimeSeriesAnalytics, resolve_granularity
+from health_monitor import HealthMonitor
+from field_projection import ACTIVITY_FIELDS, SEARCH_FIELDS, TASK_FIELDS, select_qualified
+from instrumentation import (
+    MongoCommandListener, metrics, http_request_duration, startup_duration,
+    socketio_connected_clients, socketio_connections, socketio_emits, socketio_evictions
+)
+from realtime_engine import EventCoalescer, OutboundQueues, TopicRouter
 
 ROOT_DIR = Path(__file__).parent
+# The only load_dotenv: everything below and every module reads os.environ afterwards
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+async def record_request_latency(request: Request, call_next):
+    """Observe request latency per route template (not per raw path)"""
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        http_request_duration.observe(
+            time.perf_counter() - started,
+            method=request.method,
+            route=route.path if route else "unmatched",
+            status=status
+        )
 
-# Create the main app
-app = FastAPI(title="AI Cyber Security & Development Company API", version="2.0.0")
+# Every request runs under a deadline (X-Request-Timeout header or route default) that bounds
+# its LLM calls and Mongo operations; it is cancelled on deadline or client disconnect
+LLM_REQUEST_TIMEOUT = float(os.environ.get('LLM_REQUEST_TIMEOUT_SECONDS', '120'))
 
-# Create Socket.IO server
-sio = socketio.AsyncServer(
-    async_mode='asgi',
-    cors_allowed_origins='*',
-    logger=True,
-    engineio_logger=True
-)
-socket_app = socketio.ASGIApp(sio, app)
+async def deadline_exceeded_handler(request: Request, exc: DeadlineExceeded):
+    return JSONResponse(status_code=504, content={"detail": str(exc)})
 
-# Create API router with prefix
+# Create API router with prefix; handlers read the clients and stores from app.state
 api_router = APIRouter(prefix="/api")
 
-# Scheduler for automated tasks
-scheduler = AsyncIOScheduler()
+def get_state(request: Request) -> State:
+    """The Mongo client, stores and real-time components of the app serving this request"""
+    return request.app.state
+
+METRICS_CACHE_MAX_AGE = int(os.environ.get('RESPONSE_CACHE_METRICS_MAX_AGE_SECONDS', '30'))
+
+def build_state(state: State):
+    """Create the Mongo client, stores, Socket.IO server and real-time delivery of one app"""
+    # MongoDB connection; Motor opens connections on the first operation, not here
+    state.client = AsyncIOMotorClient(
+        os.environ['MONGO_URL'], connect=False, event_listeners=[MongoCommandListener(metrics)]
+    )
+    state.db = db = state.client[os.environ['DB_NAME']]
+
+    # Socket.IO client manager: in-process by default, Mongo bus for multi-worker deployments
+    state.client_manager = None
+    if os.environ.get('SOCKETIO_MANAGER', 'memory') == 'mongo':
+        state.client_manager = AsyncMongoManager(db, channel=os.environ.get('SOCKETIO_CHANNEL', 'socketio'))
+
+    # Create Socket.IO server
+    state.sio = socketio.AsyncServer(
+        async_mode='asgi',
+        client_manager=state.client_manager,
+        cors_allowed_origins='*',
+        logger=True,
+        engineio_logger=True
+    )
+    for handler in (connect, disconnect, subscribe_updates, unsubscribe_updates):
+        state.sio.on(handler.__name__, partial(handler, state))
+
+    # Scheduler for automated tasks
+    state.scheduler = AsyncIOScheduler()
+
+    # Activity and hive message inserts are group-committed off the request path
+    state.write_behind = write_behind = WriteBehindBuffer(
+        db,
+        batch_size=int(os.environ.get('WRITE_BEHIND_BATCH_SIZE', '200')),
+        flush_interval=int(os.environ.get('WRITE_BEHIND_FLUSH_MS', '500')) / 1000,
+        max_queued=int(os.environ.get('WRITE_BEHIND_MAX_QUEUED', '10000')),
+        overflow=os.environ.get('WRITE_BEHIND_OVERFLOW', 'flush')
+    )
+
+    # Activities live in a time-series collection with TTL retention and rollups
+    state.activity_store = ActivityStore(
+        db,
+        retention_days=int(os.environ.get('ACTIVITY_RETENTION_DAYS', '30')),
+        hourly_retention_days=int(os.environ.get('ACTIVITY_HOURLY_ROLLUP_RETENTION_DAYS', '90')),
+        writer=write_behind
+    )
+
+    # Scheduled jobs run on one leader worker, never overlap and record per-run metrics
+    state.job_runner = JobRunner(
+        db,
+        state.scheduler,
+        lease_seconds=int(os.environ.get('SCHEDULER_LEADER_LEASE_SECONDS', '60')),
+        leader_lock=os.environ.get('SCHEDULER_LEADER_LOCK', 'true') == 'true',
+        writer=write_behind
+    )
+
+    # LLM task results are stored compressed outside the tasks collection
+    state.result_store = ResultStore(
+        db,
+        compression_level=int(os.environ.get('TASK_RESULT_COMPRESSION_LEVEL', '6')),
+        gridfs_threshold=int(os.environ.get('TASK_RESULT_GRIDFS_THRESHOLD_BYTES', str(4 * 1024 * 1024)))
+    )
+
+    # Trend counters are bucketed per minute, hour and day as tasks and activities are written
+    state.timeseries = TimeSeriesAnalytics(
+        db,
+        minute_retention_days=int(os.environ.get('ANALYTICS_MINUTE_RETENTION_DAYS', '7')),
+        hour_retention_days=int(os.environ.get('ANALYTICS_HOUR_RETENTION_DAYS', '400'))
+    )
+    # Registered before the cache hooks so a refreshed response already sees the new counts
+    write_behind.register_hook('activities', state.timeseries.record_activities)
+
+    # Polled read endpoints answer conditional GETs from per-resource versions
+    state.response_cache = response_cache = ResponseCache(
+        db,
+        max_entries=int(os.environ.get('RESPONSE_CACHE_MAX_ENTRIES', '512')),
+        sync_interval=float(os.environ.get('RESPONSE_CACHE_SYNC_SECONDS', '1'))
+    )
+    write_behind.register_hook('activities', partial(response_cache.on_flush, 'activities'))
+    write_behind.register_hook('hive_messages', partial(response_cache.on_flush, 'hive_messages'))
+
+    # Chat history per (agent, session): recent turns verbatim, older turns summarized
+    state.conversation_store = ConversationStore(
+        db,
+        context_tokens=int(os.environ.get('CONVERSATION_CONTEXT_TOKENS', '2000')),
+        summary_tokens=int(os.environ.get('CONVERSATION_SUMMARY_TOKENS', '300')),
+        ttl_days=int(os.environ.get('CONVERSATION_TTL_DAYS', '30'))
+    )
+
+    # Token and cost accounting for every LLM call, with per-request and per-period budgets
+    state.usage_accountant = UsageAccountant(
+        db,
+        max_prompt_tokens=int(os.environ.get('LLM_MAX_PROMPT_TOKENS', '0')),
+        period=os.environ.get('LLM_BUDGET_PERIOD', 'day'),
+        period_budget_usd=float(os.environ.get('LLM_PERIOD_BUDGET_USD', '0')),
+        over_budget=os.environ.get('LLM_OVER_BUDGET', 'reject'),
+        retention_days=int(os.environ.get('LLM_USAGE_RETENTION_DAYS', '90'))
+    )
+
+    # Circuit breakers per provider, failover along a model chain, optional hedged requests
+    state.provider_pool = ProviderPool(
+        fallback_models=os.environ.get('LLM_FALLBACK_MODELS', DEFAULT_FALLBACK_MODELS),
+        failure_threshold=int(os.environ.get('LLM_BREAKER_FAILURES', '5')),
+        reset_timeout=float(os.environ.get('LLM_BREAKER_RESET_SECONDS', '30')),
+        attempt_timeout=float(os.environ.get('LLM_ATTEMPT_TIMEOUT_SECONDS', '60')),
+        hedge=os.environ.get('LLM_HEDGE', 'false') == 'true',
+        hedge_percentile=float(os.environ.get('LLM_HEDGE_PERCENTILE', '0.95')),
+        hedge_min_delay=float(os.environ.get('LLM_HEDGE_MIN_DELAY_SECONDS', '1.0'))
+    )
+
+    # Agents, their task router, the security analyzer and the metrics engine are built on first use
+    state.orchestrator = None
+    state.task_router = None
+    state.security_analyzer = None
+    state.metrics_engine = None
+
+    # WebSocket connections and topic subscriptions of the clients connected to this worker
+    state.active_connections = set()
+    state.topic_router = TopicRouter()
+
+    # Bounded per-client outbound queues in front of the Engine.IO transport
+    state.outbound_queues = OutboundQueues(
+        partial(send_update_batch, state),
+        partial(transport_queue_depth, state),
+        partial(evict_slow_client, state),
+        max_events=int(os.environ.get('REALTIME_MAX_QUEUED_EVENTS', '500')),
+        policy=os.environ.get('REALTIME_QUEUE_POLICY', 'coalesce'),
+        evict_after=float(os.environ.get('REALTIME_SLOW_CLIENT_EVICT_SECONDS', '30'))
+    )
+    if state.client_manager:
+        state.client_manager.relay_handler = partial(deliver_relayed_batch, state)
+
+    # Updates are coalesced per tick instead of emitted one frame per event
+    state.event_coalescer = EventCoalescer(
+        partial(emit_update_batch, state),
+        tick_interval=int(os.environ.get('REALTIME_TICK_MS', '100')) / 1000
+    )
+
+    # Probes answer from a snapshot refreshed in the background, not from Mongo per request
+    state.health_monitor = HealthMonitor(
+        partial(check_system_health, state),
+        refresh_interval=float(os.environ.get('HEALTH_REFRESH_SECONDS', '10')),
+        max_staleness=float(os.environ.get('HEALTH_MAX_STALENESS_SECONDS', '60'))
+    )
 
-# Initialize metrics engine
-metrics_engine = None
+    # Cold start timings: module import and each startup phase, in milliseconds
+    state.startup_report = {}
+
+def get_orchestrator(state: State) -> HiveMindOrchestrator:
+    """The agents, wired to usage accounting and provider failover"""
+    if state.orchestrator is None:
+        state.orchestrator = HiveMindOrchestrator()
+        state.orchestrator.attach_usage(state.usage_accountant)
+        state.orchestrator.attach_providers(state.provider_pool)
+    return state.orchestrator
+
+def get_task_router(state: State) -> TaskRouter:
+    """Tasks go to the best-scoring agent and queue behind its concurrent task slots"""
+    if state.task_router is None:
+        state.task_router = TaskRouter(
+            get_orchestrator(state).get_all_agents().values(),
+            capacity=int(os.environ.get('AGENT_MAX_CONCURRENT_TASKS', '2'))
+        )
+    return state.task_router
+
+def get_security_analyzer(state: State):
+    """Security analyzer; security_engine pulls in numpy, so it is imported on first use"""
+    if state.security_analyzer is None:
+        from security_engine import SecurityAnalyzer
+        state.security_analyzer = SecurityAnalyzer()
+    return state.security_analyzer
+
+def get_metrics_engine(state: State) -> MetricsEngine:
+    """Security, development and health metrics computed from the stored data"""
+    if state.metrics_engine is None:
+        state.metrics_engine = MetricsEngine(state.db)
+    return state.metrics_engine
+
+# Task progress: prompt sent, then streamed output up to PROGRESS_STREAMED, the full
+# response at PROGRESS_RESPONSE_RECEIVED, its result stored, and 100 once persisted
+PROGRESS_PROMPT_SENT = 10
+PROGRESS_STREAMED = 90
+PROGRESS_RESPONSE_RECEIVED = 95
+PROGRESS_RESULT_STORED = 98
+# Minimum progress change between task progress writes while streaming
+TASK_PROGRESS_STEP = int(os.environ.get('TASK_PROGRESS_STEP', '5'))
+
+# Upper bound on hosts evaluated by one batch compliance request
+MAX_COMPLIANCE_BATCH_HOSTS = int(os.environ.get('MAX_COMPLIANCE_BATCH_HOSTS', '10000'))
 
 # Helper functions
 def clean_mongo_doc(doc):
@@ -61,225 +288,335 @@ def clean_mongo_docs(docs):
     """Remove MongoDB _id field from list of documents"""
     return [clean_mongo_doc(doc) for doc in docs]
 
-# WebSocket connection management
-active_connections = set()
+async def attach_agent_names(state: State, docs, key: str):
+    """Set agent_name on each document from its agent id, in one query"""
+    agent_ids = list({doc[key] for doc in docs if doc.get(key)})
+    agents = await state.db.agents.find(
+        {"agent_id": {"$in": agent_ids}}, {"_id": 0, "agent_id": 1, "name": 1}
+    ).to_list(None)
+    names = {agent["agent_id"]: agent.get("name") for agent in agents}
+    for doc in docs:
+        if doc.get(key):
+            doc["agent_name"] = names.get(doc[key], "Unknown")
+    return docs
+
+async def attach_results(state: State, tasks):
+    """Set result on each task from the result store unless it is still stored inline"""
+    results = await state.result_store.load_many(task["task_id"] for task in tasks if task.get("result") is None)
+    for task in tasks:
+        if task.get("result") is None:
+            task["result"] = results.get(task["task_id"])
+    return tasks
+
+def select_fields(fieldset, fields: Optional[str]):
+    """Fields selected by a fields= parameter; unknown names are a 400"""
+    try:
+        return fieldset.select(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-@sio.event
-async def connect(sid, environ):
+# WebSocket connection management; handlers are registered on each app's sio by build_state
+async def connect(state: State, sid, environ):
     """Handle client connection"""
-    active_connections.add(sid)
-    await sio.emit('connection_established', {'status': 'connected', 'sid': sid}, room=sid)
+    state.active_connections.add(sid)
+    socketio_connections.inc(event="connect")
+    socketio_connected_clients.set(len(state.active_connections))
+    socketio_emits.inc(event="connection_established")
+    await state.sio.emit('connection_established', {'status': 'connected', 'sid': sid}, room=sid, ignore_queue=True)
     logging.info(f"Client {sid} connected")
 
-@sio.event
-async def disconnect(sid):
+async def disconnect(state: State, sid):
     """Handle client disconnection"""
-    active_connections.discard(sid)
+    state.active_connections.discard(sid)
+    socketio_connections.inc(event="disconnect")
+    socketio_connected_clients.set(len(state.active_connections))
+    state.topic_router.unsubscribe(sid)
+    state.outbound_queues.remove(sid)
     logging.info(f"Client {sid} disconnected")
 
-@sio.event
-async def subscribe_updates(sid, data):
-    """Subscribe to real-time updates"""
-    await sio.enter_room(sid, 'updates')
-    await sio.emit('subscribed', {'message': 'Subscribed to updates'}, room=sid)
+def requested_topics(data) -> List[str]:
+    """Topics from a subscribe/unsubscribe payload (string or list)"""
+    topics = (data or {}).get('topics') if isinstance(data, dict) else data
+    if isinstance(topics, str):
+        return [topics]
+    return [t for t in topics or [] if isinstance(t, str)]
 
-async def broadcast_update(event_type: str, data: dict):
-    """Broadcast update to all connected clients"""
-    await sio.emit('update', {'type': event_type, 'data': data}, room='updates')
+async def subscribe_updates(state: State, sid, data=None):
+    """Subscribe to real-time updates on topics (all updates when none are given)"""
+    topics = state.topic_router.subscribe(sid, requested_topics(data) or ['*'])
+    socketio_emits.inc(event="subscribed")
+    await state.sio.emit(
+        'subscribed', {'message': 'Subscribed to updates', 'topics': topics}, to=sid, ignore_queue=True
+    )
+
+async def unsubscribe_updates(state: State, sid, data=None):
+    """Unsubscribe from topics (all of them when none are given)"""
+    topics = state.topic_router.unsubscribe(sid, requested_topics(data) or None)
+    socketio_emits.inc(event="unsubscribed")
+    await state.sio.emit('unsubscribed', {'topics': topics}, to=sid, ignore_queue=True)
+
+def engineio_socket(state: State, sid: str):
+    """Engine.IO socket behind a Socket.IO session id, if still connected"""
+    eio_sid = state.sio.manager.eio_sid_from_sid(sid, '/')
+    return state.sio.eio.sockets.get(eio_sid) if eio_sid else None
+
+def transport_queue_depth(state: State, sid: str) -> int:
+    """Packets waiting in a client's Engine.IO send queue"""
+    socket = engineio_socket(state, sid)
+    return socket.queue.qsize() if socket else 0
+
+async def send_update_batch(state: State, sid: str, events: List[dict]):
+    socketio_emits.inc(event="update_batch")
+    await state.sio.emit('update_batch', {'events': events}, to=sid, ignore_queue=True)
+
+async def evict_slow_client(state: State, sid: str):
+    """Close a stalled client without waiting for its send queue to drain"""
+    socket = engineio_socket(state, sid)
+    if socket:
+        socketio_evictions.inc()
+        await socket.close(wait=False, abort=True)
+
+async def deliver_update_batch(state: State, events: List[dict]):
+    """Queue each locally connected client the events it subscribed to and send what fits"""
+    for sid, client_events in state.topic_router.route(events).items():
+        state.outbound_queues.enqueue(sid, client_events)
+    await state.outbound_queues.drain()
+
+async def emit_update_batch(state: State, events: List[dict]):
+    """Deliver a tick's events locally and relay them to the other workers"""
+    if state.client_manager:
+        await state.client_manager.relay(events)
+    await deliver_update_batch(state, events)
+
+async def deliver_relayed_batch(state: State, events: List[dict]):
+    """Events from another worker: drop cached responses they make stale, then deliver"""
+    state.response_cache.invalidate_events(events)
+    await deliver_update_batch(state, events)
+
+async def broadcast_update(state: State, event_type: str, data: dict):
+    """Broadcast update to all connected clients on the next tick"""
+    state.event_coalescer.publish(event_type, jsonable_encoder(data))
 
 # Initialize database with default data
-async def initialize_database():
-    """Initialize database with default agents and data"""
+async def initialize_database(state: State):
+    """Seed default agents and certifications once per database"""
     try:
-        existing_agents = await db.agents.count_documents({})
-        if existing_agents == 0:
-            agents_data = [
-                {
-                    "agent_id": "agent-1",
-                    "name": "Sentinel",
-                    "type": "Security Analyst",
-                    "status": "active",
-                    "model_provider": "openai",
-                    "model_name": "gpt-5",
-                    "avatar": "SA",
-                    "color": "from-blue-500 to-cyan-500",
-                    "current_task_id": None,
-                    "tasks_completed": 1247,
-                    "success_rate": 98.5,
-                    "specialization": ["Threat Detection", "Risk Assessment", "SIEM Analysis"],
-                    "created_at": datetime.utcnow()
-                },
-                {
-                    "agent_id": "agent-2",
-                    "name": "Phoenix",
-                    "type": "Penetration Tester",
-                    "status": "active",
-                    "model_provider": "anthropic",
-                    "model_name": "claude-4-sonnet-20250514",
-                    "avatar": "PT",
-                    "color": "from-red-500 to-orange-500",
-                    "current_task_id": None,
-                    "tasks_completed": 892,
-                    "success_rate": 96.2,
-                    "specialization": ["Web App Testing", "Network Pentesting", "Social Engineering"],
-                    "created_at": datetime.utcnow()
-                },
-                {
-                    "agent_id": "agent-3",
-                    "name": "Cipher",
-                    "type": "Cryptography Expert",
-                    "status": "active",
-                    "model_provider": "gemini",
-                    "model_name": "gemini-2.5-pro",
-                    "avatar": "CE",
-                    "color": "from-purple-500 to-pink-500",
-                    "current_task_id": None,
-                    "tasks_completed": 654,
-                    "success_rate": 99.1,
-                    "specialization": ["Encryption", "Key Management", "Blockchain Security"],
-                    "created_at": datetime.utcnow()
-                },
-                {
-                    "agent_id": "agent-4",
-                    "name": "Architect",
-                    "type": "Software Developer",
-                    "status": "active",
-                    "model_provider": "openai",
-                    "model_name": "gpt-5",
-                    "avatar": "SD",
-                    "color": "from-green-500 to-emerald-500",
-                    "current_task_id": None,
-                    "tasks_completed": 2103,
-                    "success_rate": 97.8,
-                    "specialization": ["Full-Stack Dev", "Cloud Architecture", "API Design"],
-                    "created_at": datetime.utcnow()
-                },
-                {
-                    "agent_id": "agent-5",
-                    "name": "Validator",
-                    "type": "Code Reviewer",
-                    "status": "active",
-                    "model_provider": "anthropic",
-                    "model_name": "claude-4-sonnet-20250514",
-                    "avatar": "CR",
-                    "color": "from-yellow-500 to-amber-500",
-                    "current_task_id": None,
-                    "tasks_completed": 1876,
-                    "success_rate": 98.9,
-                    "specialization": ["Static Analysis", "Code Quality", "Security Audit"],
-                    "created_at": datetime.utcnow()
-                },
-                {
-                    "agent_id": "agent-6",
-                    "name": "Guardian",
-                    "type": "Compliance Expert",
-                    "status": "active",
-                    "model_provider": "gemini",
-                    "model_name": "gemini-2.5-pro",
-                    "avatar": "CM",
-                    "color": "from-indigo-500 to-blue-500",
-                    "current_task_id": None,
-                    "tasks_completed": 543,
-                    "success_rate": 99.7,
-                    "specialization": ["GDPR", "HIPAA", "SOC 2", "ISO 27001"],
-                    "created_at": datetime.utcnow()
-                }
-            ]
-            await db.agents.insert_many(agents_data)
-            
-            # Initialize certifications
-            certifications_data = [
-                {"name": "CISSP", "progress": 87, "status": "in_progress", "total_modules": 8, "completed_modules": 7, "last_updated": datetime.utcnow()},
-                {"name": "CEH", "progress": 100, "status": "certified", "total_modules": 20, "completed_modules": 20, "last_updated": datetime.utcnow()},
-                {"name": "OSCP", "progress": 62, "status": "in_progress", "total_modules": 12, "completed_modules": 7, "last_updated": datetime.utcnow()},
-                {"name": "CISM", "progress": 100, "status": "certified", "total_modules": 4, "completed_modules": 4, "last_updated": datetime.utcnow()},
-                {"name": "CompTIA Security+", "progress": 100, "status": "certified", "total_modules": 6, "completed_modules": 6, "last_updated": datetime.utcnow()},
-                {"name": "AWS Security", "progress": 45, "status": "in_progress", "total_modules": 10, "completed_modules": 4, "last_updated": datetime.utcnow()}
-            ]
-            await db.certifications.insert_many(certifications_data)
-            
-            logging.info("Database initialized with default data")
+        # After the first start seeding is a single marker lookup, on every worker
+        if await state.db.system_state.find_one({"_id": "seed"}, {"_id": 1}):
+            return
+        agents_data = [
+            {
+                "agent_id": "agent-1",
+                "name": "Sentinel",
+                "type": "Security Analyst",
+                "status": "active",
+                "model_provider": "openai",
+                "model_name": "gpt-5",
+                "avatar": "SA",
+                "color": "from-blue-500 to-cyan-500",
+                "current_task_id": None,
+                "tasks_completed": 1247,
+                "success_rate": 98.5,
+                "specialization": ["Threat Detection", "Risk Assessment", "SIEM Analysis"],
+                "created_at": datetime.utcnow()
+            },
+            {
+                "agent_id": "agent-2",
+                "name": "Phoenix",
+                "type": "Penetration Tester",
+                "status": "active",
+                "model_provider": "anthropic",
+                "model_name": "claude-4-sonnet-20250514",
+                "avatar": "PT",
+                "color": "from-red-500 to-orange-500",
+                "current_task_id": None,
+                "tasks_completed": 892,
+                "success_rate": 96.2,
+                "specialization": ["Web App Testing", "Network Pentesting", "Social Engineering"],
+                "created_at": datetime.utcnow()
+            },
+            {
+                "agent_id": "agent-3",
+                "name": "Cipher",
+                "type": "Cryptography Expert",
+                "status": "active",
+                "model_provider": "gemini",
+                "model_name": "gemini-2.5-pro",
+                "avatar": "CE",
+                "color": "from-purple-500 to-pink-500",
+                "current_task_id": None,
+                "tasks_completed": 654,
+                "success_rate": 99.1,
+                "specialization": ["Encryption", "Key Management", "Blockchain Security"],
+                "created_at": datetime.utcnow()
+            },
+            {
+                "agent_id": "agent-4",
+                "name": "Architect",
+                "type": "Software Developer",
+                "status": "active",
+                "model_provider": "openai",
+                "model_name": "gpt-5",
+                "avatar": "SD",
+                "color": "from-green-500 to-emerald-500",
+                "current_task_id": None,
+                "tasks_completed": 2103,
+                "success_rate": 97.8,
+                "specialization": ["Full-Stack Dev", "Cloud Architecture", "API Design"],
+                "created_at": datetime.utcnow()
+            },
+            {
+                "agent_id": "agent-5",
+                "name": "Validator",
+                "type": "Code Reviewer",
+                "status": "active",
+                "model_provider": "anthropic",
+                "model_name": "claude-4-sonnet-20250514",
+                "avatar": "CR",
+                "color": "from-yellow-500 to-amber-500",
+                "current_task_id": None,
+                "tasks_completed": 1876,
+                "success_rate": 98.9,
+                "specialization": ["Static Analysis", "Code Quality", "Security Audit"],
+                "created_at": datetime.utcnow()
+            },
+            {
+                "agent_id": "agent-6",
+                "name": "Guardian",
+                "type": "Compliance Expert",
+                "status": "active",
+                "model_provider": "gemini",
+                "model_name": "gemini-2.5-pro",
+                "avatar": "CM",
+                "color": "from-indigo-500 to-blue-500",
+                "current_task_id": None,
+                "tasks_completed": 543,
+                "success_rate": 99.7,
+                "specialization": ["GDPR", "HIPAA", "SOC 2", "ISO 27001"],
+                "created_at": datetime.utcnow()
+            }
+        ]
+        # Upserts keep concurrent first starts and partially seeded databases consistent
+        await state.db.agents.bulk_write([
+            UpdateOne({"agent_id": agent["agent_id"]}, {"$setOnInsert": agent}, upsert=True)
+            for agent in agents_data
+        ], ordered=False)
+        
+        # Initialize certifications
+        certifications_data = [
+            {"name": "CISSP", "progress": 87, "status": "in_progress", "total_modules": 8, "completed_modules": 7, "last_updated": datetime.utcnow()},
+            {"name": "CEH", "progress": 100, "status": "certified", "total_modules": 20, "completed_modules": 20, "last_updated": datetime.utcnow()},
+            {"name": "OSCP", "progress": 62, "status": "in_progress", "total_modules": 12, "completed_modules": 7, "last_updated": datetime.utcnow()},
+            {"name": "CISM", "progress": 100, "status": "certified", "total_modules": 4, "completed_modules": 4, "last_updated": datetime.utcnow()},
+            {"name": "CompTIA Security+", "progress": 100, "status": "certified", "total_modules": 6, "completed_modules": 6, "last_updated": datetime.utcnow()},
+            {"name": "AWS Security", "progress": 45, "status": "in_progress", "total_modules": 10, "completed_modules": 4, "last_updated": datetime.utcnow()}
+        ]
+        await state.db.certifications.bulk_write([
+            UpdateOne({"name": cert["name"]}, {"$setOnInsert": cert}, upsert=True)
+            for cert in certifications_data
+        ], ordered=False)
+        
+        await state.db.system_state.update_one(
+            {"_id": "seed"}, {"$setOnInsert": {"seeded_at": datetime.utcnow()}}, upsert=True
+        )
+        logging.info("Database initialized with default data")
     except Exception as e:
         logging.error(f"Error initializing database: {str(e)}")
 
 # Scheduled tasks
-async def generate_agent_activity():
+async def generate_agent_activity(state: State) -> Optional[JobResult]:
     """Generate random agent activities periodically"""
-    try:
-        agents = await db.agents.find().to_list(100)
-        if not agents:
-            return
-            
-        agent = random.choice(agents)
-        actions = [
-            "Analyzed security log patterns",
-            "Updated threat intelligence database",
-            "Completed code review",
-            "Generated compliance report",
-            "Detected anomaly in network traffic",
-            "Optimized system performance",
-            "Updated encryption protocols",
-            "Scanned for vulnerabilities"
-        ]
+    agents = await state.db.agents.aggregate([
+        {"$sample": {"size": 1}},
+        {"$project": {"_id": 0, "agent_id": 1, "name": 1}}
+    ]).to_list(1)
+    if not agents:
+        return None
         
-        activity = Activity(
-            agent_id=agent["agent_id"],
-            action=random.choice(actions),
-            activity_type=random.choice(["info", "success"])
-        )
-        
-        await db.activities.insert_one(activity.dict())
-        
-        # Broadcast to connected clients
-        activity_data = activity.dict()
-        activity_data["agent_name"] = agent["name"]
-        await broadcast_update("new_activity", activity_data)
-        
-    except Exception as e:
-        logging.error(f"Error generating activity: {str(e)}")
+    agent = agents[0]
+    actions = [
+        "Analyzed security log patterns",
+        "Updated threat intelligence database",
+        "Completed code review",
+        "Generated compliance report",
+        "Detected anomaly in network traffic",
+        "Optimized system performance",
+        "Updated encryption protocols",
+        "Scanned for vulnerabilities"
+    ]
+    
+    activity = Activity(
+        agent_id=agent["agent_id"],
+        action=random.choice(actions),
+        activity_type=random.choice(["info", "success"])
+    )
+    
+    # Group-committed by the write-behind buffer
+    await state.activity_store.record(activity.dict())
+    
+    # Broadcast to connected clients
+    activity_data = activity.dict()
+    activity_data["agent_name"] = agent["name"]
+    await broadcast_update(state, "new_activity", activity_data)
+    
+    return JobResult(rows=1)
 
-async def update_certification_progress():
+async def update_certification_progress(state: State) -> Optional[JobResult]:
     """Update certification progress periodically"""
-    try:
-        certs = await db.certifications.find({"status": "in_progress"}).to_list(100)
-        for cert in certs:
-            if cert["progress"] < 100 and random.random() < 0.3:  # 30% chance to progress
-                new_progress = min(100, cert["progress"] + random.randint(1, 5))
-                completed_modules = int((new_progress / 100) * cert["total_modules"])
-                
-                update_data = {
-                    "progress": new_progress,
-                    "completed_modules": completed_modules,
-                    "last_updated": datetime.utcnow()
-                }
-                
-                if new_progress >= 100:
-                    update_data["status"] = "certified"
-                
-                await db.certifications.update_one(
-                    {"name": cert["name"]},
-                    {"$set": update_data}
-                )
-                
-                await broadcast_update("certification_progress", {
-                    "name": cert["name"],
-                    "progress": new_progress,
-                    "status": update_data.get("status", "in_progress")
-                })
-                
-    except Exception as e:
-        logging.error(f"Error updating certifications: {str(e)}")
+    certs = await state.db.certifications.find(
+        {"status": "in_progress"},
+        {"_id": 0, "name": 1, "progress": 1, "total_modules": 1}
+    ).to_list(100)
+    
+    operations = []
+    updates = []
+    for cert in certs:
+        if cert["progress"] < 100 and random.random() < 0.3:  # 30% chance to progress
+            new_progress = min(100, cert["progress"] + random.randint(1, 5))
+            completed_modules = int((new_progress / 100) * cert["total_modules"])
+            
+            update_data = {
+                "progress": new_progress,
+                "completed_modules": completed_modules,
+                "last_updated": datetime.utcnow()
+            }
+            
+            if new_progress >= 100:
+                update_data["status"] = "certified"
+            
+            operations.append(UpdateOne({"name": cert["name"]}, {"$set": update_data}))
+            updates.append({
+                "name": cert["name"],
+                "progress": new_progress,
+                "status": update_data.get("status", "in_progress")
+            })
+    
+    async def broadcast_progress():
+        if updates:
+            state.response_cache.invalidate("certifications")
+        for update in updates:
+            await broadcast_update(state, "certification_progress", update)
+    
+    return JobResult(writes={"certifications": operations}, after_commit=broadcast_progress)
+
+async def prune_activities(state: State) -> Optional[JobResult]:
+    """Delete raw activities past retention when there is no native TTL"""
+    return JobResult(rows=await state.activity_store.prune())
 
 # Agent Endpoints with real-time updates
 @api_router.get("/agents")
-async def get_agents():
+async def get_agents(request: Request, state: State = Depends(get_state)):
     """Get all AI agents with their current status"""
-    agents = await db.agents.find().to_list(100)
+    return await state.response_cache.respond(request, ("agents", "tasks"), partial(load_agents, state))
+
+async def load_agents(state: State):
+    """Agents with the title of their current task"""
+    agents = await state.db.agents.find().to_list(100)
     result = []
     for agent in agents:
         agent.pop('_id', None)
         if agent.get("current_task_id"):
-            task = await db.tasks.find_one({"task_id": agent["current_task_id"]})
+            task = await state.db.tasks.find_one({"task_id": agent["current_task_id"]})
             agent["current_task"] = task.get("title") if task else "Processing task"
         else:
             task_map = {
@@ -295,189 +632,249 @@ async def get_agents():
     return result
 
 @api_router.get("/agents/{agent_id}")
-async def get_agent(agent_id: str):
+async def get_agent(agent_id: str, state: State = Depends(get_state)):
     """Get specific agent details"""
-    agent = await db.agents.find_one({"agent_id": agent_id})
+    agent = await state.db.agents.find_one({"agent_id": agent_id})
     if not agent:
         raise HTTPException(status_code=404, detail="Agent not found")
     return clean_mongo_doc(agent)
 
 @api_router.post("/agents/{agent_id}/chat")
-async def chat_with_agent(agent_id: str, message: ChatMessage):
+async def chat_with_agent(agent_id: str, message: ChatMessage, state: State = Depends(get_state)):
     """Chat with a specific AI agent"""
-    agent_data = await db.agents.find_one({"agent_id": agent_id})
+    agent_data = await state.db.agents.find_one({"agent_id": agent_id})
     if not agent_data:
         raise HTTPException(status_code=404, detail="Agent not found")
     
-    ai_agent = orchestrator.get_agent(agent_id)
+    ai_agent = get_orchestrator(state).get_agent(agent_id)
     if not ai_agent:
         raise HTTPException(status_code=500, detail="Agent not initialized")
     
     try:
-        response = await ai_agent.chat(message.message, message.session_id)
+        session_id = message.session_id or str(uuid.uuid4())
+        context = await state.conversation_store.context(agent_id, session_id)
+        response = await ai_agent.chat(
+            message.message, session_id, history=state.conversation_store.render(context)
+        )
+        if not response.startswith(CHAT_ERROR_PREFIX):
+            await state.conversation_store.append(agent_id, session_id, message.message, response)
         
         activity = Activity(
             agent_id=agent_id,
             action=f"Responded to user query: {message.message[:50]}...",
             activity_type="info"
         )
-        await db.activities.insert_one(activity.dict())
+        await state.activity_store.record(activity.dict())
         
         return ChatResponse(
             response=response,
-            agent_name=agent_data["name"]
+            agent_name=agent_data["name"],
+            session_id=session_id
         )
+    except UsageBudgetExceeded as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    except DeadlineExceeded as e:
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
 
 # Task Endpoints
 @api_router.get("/tasks")
 async def get_tasks(
+    request: Request,
     status: Optional[str] = Query(None),
     priority: Optional[str] = Query(None),
-    agent_id: Optional[str] = Query(None)
+    agent_id: Optional[str] = Query(None),
+    fields: Optional[str] = Query(None),  # comma-separated, "*" for every field
+    state: State = Depends(get_state)
 ):
     """Get all tasks with optional filters"""
-    query = {}
-    if status:
-        query["status"] = status
-    if priority:
-        query["priority"] = priority
-    if agent_id:
-        query["assigned_agent_id"] = agent_id
-    
-    tasks = await db.tasks.find(query).sort("created_at", -1).limit(50).to_list(50)
-    tasks = clean_mongo_docs(tasks)
+    selected = select_fields(TASK_FIELDS, fields)
+    return await state.response_cache.respond(
+        request, ("tasks", "agents"), lambda: load_tasks(state, status, priority, agent_id, selected)
+    )
+
+async def load_tasks(state: State, status: Optional[str], priority: Optional[str], agent_id: Optional[str], selected):
+    """Latest 50 tasks matching the filters, with agent names"""
+    query = task_filter(status, priority, agent_id)
+    projection = TASK_FIELDS.projection(selected)
+    cursor = state.db.tasks.find(query, projection).sort(TASK_LIST_SORT).limit(TASK_LIST_LIMIT)
+    tasks = await cursor.to_list(TASK_LIST_LIMIT)
     
-    for task in tasks:
-        if task.get("assigned_agent_id"):
-            agent = await db.agents.find_one({"agent_id": task["assigned_agent_id"]})
-            task["agent_name"] = agent.get("name") if agent else "Unknown"
+    if "agent_name" in selected:
+        await attach_agent_names(state, tasks, "assigned_agent_id")
+    if "result" in selected:
+        await attach_results(state, tasks)
     
-    return tasks
+    return TASK_FIELDS.trim(tasks, selected)
+
+@api_router.get("/tasks/{task_id}/result")
+async def get_task_result(task_id: str, state: State = Depends(get_state)):
+    """Get the full result of a task"""
+    task = await state.db.tasks.find_one({"task_id": task_id}, {"_id": 0, "task_id": 1, "status": 1, "result": 1})
+    if not task:
+        raise HTTPException(status_code=404, detail="Task not found")
+    if task.get("result") is None:
+        task["result"] = await state.result_store.load(task_id)
+    return task
 
 @api_router.post("/tasks")
-async def create_task(task: TaskCreate):
+async def create_task(task: TaskCreate, state: State = Depends(get_state)):
     """Create a new task and auto-assign to best agent"""
-    task_lower = task.title.lower() + " " + task.description.lower()
-    
-    if any(word in task_lower for word in ["security", "threat", "vulnerability"]):
-        agent_id = "agent-1"
-    elif any(word in task_lower for word in ["code", "develop", "build"]):
-        agent_id = "agent-4"
-    elif any(word in task_lower for word in ["review", "audit"]):
-        agent_id = "agent-5"
-    elif any(word in task_lower for word in ["compliance", "regulation"]):
-        agent_id = "agent-6"
-    else:
-        agent_id = "agent-1"
-    
-    new_task = Task(
-        title=task.title,
-        description=task.description,
-        priority=task.priority,
-        assigned_agent_id=agent_id,
-        status="in_progress",
-        eta_minutes=120
-    )
-    
-    await db.tasks.insert_one(new_task.dict())
-    await db.agents.update_one(
-        {"agent_id": agent_id},
-        {"$set": {"current_task_id": new_task.task_id}}
-    )
+    agent_id, scores = get_task_router(state).route(task.title, task.description)
+    logger.debug(f"Routed task '{task.title}' to {agent_id}: {scores[:3]}")
     
-    # Broadcast new task
-    task_data = new_task.dict()
-    agent = await db.agents.find_one({"agent_id": agent_id})
-    task_data["agent_name"] = agent.get("name") if agent else "Unknown"
-    await broadcast_update("new_task", task_data)
+    try:
+        new_task = Task(
+            title=task.title,
+            description=task.description,
+            priority=task.priority,
+            assigned_agent_id=agent_id,
+            eta_minutes=120
+        )
+        
+        await state.db.tasks.insert_one(new_task.dict())
+        await state.db.agents.update_one(
+            {"agent_id": agent_id},
+            {"$set": {"current_task_id": new_task.task_id}}
+        )
+        await state.timeseries.record("tasks", "created", agent_id, new_task.created_at)
+        state.response_cache.invalidate("tasks", "agents")
+        
+        # Broadcast new task
+        task_data = new_task.dict()
+        agent = await state.db.agents.find_one({"agent_id": agent_id})
+        task_data["agent_name"] = agent.get("name") if agent else "Unknown"
+        await broadcast_update(state, "new_task", task_data)
+    except BaseException:
+        # Failed or cancelled by the deadline before the task was handed off
+        get_task_router(state).release(agent_id)
+        raise
     
-    asyncio.create_task(process_task_background(new_task.task_id, agent_id))
+    # The task outlives this request, so it runs without the request deadline
+    detach(process_task_background(state, new_task.task_id, agent_id))
     return new_task
 
-async def process_task_background(task_id: str, agent_id: str):
-    """Background task processor with real-time progress updates"""
+async def process_task_background(state: State, task_id: str, agent_id: str):
+    """Background task processor reporting progress from real work stages"""
+    reported = {"progress": 0}
+    
+    async def report_progress(stage: str, progress: int, **fields):
+        reported["progress"] = progress
+        await state.db.tasks.update_one(
+            {"task_id": task_id},
+            {"$set": {"stage": stage, "progress": progress, **fields}}
+        )
+        state.response_cache.invalidate("tasks")
+        await broadcast_update(state, "task_progress", {
+            "task_id": task_id, "agent_id": agent_id, "progress": progress, "stage": stage
+        })
+    
     try:
-        task = await db.tasks.find_one({"task_id": task_id})
-        if not task:
-            return
-        
-        ai_agent = orchestrator.get_agent(agent_id)
-        if not ai_agent:
-            return
-        
-        for progress in [25, 50, 75]:
-            await asyncio.sleep(2)
-            await db.tasks.update_one(
-                {"task_id": task_id},
-                {"$set": {"progress": progress}}
+        # Waits while the agent already runs as many tasks as it has slots; the task stays pending
+        async with get_task_router(state).slot(agent_id) as waited:
+            task = await state.db.tasks.find_one({"task_id": task_id}, {"_id": 0, "title": 1, "description": 1})
+            if not task:
+                return
+            
+            ai_agent = get_orchestrator(state).get_agent(agent_id)
+            if not ai_agent:
+                return
+            
+            async def on_stream(fraction: float):
+                # Streaming fills the range between prompt sent and persisted
+                progress = PROGRESS_PROMPT_SENT + int(fraction * (PROGRESS_STREAMED - PROGRESS_PROMPT_SENT))
+                if progress - reported["progress"] >= TASK_PROGRESS_STEP:
+                    await report_progress("streaming", progress)
+            
+            await report_progress(
+                "prompt_sent", PROGRESS_PROMPT_SENT,
+                status="in_progress", started_at=datetime.utcnow(), queue_wait_ms=round(waited * 1000)
             )
-            await broadcast_update("task_progress", {"task_id": task_id, "progress": progress})
+            result = await ai_agent.process_task(task["title"], task["description"], on_progress=on_stream)
         
-        result = await ai_agent.process_task(task["title"], task["description"])
+        # Backends that do not stream reach this stage straight from prompt_sent
+        await report_progress("response_received", PROGRESS_RESPONSE_RECEIVED)
+        await report_progress("result_stored", PROGRESS_RESULT_STORED, **await state.result_store.save(task_id, result))
         
-        await db.tasks.update_one(
+        findings = extract_findings(result)
+        completed_at = datetime.utcnow()
+        await state.db.tasks.update_one(
             {"task_id": task_id},
             {
                 "$set": {
                     "progress": 100,
+                    "stage": "persisted",
                     "status": "completed",
-                    "result": result,
-                    "completed_at": datetime.utcnow()
+                    "findings": findings,
+                    "completed_at": completed_at
                 }
             }
         )
+        await state.timeseries.record_completion(agent_id, findings, completed_at)
         
-        await db.agents.update_one(
+        # Agents run several tasks at once; only clear current_task_id if it is still this task
+        await state.db.agents.update_one(
             {"agent_id": agent_id},
-            {
-                "$set": {"current_task_id": None},
-                "$inc": {"tasks_completed": 1}
-            }
+            [{"$set": {
+                "current_task_id": {"$cond": [{"$eq": ["$current_task_id", task_id]}, None, "$current_task_id"]},
+                "tasks_completed": {"$add": [{"$ifNull": ["$tasks_completed", 0]}, 1]}
+            }}]
         )
+        state.response_cache.invalidate("tasks", "agents")
         
-        agent_data = await db.agents.find_one({"agent_id": agent_id})
+        agent_data = await state.db.agents.find_one({"agent_id": agent_id})
         activity = Activity(
             agent_id=agent_id,
             action=f"Completed task: {task['title']}",
             activity_type="success"
         )
-        await db.activities.insert_one(activity.dict())
+        await state.activity_store.record(activity.dict())
         
-        await broadcast_update("task_completed", {"task_id": task_id, "agent_name": agent_data.get("name")})
+        await broadcast_update(state, "task_completed", {
+            "task_id": task_id, "agent_id": agent_id, "agent_name": agent_data.get("name"),
+            "progress": 100, "stage": "persisted"
+        })
         
     except Exception as e:
         logging.error(f"Error processing task {task_id}: {str(e)}")
-        await db.tasks.update_one(
+        failed_at = datetime.utcnow()
+        await state.db.tasks.update_one(
             {"task_id": task_id},
-            {"$set": {"status": "failed", "result": f"Error: {str(e)}"}}
+            {"$set": {
+                "status": "failed",
+                **await state.result_store.save(task_id, f"Error: {str(e)}"),
+                "failed_at": failed_at
+            }}
         )
+        await state.timeseries.record("tasks", "failed", agent_id, failed_at)
+        state.response_cache.invalidate("tasks")
+        await broadcast_update(state, "task_failed", {"task_id": task_id, "agent_id": agent_id, "error": str(e)})
 
 # Hive Mind Endpoints
 @api_router.get("/hive/messages")
-async def get_hive_messages(limit: int = Query(50)):
+async def get_hive_messages(limit: int = Query(50), state: State = Depends(get_state)):
     """Get recent inter-agent messages"""
-    messages = await db.hive_messages.find().sort("timestamp", -1).limit(limit).to_list(limit)
+    messages = await state.db.hive_messages.find().sort("timestamp", -1).limit(limit).to_list(limit)
     messages = clean_mongo_docs(messages)
     
     for msg in messages:
-        from_agent = await db.agents.find_one({"agent_id": msg["from_agent_id"]})
+        from_agent = await state.db.agents.find_one({"agent_id": msg["from_agent_id"]})
         msg["from_agent_name"] = from_agent.get("name") if from_agent else "System"
         
         if msg["to_agent_id"] == "all":
             msg["to_agent_name"] = "All"
         else:
-            to_agent = await db.agents.find_one({"agent_id": msg["to_agent_id"]})
+            to_agent = await state.db.agents.find_one({"agent_id": msg["to_agent_id"]})
             msg["to_agent_name"] = to_agent.get("name") if to_agent else "Unknown"
     
     return list(reversed(messages))
 
 @api_router.post("/hive/broadcast")
-async def broadcast_to_hive(broadcast: HiveBroadcast):
+async def broadcast_to_hive(broadcast: HiveBroadcast, state: State = Depends(get_state)):
     """User broadcasts message to hive mind"""
     try:
-        result = await orchestrator.broadcast_to_hive(broadcast.message)
+        result = await get_orchestrator(state).broadcast_to_hive(broadcast.message)
         
         hive_msg = HiveMessage(
             from_agent_id="system",
@@ -485,7 +882,7 @@ async def broadcast_to_hive(broadcast: HiveBroadcast):
             message=f"User query: {broadcast.message}",
             message_type="request"
         )
-        await db.hive_messages.insert_one(hive_msg.dict())
+        await state.write_behind.enqueue('hive_messages', hive_msg.dict())
         
         response_msg = HiveMessage(
             from_agent_id=result.get("primary_agent", "agent-1"),
@@ -493,33 +890,37 @@ async def broadcast_to_hive(broadcast: HiveBroadcast):
             message=result["primary_response"][:200] + "...",
             message_type="info"
         )
-        await db.hive_messages.insert_one(response_msg.dict())
+        await state.write_behind.enqueue('hive_messages', response_msg.dict())
         
-        await broadcast_update("new_hive_message", response_msg.dict())
+        await broadcast_update(state, "new_hive_message", response_msg.dict())
         
         return result
+    except UsageBudgetExceeded as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    except DeadlineExceeded as e:
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
 
 # Analytics Endpoints with REAL DATA
 @api_router.get("/analytics/dashboard")
-async def get_dashboard_analytics():
+async def get_dashboard_analytics(state: State = Depends(get_state)):
     """Get comprehensive dashboard analytics from REAL data"""
     try:
-        total_tasks = await db.tasks.count_documents({})
-        completed_tasks = await db.tasks.count_documents({"status": "completed"})
-        in_progress_tasks = await db.tasks.count_documents({"status": "in_progress"})
-        failed_tasks = await db.tasks.count_documents({"status": "failed"})
+        total_tasks = await state.db.tasks.estimated_document_count()
+        completed_tasks = await state.db.tasks.count_documents(task_filter(status="completed"))
+        in_progress_tasks = await state.db.tasks.count_documents(task_filter(status="in_progress"))
+        failed_tasks = await state.db.tasks.count_documents(task_filter(status="failed"))
         
-        agents_data = await db.agents.find().to_list(100)
+        agents_data = await state.db.agents.find().to_list(100)
         total_tasks_completed = sum(agent.get("tasks_completed", 0) for agent in agents_data)
         avg_success_rate = sum(agent.get("success_rate", 0) for agent in agents_data) / len(agents_data) if agents_data else 0
         
         last_24h = datetime.utcnow() - timedelta(hours=24)
-        recent_activities = await db.activities.count_documents({"timestamp": {"$gte": last_24h}})
+        recent_activities = await state.activity_store.count_since(last_24h)
         
-        certified_count = await db.certifications.count_documents({"status": "certified"})
-        in_progress_certs = await db.certifications.count_documents({"status": "in_progress"})
+        certified_count = await state.db.certifications.count_documents({"status": "certified"})
+        in_progress_certs = await state.db.certifications.count_documents({"status": "in_progress"})
         
         return {
             "tasks": {
@@ -546,20 +947,41 @@ async def get_dashboard_analytics():
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
 
+@api_router.get("/analytics/timeseries")
+async def get_analytics_timeseries(
+    request: Request,
+    metric: str = Query("tasks"),  # tasks, activities, findings
+    hours: int = Query(24, ge=1, le=24 * 366),
+    granularity: Optional[str] = Query(None),  # minute, hour, day; finest that fits by default
+    agent_id: Optional[str] = Query(None),
+    state: State = Depends(get_state)
+):
+    """Get task, activity or finding counts per time bucket"""
+    end = datetime.utcnow()
+    start = end - timedelta(hours=hours)
+    try:
+        granularity = resolve_granularity(metric, start, end, granularity)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    # Buckets change only with task, code scan and activity writes, which bump these versions
+    return await state.response_cache.respond(
+        request, ("tasks", "activities", "scans"),
+        lambda: state.timeseries.series(metric, start, end, granularity=granularity, agent_id=agent_id),
+        max_age=METRICS_CACHE_MAX_AGE
+    )
+
 @api_router.get("/analytics/agent-performance")
-async def get_agent_performance():
+async def get_agent_performance(state: State = Depends(get_state)):
     """Get detailed agent performance metrics from REAL data"""
-    global metrics_engine
-    if not metrics_engine:
-        metrics_engine = MetricsEngine(db)
+    metrics_engine = get_metrics_engine(state)
     
-    agents = await db.agents.find().to_list(100)
+    agents = await state.db.agents.find().to_list(100)
     performance_data = []
     
     for agent in agents:
         agent_id = agent["agent_id"]
         
-        agent_tasks = await db.tasks.find({"assigned_agent_id": agent_id}).to_list(1000)
+        agent_tasks = await state.db.tasks.find(task_filter(agent_id=agent_id)).to_list(1000)
         completed = len([t for t in agent_tasks if t.get("status") == "completed"])
         failed = len([t for t in agent_tasks if t.get("status") == "failed"])
         
@@ -593,9 +1015,16 @@ async def get_agent_performance():
 async def global_search(
     query: str = Query(..., min_length=1),
     entity_type: Optional[str] = Query(None),  # tasks, agents, activities
-    limit: int = Query(50, le=100)
+    limit: int = Query(50, le=100),
+    fields: Optional[str] = Query(None),  # entity.field list; bare names with entity_type
+    state: State = Depends(get_state)
 ):
-    """Global search across all entities"""
+    """Global search across all entities; task results match on their preview only"""
+    try:
+        selected = select_qualified(fields, SEARCH_FIELDS, only=entity_type)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
     results = {
         "tasks": [],
         "agents": [],
@@ -606,94 +1035,186 @@ async def global_search(
     search_regex = {"$regex": query, "$options": "i"}
     
     if not entity_type or entity_type == "tasks":
-        tasks = await db.tasks.find({
+        tasks = await state.db.tasks.find({
             "$or": [
                 {"title": search_regex},
                 {"description": search_regex},
+                # Stored results are searchable by their first 280 characters only;
+                # results still inline (not yet migrated) match in full
+                {"result_preview": search_regex},
                 {"result": search_regex}
             ]
-        }).limit(limit).to_list(limit)
-        results["tasks"] = clean_mongo_docs(tasks)
+        }, TASK_FIELDS.projection(selected["tasks"])).limit(limit).to_list(limit)
+        if "agent_name" in selected["tasks"]:
+            await attach_agent_names(state, tasks, "assigned_agent_id")
+        if "result" in selected["tasks"]:
+            await attach_results(state, tasks)
+        results["tasks"] = TASK_FIELDS.trim(tasks, selected["tasks"])
     
     if not entity_type or entity_type == "agents":
-        agents = await db.agents.find({
+        agents = await state.db.agents.find({
             "$or": [
                 {"name": search_regex},
                 {"type": search_regex},
                 {"specialization": {"$elemMatch": search_regex}}
             ]
-        }).limit(limit).to_list(limit)
-        results["agents"] = clean_mongo_docs(agents)
+        }, SEARCH_FIELDS["agents"].projection(selected["agents"])).limit(limit).to_list(limit)
+        results["agents"] = agents
     
     if not entity_type or entity_type == "activities":
-        activities = await db.activities.find({
+        activities = await state.db.activities.find({
             "action": search_regex
-        }).limit(limit).to_list(limit)
-        results["activities"] = clean_mongo_docs(activities)
+        }, ACTIVITY_FIELDS.projection(selected["activities"])).limit(limit).to_list(limit)
+        if "agent_name" in selected["activities"]:
+            await attach_agent_names(state, activities, "agent_id")
+        results["activities"] = ACTIVITY_FIELDS.trim(activities, selected["activities"])
     
     if not entity_type or entity_type == "messages":
-        messages = await db.hive_messages.find({
+        messages = await state.db.hive_messages.find({
             "message": search_regex
-        }).limit(limit).to_list(limit)
-        results["messages"] = clean_mongo_docs(messages)
+        }, SEARCH_FIELDS["messages"].projection(selected["messages"])).limit(limit).to_list(limit)
+        results["messages"] = messages
     
     return results
 
 # Other Endpoints
 @api_router.get("/activities")
-async def get_activities(limit: int = Query(20)):
+async def get_activities(
+    request: Request,
+    limit: int = Query(20),
+    fields: Optional[str] = Query(None),
+    state: State = Depends(get_state)
+):
     """Get recent activities"""
-    activities = await db.activities.find().sort("timestamp", -1).limit(limit).to_list(limit)
-    activities = clean_mongo_docs(activities)
+    selected = select_fields(ACTIVITY_FIELDS, fields)
+    return await state.response_cache.respond(
+        request, ("activities", "agents"), lambda: load_activities(state, limit, selected)
+    )
+
+async def load_activities(state: State, limit: int, selected):
+    """Recent activities with agent names"""
+    activities = await state.activity_store.recent(limit, projection=ACTIVITY_FIELDS.projection(selected))
     
-    for activity in activities:
-        agent = await db.agents.find_one({"agent_id": activity["agent_id"]})
-        activity["agent_name"] = agent.get("name") if agent else "Unknown"
+    if "agent_name" in selected:
+        await attach_agent_names(state, activities, "agent_id")
     
-    return activities
+    return ACTIVITY_FIELDS.trim(activities, selected)
+
+@api_router.get("/activities/rollups")
+async def get_activity_rollups(
+    granularity: str = Query("hour"),
+    hours: int = Query(24, ge=1, le=24 * 366),
+    agent_id: Optional[str] = Query(None),
+    state: State = Depends(get_state)
+):
+    """Get activity counts per hourly or daily bucket"""
+    if granularity not in GRANULARITIES:
+        raise HTTPException(status_code=400, detail=f"granularity must be one of {', '.join(GRANULARITIES)}")
+    start = datetime.utcnow() - timedelta(hours=hours)
+    return await state.activity_store.rollup_series(granularity, start, agent_id=agent_id)
 
 @api_router.get("/certifications")
-async def get_certifications():
+async def get_certifications(request: Request, state: State = Depends(get_state)):
     """Get all certifications with progress"""
-    certifications = await db.certifications.find().to_list(100)
+    return await state.response_cache.respond(request, ("certifications",), partial(load_certifications, state))
+
+async def load_certifications(state: State):
+    """All certifications"""
+    certifications = await state.db.certifications.find().to_list(100)
     return clean_mongo_docs(certifications)
 
 @api_router.get("/metrics/security")
-async def get_security_metrics():
+async def get_security_metrics(request: Request, state: State = Depends(get_state)):
     """Get REAL security metrics calculated from actual data"""
-    global metrics_engine
-    if not metrics_engine:
-        metrics_engine = MetricsEngine(db)
-    return await metrics_engine.calculate_security_metrics()
+    return await state.response_cache.respond(
+        request, ("tasks", "activities"), get_metrics_engine(state).calculate_security_metrics,
+        max_age=METRICS_CACHE_MAX_AGE
+    )
 
 @api_router.get("/metrics/development")
-async def get_development_metrics():
+async def get_development_metrics(request: Request, state: State = Depends(get_state)):
     """Get REAL development metrics calculated from actual data"""
-    global metrics_engine
-    if not metrics_engine:
-        metrics_engine = MetricsEngine(db)
-    return await metrics_engine.calculate_development_metrics()
+    return await state.response_cache.respond(
+        request, ("tasks",), get_metrics_engine(state).calculate_development_metrics,
+        max_age=METRICS_CACHE_MAX_AGE
+    )
+
+async def check_system_health(state: State):
+    """Database, task queue, agent and error health; run by the health monitor"""
+    return await get_metrics_engine(state).get_system_health()
+
+@api_router.get("/health/live")
+async def liveness_probe(state: State = Depends(get_state)):
+    """Liveness probe; answered without I/O"""
+    return state.health_monitor.live()
+
+@api_router.get("/health/ready")
+async def readiness_probe(state: State = Depends(get_state)):
+    """Readiness probe from the cached health snapshot"""
+    ready, body = state.health_monitor.ready()
+    return JSONResponse(status_code=200 if ready else 503, content=body)
 
 @api_router.get("/health")
-async def health_check():
+async def health_check(state: State = Depends(get_state)):
     """System health check with REAL metrics"""
-    global metrics_engine
-    if not metrics_engine:
-        metrics_engine = MetricsEngine(db)
-    
     try:
-        health_data = await metrics_engine.get_system_health()
+        # Detailed diagnostics run the checks now and refresh the probe snapshot
+        health_data = await state.health_monitor.refresh()
         return {
             **health_data,
-            "agents": len(orchestrator.get_all_agents()),
-            "active_websockets": len(active_connections)
+            "agents": len(get_orchestrator(state).get_all_agents()),
+            "active_websockets": len(state.active_connections),
+            "write_behind": state.write_behind.stats(),
+            "response_cache": state.response_cache.stats(),
+            "conversations": state.conversation_store.stats(),
+            "task_results": state.result_store.stats(),
+            "analytics": state.timeseries.stats(),
+            "llm_usage": state.usage_accountant.stats(),
+            "llm_providers": state.provider_pool.stats(),
+            "startup": state.startup_report,
+            "health_monitor": state.health_monitor.stats()
         }
     except Exception as e:
         raise HTTPException(status_code=503, detail=f"Service unhealthy: {str(e)}")
 
+@api_router.get("/metrics")
+async def get_prometheus_metrics():
+    """Prometheus text exposition of route, Mongo, LLM, scheduler and Socket.IO metrics"""
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+@api_router.get("/usage")
+async def get_llm_usage(
+    hours: int = Query(24, ge=1, le=24 * 90),
+    agent_id: Optional[str] = None,
+    state: State = Depends(get_state)
+):
+    """LLM calls, tokens, wall time and estimated cost per agent, provider, model and call kind"""
+    return await state.usage_accountant.summary(hours=hours, agent_id=agent_id)
+
+@api_router.get("/routing/stats")
+async def get_routing_stats(state: State = Depends(get_state)):
+    """Per-agent queue depth, running tasks, latency and queue wait on this worker"""
+    return get_task_router(state).stats()
+
+@api_router.get("/jobs")
+async def get_job_stats(state: State = Depends(get_state)):
+    """Scheduled job runs, durations and row counts on this worker"""
+    return state.job_runner.stats()
+
+@api_router.get("/realtime/stats")
+async def get_realtime_stats(state: State = Depends(get_state)):
+    """Real-time delivery statistics for this worker"""
+    return {
+        "active_websockets": len(state.active_connections),
+        "coalescer": state.event_coalescer.stats(),
+        "topics": state.topic_router.stats(),
+        "outbound_queues": state.outbound_queues.stats(),
+        "bus": state.client_manager.stats() if state.client_manager else {"backend": "memory"}
+    }
+
 # Security Scanning Endpoints
 @api_router.post("/security/scan-code")
-async def scan_code(data: dict):
+async def scan_code(data: dict, state: State = Depends(get_state)):
     """Scan code for vulnerabilities"""
     code = data.get('code', '')
     language = data.get('language', 'python')
@@ -701,7 +1222,21 @@ async def scan_code(data: dict):
     if not code:
         raise HTTPException(status_code=400, detail="Code is required")
     
-    result = await security_analyzer.scan_code(code, language)
+    result = await get_security_analyzer(state).scan_code(code, language)
+    
+    # Kept so the findings series can be rebuilt by the analytics backfill
+    scanned_at = datetime.utcnow()
+    severities = dict(Counter(v['severity'] for v in result['vulnerabilities']))
+    await state.db.code_scans.insert_one({
+        "scan_id": str(uuid.uuid4()),
+        "agent_id": "agent-1",
+        "language": language,
+        "total_found": result['total_found'],
+        "severities": severities,
+        "timestamp": scanned_at
+    })
+    await state.timeseries.record_scan("agent-1", severities, scanned_at)
+    state.response_cache.invalidate("scans")
     
     # Log scan as activity
     activity = Activity(
@@ -709,14 +1244,14 @@ async def scan_code(data: dict):
         action=f"Scanned {language} code - found {result['total_found']} vulnerabilities",
         activity_type="alert" if result['total_found'] > 0 else "success"
     )
-    await db.activities.insert_one(activity.dict())
+    await state.activity_store.record(activity.dict())
     
     return result
 
 @api_router.post("/security/detect-threats")
-async def detect_threats(data: dict):
+async def detect_threats(data: dict, state: State = Depends(get_state)):
     """Real-time threat detection"""
-    result = await security_analyzer.detect_threats(data)
+    result = await get_security_analyzer(state).detect_threats(data)
     
     if result['threats_detected'] > 0:
         activity = Activity(
@@ -724,35 +1259,67 @@ async def detect_threats(data: dict):
             action=f"Detected {result['threats_detected']} threats - Risk: {result['risk_level']}",
             activity_type="alert"
         )
-        await db.activities.insert_one(activity.dict())
+        await state.activity_store.record(activity.dict())
     
     return result
 
 @api_router.post("/security/analyze-traffic")
-async def analyze_traffic(data: dict):
+async def analyze_traffic(data: dict, state: State = Depends(get_state)):
     """Analyze network traffic"""
     traffic_data = data.get('traffic', [])
-    result = await security_analyzer.analyze_network_traffic(traffic_data)
+    result = await get_security_analyzer(state).analyze_network_traffic(traffic_data)
     
     return result
 
+def parse_compliance_body(model, data: dict):
+    """Validate a compliance request body, answering 400 instead of a 500 deep in the analyzer"""
+    try:
+        return model(**data)
+    except ValidationError as e:
+        errors = [f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in e.errors()[:10]]
+        raise HTTPException(status_code=400, detail=f"Invalid compliance request: {'; '.join(errors)}")
+
 @api_router.post("/security/check-compliance")
-async def check_compliance(data: dict):
+async def check_compliance(data: dict, state: State = Depends(get_state)):
     """Check compliance with standards"""
-    system_config = data.get('config', {})
-    standards = data.get('standards', ['GDPR', 'HIPAA', 'SOC2', 'ISO27001'])
+    body = parse_compliance_body(ComplianceCheck, data)
     
-    result = await security_analyzer.check_compliance(system_config, standards)
+    result = await get_security_analyzer(state).check_compliance(body.config or {}, body.standards)
     
     activity = Activity(
         agent_id="agent-6",  # Guardian
         action=f"Compliance check: {result['overall_score']:.1f}% compliant",
         activity_type="success" if result['overall_score'] >= 80 else "warning"
     )
-    await db.activities.insert_one(activity.dict())
+    await state.activity_store.record(activity.dict())
     
     return result
 
+@api_router.post("/security/check-compliance/batch")
+async def check_compliance_batch(data: dict, state: State = Depends(get_state)):
+    """Check compliance for a fleet of hosts in one request"""
+    # Checked before validation so an oversized fleet is not parsed host by host
+    if isinstance(data.get('hosts'), list) and len(data['hosts']) > MAX_COMPLIANCE_BATCH_HOSTS:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_COMPLIANCE_BATCH_HOSTS} hosts per batch")
+    body = parse_compliance_body(ComplianceBatch, data)
+    hosts = [host.dict() for host in body.hosts]
+
+    result = await get_security_analyzer(state).check_compliance_batch(hosts, body.standards)
+    fleet = result['fleet']
+
+    # One summarized activity for the whole fleet
+    activity = Activity(
+        agent_id="agent-6",  # Guardian
+        action=(
+            f"Fleet compliance check: {fleet['total_hosts']} hosts, "
+            f"{fleet['average_score']:.1f}% average, {fleet['fully_compliant_hosts']} fully compliant"
+        ),
+        activity_type="success" if fleet['average_score'] >= 80 else "warning"
+    )
+    await state.activity_store.record(activity.dict())
+
+    return result
+
 @api_router.get("/")
 async def root():
     return {
@@ -768,18 +1335,6 @@ async def root():
         ]
     }
 
-# Include router
-app.include_router(api_router)
-
-# CORS
-app.add_middleware(
-    CORSMiddleware,
-    allow_credentials=True,
-    allow_origins=["*"],
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -787,20 +1342,128 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Seeding default agents and certifications is skipped entirely when false
+SEED_DATABASE = os.environ.get('SEED_DATABASE', 'true') == 'true'
+
+async def timed_phase(phases: dict, name: str, awaitable):
+    started = time.perf_counter()
+    result = await awaitable
+    phases[name] = round((time.perf_counter() - started) * 1000, 1)
+    startup_duration.set(phases[name] / 1000, phase=name)
+    return result
+
+async def migrate_task_results(state: State):
+    """Move inline results out of the tasks collection"""
+    migrated = await state.result_store.migrate_inline()
+    if migrated:
+        state.response_cache.invalidate("tasks")
+    return migrated
+
+async def migrate_task_findings(state: State):
+    """Extract findings for completed tasks that have none or an older version"""
+    backfilled = await backfill_findings(state.db, state.result_store)
+    if backfilled:
+        state.response_cache.invalidate("tasks")
+    return backfilled
+
+async def backfill_activity_rollups(state: State):
+    """Count activities from before rollups existed into the rollup buckets"""
+    buckets = await state.activity_store.backfill_rollups()
+    if buckets:
+        state.response_cache.invalidate("activities")
+    return buckets
+
+async def backfill_analytics(state: State):
+    """Count tasks, code scans and activities from before the time series existed into its buckets"""
+    # Completed tasks are counted with their findings, so extract any that are missing first
+    await backfill_findings(state.db, state.result_store)
+    buckets = await state.timeseries.backfill()
+    if buckets:
+        state.response_cache.invalidate("tasks", "activities", "scans")
+    return buckets
+
 # Startup/Shutdown events
-@app.on_event("startup")
-async def startup_db_client():
-    await initialize_database()
+async def startup_db_client(state: State):
+    started = time.perf_counter()
+    phases = {}
+    # The tokenizer loads (or downloads) in a thread; token counts are estimated meanwhile
+    detach(warm_encoding())
+    await timed_phase(phases, "activity_collection", state.activity_store.ensure_collection())
+    await timed_phase(phases, "indexes", ensure_indexes(state.db))
+    await timed_phase(phases, "analytics_marker", state.timeseries.mark_started())
+    if SEED_DATABASE:
+        await timed_phase(phases, "seed", initialize_database(state))
     
-    # Start scheduled tasks
-    scheduler.add_job(generate_agent_activity, 'interval', seconds=30)
-    scheduler.add_job(update_certification_progress, 'interval', minutes=2)
-    scheduler.start()
+    # Start scheduled tasks; one-time migrations run on the leader only
+    job_runner = state.job_runner
+    job_runner.add_migration('migrate_task_results', partial(migrate_task_results, state))
+    job_runner.add_migration('migrate_task_findings', partial(migrate_task_findings, state), version=FINDINGS_VERSION)
+    job_runner.add_migration('backfill_activity_rollups', partial(backfill_activity_rollups, state))
+    job_runner.add_migration('backfill_analytics', partial(backfill_analytics, state))
+    job_runner.add_job('generate_agent_activity', partial(generate_agent_activity, state), seconds=30)
+    job_runner.add_job('update_certification_progress', partial(update_certification_progress, state), minutes=2)
+    job_runner.add_job('prune_activities', partial(prune_activities, state), hours=1)
+    job_runner.start()
+    state.write_behind.start()
+    state.event_coalescer.start()
+    state.outbound_queues.start()
+    state.health_monitor.start()
     
-    logger.info("AI Agent system initialized with real-time features")
+    total = round((time.perf_counter() - started) * 1000, 1)
+    startup_duration.set(total / 1000, phase="startup")
+    state.startup_report.update({"import_ms": IMPORT_MS, "startup_ms": total, "phases": phases})
+    logger.info(
+        f"AI Agent system initialized with real-time features in {total} ms "
+        f"(import {IMPORT_MS} ms; " + ", ".join(f"{name} {ms} ms" for name, ms in phases.items()) + ")"
+    )
 
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    scheduler.shutdown()
-    client.close()
+async def shutdown_db_client(state: State):
+    await state.health_monitor.stop()
+    await state.job_runner.shutdown()
+    await state.event_coalescer.stop()
+    await state.outbound_queues.stop()
+    await state.write_behind.stop()
+    state.client.close()
     logger.info("System shutdown complete")
+
+def create_app() -> FastAPI:
+    """Build a FastAPI app with its own Mongo client, stores, Socket.IO server and routes"""
+    # Nothing is built at import; Motor connects on the first operation, during startup, and
+    # agents and analyzers are created on first use
+    app = FastAPI(title="AI Cyber Security & Development Company API", version="2.0.0")
+    build_state(app.state)
+    app.middleware("http")(record_request_latency)
+    app.add_middleware(
+        DeadlineMiddleware,
+        router=app.router,
+        default_timeout=float(os.environ.get('REQUEST_TIMEOUT_SECONDS', '30')),
+        route_timeouts={
+            "/api/agents/{agent_id}/chat": LLM_REQUEST_TIMEOUT,
+            "/api/hive/broadcast": LLM_REQUEST_TIMEOUT
+        },
+        max_timeout=float(os.environ.get('REQUEST_MAX_TIMEOUT_SECONDS', '300'))
+    )
+    app.add_exception_handler(DeadlineExceeded, deadline_exceeded_handler)
+    
+    # Include router
+    app.include_router(api_router)
+    
+    # CORS
+    app.add_middleware(
+        CORSMiddleware,
+        allow_credentials=True,
+        allow_origins=["*"],
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+    
+    app.add_event_handler("startup", partial(startup_db_client, app.state))
+    app.add_event_handler("shutdown", partial(shutdown_db_client, app.state))
+    return app
+
+def create_socket_app() -> socketio.ASGIApp:
+    """A new app behind its Socket.IO server, for serving HTTP and WebSocket on one port"""
+    app = create_app()
+    return socketio.ASGIApp(app.state.sio, app)
+
+IMPORT_MS = round((time.perf_counter() - IMPORT_STARTED) * 1000, 1)
@@ -0,0 +1,66 @@
+"""
+Structured findings extracted from task results
+Each result is parsed once when its task completes, and metrics aggregate the stored
+fields instead of rescanning result text on every poll
+"""
+import logging
+import re
+from typing import Any, Dict
+
+logger = logging.getLogger(__name__)
+
+# Bump when extraction changes; tasks with an older version are backfilled once by the leader
+FINDINGS_VERSION = 1
+
+QUALITY_WORDS = ('excellent', 'comprehensive', 'thorough', 'detailed')
+SEVERITIES = ('critical', 'high', 'medium', 'low')
+
+# Completed tasks whose findings are missing or older, as two index ranges instead of an unindexable $ne
+STALE_FINDINGS = {'status': 'completed', '$or': [
+    {'findings.version': None},
+    {'findings.version': {'$lt': FINDINGS_VERSION}}
+]}
+
+_SEVERITY = re.compile(
+    r'\b(critical|high|medium|low)[- ](?:severity|risk)\b|\bseverity\W{0,3}(critical|high|medium|low)\b',
+    re.IGNORECASE
+)
+
+
+def extract_findings(text: str) -> Dict[str, Any]:
+    """Findings, fix and quality indicators of one task result"""
+    lowered = (text or '').lower()
+    vulnerabilities = lowered.count('vulnerability')
+    fixed = 'fixed' in lowered or 'resolved' in lowered
+    tags = {(a or b).lower() for a, b in _SEVERITY.findall(lowered)}
+    return {
+        'version': FINDINGS_VERSION,
+        'vulnerabilities': vulnerabilities,
+        # A result that reports a fix counts every vulnerability it mentions as fixed
+        'fixed': vulnerabilities if fixed else 0,
+        'quality_indicators': [word for word in QUALITY_WORDS if word in lowered],
+        'severity_tags': [severity for severity in SEVERITIES if severity in tags]
+    }
+
+
+async def backfill_findings(db, results, batch_size: int = 100) -> int:
+    """Extract findings for completed tasks that have none or an older version"""
+    backfilled = 0
+    while True:
+        tasks = await db.tasks.find(
+            STALE_FINDINGS,
+            {'_id': 0, 'task_id': 1, 'result': 1}
+        ).limit(batch_size).to_list(batch_size)
+        if not tasks:
+            break
+        stored = await results.load_many(t['task_id'] for t in tasks if t.get('result') is None)
+        for task in tasks:
+            text = task.get('result') or stored.get(task['task_id'], '')
+            await db.tasks.update_one(
+                {'task_id': task['task_id']},
+                {'$set': {'findings': extract_findings(text)}}
+            )
+        backfilled += len(tasks)
+    if backfilled:
+        logger.info(f"Extracted findings for {backfilled} completed tasks")
+    return backfilled
@@ -0,0 +1,24 @@
+"""
+Task list query shapes
+Shared by the task routes and the index registry, so the plans verified by
+backend_index_test.py are the queries the routes actually send
+"""
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo import DESCENDING
+
+TASK_LIST_SORT: List[Tuple[str, int]] = [('created_at', DESCENDING)]
+TASK_LIST_LIMIT = 50
+
+
+def task_filter(status: Optional[str] = None, priority: Optional[str] = None,
+                agent_id: Optional[str] = None) -> Dict[str, Any]:
+    """Tasks matching whichever of status, priority and assigned agent are given"""
+    query: Dict[str, Any] = {}
+    if status:
+        query['status'] = status
+    if priority:
+        query['priority'] = priority
+    if agent_id:
+        query['assigned_agent_id'] = agent_id
+    return query
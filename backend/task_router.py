@@ -0,0 +1,158 @@
+"""
+Load-aware task routing across agents
+Scores agents by specialization match, current load and recent latency, and
+bounds how many tasks each agent runs at once
+"""
+import asyncio
+import logging
+import re
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+STEM_LENGTH = 6
+STOPWORDS = {'and', 'the', 'for', 'with', 'dev', 'top'}
+
+# Task vocabulary that points at an agent type beyond its specialization names
+KEYWORD_HINTS = {
+    'Security Analyst': ['security', 'threat', 'vulnerability', 'attack', 'incident', 'siem', 'logs'],
+    'Penetration Tester': ['pentest', 'penetration', 'exploit', 'owasp', 'scan'],
+    'Cryptography Expert': ['encrypt', 'crypto', 'key', 'certificate', 'tls'],
+    'Software Developer': ['code', 'develop', 'build', 'deploy', 'implement', 'api', 'pipeline'],
+    'Code Reviewer': ['review', 'audit', 'static', 'quality'],
+    'Compliance Expert': ['compliance', 'regulation', 'gdpr', 'hipaa', 'soc', 'iso', 'policy']
+}
+HINT_WEIGHT = 0.5
+
+# Score = match * SPECIALIZATION_WEIGHT - load * LOAD_WEIGHT - relative latency * LATENCY_WEIGHT
+SPECIALIZATION_WEIGHT = 1.0
+LOAD_WEIGHT = 0.5
+LATENCY_WEIGHT = 0.2
+
+
+def stems(text: str) -> List[str]:
+    """Lower-cased word prefixes"""
+    words = re.findall(r'[a-z0-9]+', text.lower())
+    return [word[:STEM_LENGTH] for word in words if len(word) > 2 and word not in STOPWORDS]
+
+
+def stem_matches(stem: str, text_stems: set) -> bool:
+    """Exact or prefix match, so 'test' matches 'Testing' and 'encrypt' matches 'Encryption'"""
+    if stem in text_stems:
+        return True
+    return any(
+        min(len(stem), len(other)) >= 4 and (other.startswith(stem) or stem.startswith(other))
+        for other in text_stems
+    )
+
+
+class AgentLoad:
+    """Routing state of one agent on this worker"""
+
+    def __init__(self, agent_id: str, terms: List[List[str]], hints: List[str], capacity: int,
+                 initial_latency: float):
+        self.agent_id = agent_id
+        self.terms = terms  # each specialization as a list of stems
+        self.hints = hints
+        self.queued = 0
+        self.running = 0
+        self.latency = initial_latency  # moving average task duration, seconds
+        self.completed = 0
+        self.total_wait = 0.0
+        self.slots = asyncio.Semaphore(capacity)
+
+
+class TaskRouter:
+    """Dispatches tasks to the best-scoring agent and queues them behind its capacity"""
+
+    def __init__(self, agents: Iterable[Any], capacity: int = 2, initial_latency: float = 30.0):
+        self.capacity = capacity
+        self.agents: Dict[str, AgentLoad] = {}
+        for agent in agents:
+            self.register_agent(agent.agent_id, agent.agent_type, agent.specialization, initial_latency)
+
+    def register_agent(self, agent_id: str, agent_type: str, specialization: List[str],
+                       initial_latency: float = 30.0):
+        terms = [stems(term) for term in list(specialization) + [agent_type]]
+        hints = [stem for word in KEYWORD_HINTS.get(agent_type, []) for stem in stems(word)]
+        self.agents[agent_id] = AgentLoad(
+            agent_id, [t for t in terms if t], hints, self.capacity, initial_latency
+        )
+
+    def specialization_match(self, agent: AgentLoad, text_stems: set) -> float:
+        """Share of an agent's specializations mentioned by the task, best term counted double"""
+        match = 0.0
+        if agent.terms:
+            coverage = [sum(1 for stem in term if stem_matches(stem, text_stems)) / len(term) for term in agent.terms]
+            match = (sum(coverage) + max(coverage)) / len(agent.terms)
+        if any(stem_matches(hint, text_stems) for hint in agent.hints):
+            match += HINT_WEIGHT
+        return min(1.0, match)
+
+    def score(self, title: str, description: str = "") -> List[Dict[str, Any]]:
+        """Every agent's score for a task, best first"""
+        text_stems = set(stems(f"{title} {description}"))
+        slowest = max((agent.latency for agent in self.agents.values()), default=1.0) or 1.0
+        scores = []
+        for agent in self.agents.values():
+            match = self.specialization_match(agent, text_stems)
+            load = (agent.running + agent.queued) / self.capacity
+            latency = agent.latency / slowest
+            scores.append({
+                'agent_id': agent.agent_id,
+                'score': round(match * SPECIALIZATION_WEIGHT - load * LOAD_WEIGHT - latency * LATENCY_WEIGHT, 4),
+                'match': round(match, 4),
+                'load': round(load, 4),
+                'latency_s': round(agent.latency, 2)
+            })
+        scores.sort(key=lambda entry: entry['score'], reverse=True)
+        return scores
+
+    def route(self, title: str, description: str = "") -> Tuple[str, List[Dict[str, Any]]]:
+        """Pick the best agent and count the task against its queue right away"""
+        scores = self.score(title, description)
+        agent_id = scores[0]['agent_id']
+        self.agents[agent_id].queued += 1
+        return agent_id, scores
+
+    def release(self, agent_id: str):
+        """Give back a route() reservation whose task never reached slot()"""
+        self.agents[agent_id].queued -= 1
+
+    @asynccontextmanager
+    async def slot(self, agent_id: str):
+        """Wait for one of the agent's execution slots, then run; records wait and latency"""
+        agent = self.agents[agent_id]
+        queued_at = time.perf_counter()
+        try:
+            await agent.slots.acquire()
+        finally:
+            agent.queued -= 1
+        started = time.perf_counter()
+        agent.total_wait += started - queued_at
+        agent.running += 1
+        try:
+            yield started - queued_at
+        finally:
+            agent.running -= 1
+            agent.slots.release()
+            agent.completed += 1
+            agent.latency = 0.8 * agent.latency + 0.2 * (time.perf_counter() - started)
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth, running tasks and latency per agent"""
+        return {
+            'capacity_per_agent': self.capacity,
+            'agents': {
+                agent.agent_id: {
+                    'queued': agent.queued,
+                    'running': agent.running,
+                    'completed': agent.completed,
+                    'latency_s': round(agent.latency, 2),
+                    'avg_wait_s': round(agent.total_wait / agent.completed, 3) if agent.completed else 0
+                }
+                for agent in self.agents.values()
+            }
+        }
@@ -0,0 +1,242 @@
+"""
+LLM token and cost accounting
+Counts prompt and completion tokens per call, aggregates them with wall time and estimated
+cost into hourly buckets, and enforces per-request and per-period budgets
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from pymongo import ReturnDocument
+
+try:
+    import tiktoken
+except ImportError:  # Counts fall back to the characters-per-token estimate
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+CHARS_PER_TOKEN = 4
+TOKEN_ENCODING = 'o200k_base'  # OpenAI's encoding; a close estimate for the other providers
+
+# USD per million tokens: (prompt, completion)
+PRICING: Dict[str, tuple] = {
+    'gpt-5': (1.25, 10.0),
+    'claude-4-sonnet-20250514': (3.0, 15.0),
+    'gemini-2.5-pro': (1.25, 10.0)
+}
+DEFAULT_PRICING = (3.0, 15.0)
+
+PERIODS = ('hour', 'day')
+OVER_BUDGET_ACTIONS = ('reject', 'truncate')
+
+_encoding = None
+_encoding_failed = False
+
+
+def _get_encoding():
+    global _encoding, _encoding_failed
+    if _encoding is None and tiktoken is not None and not _encoding_failed:
+        try:
+            _encoding = tiktoken.get_encoding(TOKEN_ENCODING)
+        except Exception as e:
+            # The encoding is downloaded on first use; offline hosts estimate instead
+            _encoding_failed = True
+            logger.warning(f"tiktoken encoding unavailable, estimating tokens from length: {str(e)}")
+    return _encoding
+
+
+async def warm_encoding():
+    """Load the tiktoken encoding off the event loop; counts are estimated until it is ready"""
+    await asyncio.to_thread(_get_encoding)
+
+
+def count_tokens(text: str) -> int:
+    """Token count with tiktoken once loaded, or about four characters per token"""
+    if not text:
+        return 0
+    encoding = _encoding
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    """Keep the last max_tokens of text, where the current message sits"""
+    encoding = _encoding
+    if encoding is not None:
+        tokens = encoding.encode(text, disallowed_special=())
+        return text if len(tokens) <= max_tokens else encoding.decode(tokens[-max_tokens:])
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    return text if len(text) <= max_chars else text[-max_chars:]
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    """Estimated USD cost of one call"""
+    prompt_price, completion_price = PRICING.get(model, DEFAULT_PRICING)
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1_000_000
+
+
+def period_start(timestamp: datetime, period: str) -> datetime:
+    start = timestamp.replace(minute=0, second=0, microsecond=0)
+    return start.replace(hour=0) if period == 'day' else start
+
+
+def summary_filter(since: datetime, agent_id: Optional[str] = None) -> Dict[str, Any]:
+    """Hourly usage buckets from since's hour on"""
+    match: Dict[str, Any] = {'bucket': {'$gte': period_start(since, 'hour')}}
+    if agent_id:
+        match['agent_id'] = agent_id
+    return match
+
+
+class UsageBudgetExceeded(Exception):
+    """Prompt refused before it was sent because a usage budget is exhausted"""
+
+    def __init__(self, reason: str):
+        self.reason = reason
+        super().__init__(f"Usage budget exceeded: {reason}")
+
+
+class UsageAccountant:
+    """Budget checks before each LLM call and aggregated usage after it"""
+
+    def __init__(self, db, max_prompt_tokens: int = 0, period: str = 'day', period_budget_usd: float = 0.0,
+                 over_budget: str = 'reject', retention_days: int = 90):
+        if period not in PERIODS:
+            raise ValueError(f"Unknown usage period {period!r}; expected one of {', '.join(PERIODS)}")
+        if over_budget not in OVER_BUDGET_ACTIONS:
+            raise ValueError(f"Unknown over-budget action {over_budget!r}; expected one of {', '.join(OVER_BUDGET_ACTIONS)}")
+        self.db = db
+        self.max_prompt_tokens = max_prompt_tokens  # 0 = unlimited
+        self.period = period
+        self.period_budget_usd = period_budget_usd  # 0 = unlimited
+        self.over_budget = over_budget
+        self.retention = timedelta(days=retention_days)
+
+        # Spend of the current period across workers, as of this worker's last recorded call
+        self._period_key: Optional[datetime] = None
+        self._period_cost = 0.0
+        self._stats = {'calls': 0, 'rejected': 0, 'truncated': 0, 'record_errors': 0}
+
+    @property
+    def buckets(self):
+        return self.db.usage_buckets
+
+    @property
+    def periods(self):
+        return self.db.usage_periods
+
+    async def period_cost(self) -> float:
+        """Estimated spend so far in the current budget period"""
+        current = period_start(datetime.utcnow(), self.period)
+        if self._period_key != current:
+            doc = await self.periods.find_one({'period': self.period, 'start': current}, {'_id': 0, 'cost_usd': 1})
+            self._period_key = current
+            self._period_cost = doc['cost_usd'] if doc else 0.0
+        return self._period_cost
+
+    async def admit(self, text: str) -> str:
+        """Prompt text to send, truncated if allowed; raises UsageBudgetExceeded otherwise"""
+        if self.period_budget_usd and await self.period_cost() >= self.period_budget_usd:
+            self._stats['rejected'] += 1
+            raise UsageBudgetExceeded(f"budget of ${self.period_budget_usd:.2f} for this {self.period} spent")
+
+        if self.max_prompt_tokens:
+            tokens = count_tokens(text)
+            if tokens > self.max_prompt_tokens:
+                if self.over_budget == 'reject':
+                    self._stats['rejected'] += 1
+                    raise UsageBudgetExceeded(f"prompt of {tokens} tokens over the {self.max_prompt_tokens} token limit")
+                self._stats['truncated'] += 1
+                text = truncate_tokens(text, self.max_prompt_tokens)
+        return text
+
+    async def record(self, agent_id: str, provider: str, model: str, kind: str, prompt: str,
+                     completion: str, seconds: float, error: bool = False) -> Dict[str, Any]:
+        """Add one call to its hourly bucket and to the current budget period"""
+        self._stats['calls'] += 1
+        now = datetime.utcnow()
+        prompt_tokens = count_tokens(prompt)
+        completion_tokens = count_tokens(completion)
+        cost = estimate_cost(model, prompt_tokens, completion_tokens)
+        usage = {
+            'calls': 1,
+            'errors': 1 if error else 0,
+            'prompt_tokens': prompt_tokens,
+            'completion_tokens': completion_tokens,
+            'duration_s': seconds,
+            'cost_usd': cost
+        }
+        try:
+            bucket = period_start(now, 'hour')
+            await self.buckets.update_one(
+                {'bucket': bucket, 'agent_id': agent_id, 'provider': provider, 'model': model, 'kind': kind},
+                {'$inc': usage, '$setOnInsert': {'expires_at': bucket + self.retention}},
+                upsert=True
+            )
+            start = period_start(now, self.period)
+            period = await self.periods.find_one_and_update(
+                {'period': self.period, 'start': start},
+                {'$inc': {'cost_usd': cost, 'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens},
+                 '$setOnInsert': {'expires_at': start + self.retention}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+                projection={'_id': 0, 'cost_usd': 1}
+            )
+            self._period_key = start
+            self._period_cost = period['cost_usd']
+        except Exception as e:
+            # Accounting never fails the LLM call it describes
+            self._stats['record_errors'] += 1
+            logger.error(f"Error recording LLM usage: {str(e)}")
+        return usage
+
+    async def summary(self, hours: int = 24, agent_id: Optional[str] = None) -> Dict[str, Any]:
+        """Usage totals per agent, provider, model and call kind over the last hours"""
+        rows: List[Dict[str, Any]] = await self.buckets.aggregate([
+            {'$match': summary_filter(datetime.utcnow() - timedelta(hours=hours), agent_id)},
+            {'$group': {
+                '_id': {'agent_id': '$agent_id', 'provider': '$provider', 'model': '$model', 'kind': '$kind'},
+                'calls': {'$sum': '$calls'},
+                'errors': {'$sum': '$errors'},
+                'prompt_tokens': {'$sum': '$prompt_tokens'},
+                'completion_tokens': {'$sum': '$completion_tokens'},
+                'duration_s': {'$sum': '$duration_s'},
+                'cost_usd': {'$sum': '$cost_usd'}
+            }},
+            {'$sort': {'cost_usd': -1}}
+        ]).to_list(None)
+
+        breakdown = []
+        for row in rows:
+            calls = row['calls'] or 1
+            breakdown.append({
+                **row['_id'],
+                'calls': row['calls'],
+                'errors': row['errors'],
+                'prompt_tokens': row['prompt_tokens'],
+                'completion_tokens': row['completion_tokens'],
+                'avg_prompt_tokens': round(row['prompt_tokens'] / calls, 1),
+                'avg_duration_s': round(row['duration_s'] / calls, 3),
+                'cost_usd': round(row['cost_usd'], 6)
+            })
+        return {
+            'hours': hours,
+            'total_calls': sum(row['calls'] for row in breakdown),
+            'total_tokens': sum(row['prompt_tokens'] + row['completion_tokens'] for row in breakdown),
+            'total_cost_usd': round(sum(row['cost_usd'] for row in rows), 6),
+            'budget': {
+                'period': self.period,
+                'period_budget_usd': self.period_budget_usd,
+                'period_cost_usd': round(await self.period_cost(), 6),
+                'max_prompt_tokens': self.max_prompt_tokens,
+                'over_budget': self.over_budget
+            },
+            'breakdown': breakdown
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        # Reads the encoding loaded by warm_encoding(); never loads it on the event loop
+        return {'tokenizer': 'tiktoken' if _encoding is not None else 'estimate', **self._stats}
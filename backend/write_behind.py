@@ -0,0 +1,153 @@
+"""
+Group-commit write-behind buffer for append-only collections
+Request handlers enqueue documents; a background flusher writes them with insert_many
+"""
+import asyncio
+import logging
+import time
+from collections import defaultdict, deque
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from pymongo.errors import BulkWriteError
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindBuffer:
+    """Batches inserts per collection and flushes them on size or time thresholds"""
+
+    OVERFLOW_POLICIES = ('flush', 'drop_oldest')
+
+    def __init__(self, db, batch_size: int = 200, flush_interval: float = 0.5,
+                 max_queued: int = 10000, overflow: str = 'flush'):
+        if overflow not in self.OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown write-behind overflow policy: {overflow}")
+        self.db = db
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queued = max_queued
+        self.overflow = overflow
+
+        self._queues: Dict[str, deque] = defaultdict(deque)
+        self._locks: Dict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+        self._hooks: Dict[str, List[Callable[[List[Dict[str, Any]]], Awaitable[None]]]] = defaultdict(list)
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._flush_latencies_ms = deque(maxlen=1000)
+        self._stats = {'enqueued': 0, 'written': 0, 'flushes': 0, 'overflow_flushes': 0,
+                       'dropped': 0, 'flush_errors': 0}
+
+    def register_hook(self, collection: str, hook: Callable[[List[Dict[str, Any]]], Awaitable[None]]):
+        """Run a coroutine with every batch after it has been written"""
+        self._hooks[collection].append(hook)
+
+    def queued(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    async def enqueue(self, collection: str, document: Dict[str, Any]):
+        """Buffer a document for the next group commit"""
+        if self.queued() >= self.max_queued and self.overflow == 'flush':
+            # Spill: the caller pays for writing the backlog now
+            self._stats['overflow_flushes'] += 1
+            await self.flush()
+        if self.queued() >= self.max_queued:
+            # Still full (or Mongo is unavailable): keep the queue bounded
+            largest = max(self._queues.values(), key=len)
+            largest.popleft()
+            self._stats['dropped'] += 1
+
+        self._queues[collection].append(document)
+        self._stats['enqueued'] += 1
+        if len(self._queues[collection]) >= self.batch_size and self._wake:
+            self._wake.set()
+
+    async def flush(self, collection: Optional[str] = None):
+        """Write pending documents for one collection, or for all of them"""
+        collections = [collection] if collection else list(self._queues)
+        for name in collections:
+            async with self._locks[name]:
+                queue = self._queues[name]
+                while queue:
+                    batch = [queue.popleft() for _ in range(min(self.batch_size, len(queue)))]
+                    if not await self._write(name, batch):
+                        # Put the batch back in order and retry on the next tick
+                        queue.extendleft(reversed(batch))
+                        break
+
+    async def _write(self, collection: str, batch: List[Dict[str, Any]]) -> bool:
+        started = time.perf_counter()
+        written = batch
+        try:
+            await self.db[collection].insert_many(batch, ordered=False)
+        except BulkWriteError as e:
+            # Per-document failures (e.g. duplicate keys) are dropped, not retried
+            failed = {error['index'] for error in e.details.get('writeErrors', [])}
+            written = [doc for index, doc in enumerate(batch) if index not in failed]
+            self._stats['dropped'] += len(failed)
+            logger.error(f"Dropped {len(failed)} of {len(batch)} documents writing to {collection}: {str(e)}")
+        except Exception as e:
+            self._stats['flush_errors'] += 1
+            logger.error(f"Error flushing {len(batch)} documents to {collection}: {str(e)}")
+            return False
+
+        self._flush_latencies_ms.append((time.perf_counter() - started) * 1000)
+        self._stats['flushes'] += 1
+        self._stats['written'] += len(written)
+
+        # Hooks see only the documents that were stored
+        if not written:
+            return True
+        for hook in self._hooks.get(collection, ()):
+            try:
+                await hook(written)
+            except Exception as e:
+                logger.error(f"Error in write-behind hook for {collection}: {str(e)}")
+        return True
+
+    def start(self):
+        """Start the periodic flusher on the running event loop"""
+        if self._task is None:
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the flusher and write everything still buffered"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth and flush latency"""
+        latencies = sorted(self._flush_latencies_ms)
+
+        def percentile(p):
+            if not latencies:
+                return 0
+            return round(latencies[min(len(latencies) - 1, int(len(latencies) * p))], 2)
+
+        return {
+            'queued': {name: len(queue) for name, queue in self._queues.items()},
+            'max_queued': self.max_queued,
+            'overflow_policy': self.overflow,
+            **self._stats,
+            'flush_latency_ms': {
+                'p50': percentile(0.5),
+                'p95': percentile(0.95),
+                'max': round(latencies[-1], 2) if latencies else 0,
+                'samples': len(latencies)
+            }
+        }
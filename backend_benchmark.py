@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+"""
+API Benchmark Suite for AI Cyber Security & Development Company
+Drives the FastAPI app in-process (or a server on localhost) against a local mongod with
+the LLM layer simulated, and reports p50/p95/p99 latency and throughput per endpoint
+"""
+
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+ROOT_DIR = Path(__file__).parent
+sys.path.insert(0, str(ROOT_DIR / 'backend'))
+
+# Target: in-process ASGI app when BENCH_URL is unset, else e.g. http://localhost:8001
+BENCH_URL = os.environ.get('BENCH_URL')
+MONGO_URL = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
+
+MIX = os.environ.get('BENCH_MIX', 'dashboard')  # dashboard | task_burst | mixed
+CONCURRENCY = int(os.environ.get('BENCH_CONCURRENCY', '50'))
+DURATION = float(os.environ.get('BENCH_DURATION_SECONDS', '30'))
+WARMUP = float(os.environ.get('BENCH_WARMUP_SECONDS', '2'))
+# Dashboard think time between polls; 0 runs the pollers closed-loop at full speed
+POLL_INTERVAL = float(os.environ.get('BENCH_POLL_INTERVAL_SECONDS', '5'))
+# Send If-None-Match with the last ETag, as browsers do
+CONDITIONAL = os.environ.get('BENCH_CONDITIONAL', 'true') == 'true'
+BURST_SIZE = int(os.environ.get('BENCH_TASK_BURST_SIZE', '20'))
+BURST_INTERVAL = float(os.environ.get('BENCH_TASK_BURST_INTERVAL_SECONDS', '5'))
+SEED_TASKS = int(os.environ.get('BENCH_SEED_TASKS', '1000'))
+# Provider calls go to the simulator (or replay recordings) unless overridden
+LLM_BACKEND = os.environ.setdefault('LLM_BACKEND', 'simulated')
+KEEP_DB = os.environ.get('BENCH_KEEP_DB', 'false') == 'true'
+
+MIXES = ('dashboard', 'task_burst', 'mixed')
+
+# The six requests Dashboard.jsx issues together every poll
+DASHBOARD_REQUESTS = [
+    ('GET /api/agents', '/api/agents'),
+    ('GET /api/tasks?status=in_progress', '/api/tasks?status=in_progress'),
+    ('GET /api/activities', '/api/activities'),
+    ('GET /api/certifications', '/api/certifications'),
+    ('GET /api/metrics/security', '/api/metrics/security'),
+    ('GET /api/metrics/development', '/api/metrics/development')
+]
+
+TASK_TITLES = [
+    "Security audit of payment service",
+    "Build deployment pipeline for API gateway",
+    "Review authentication module",
+    "GDPR compliance gap analysis",
+    "Threat hunt on VPN logs",
+    "Implement rate limiting for public endpoints"
+]
+
+
+def percentile(samples: List[float], p: float) -> float:
+    """Nearest-rank percentile of a sorted list"""
+    if not samples:
+        return 0
+    return samples[min(len(samples) - 1, int(len(samples) * p))]
+
+
+def git_revision() -> Dict[str, Any]:
+    """Commit the benchmark ran against, so runs can be compared across commits"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT_DIR, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=ROOT_DIR,
+                                    capture_output=True, text=True).stdout.strip())
+        return {'commit': commit, 'dirty': dirty}
+    except (OSError, subprocess.CalledProcessError):
+        return {'commit': 'unknown', 'dirty': None}
+
+
+class LatencyRecorder:
+    """Per-endpoint latency samples and status counts"""
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+        self.statuses: Dict[str, Dict[int, int]] = defaultdict(lambda: defaultdict(int))
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.recording = False
+        self.started_at = 0.0
+        self.stopped_at = 0.0
+
+    def start(self):
+        self.recording = True
+        self.started_at = time.perf_counter()
+
+    def stop(self):
+        self.recording = False
+        self.stopped_at = time.perf_counter()
+
+    def record(self, label: str, latency: float, status: Optional[int]):
+        if not self.recording:
+            return
+        self.samples[label].append(latency)
+        if status is None:
+            self.errors[label] += 1
+        else:
+            self.statuses[label][status] += 1
+            if status >= 400:
+                self.errors[label] += 1
+
+    def summarize(self, latencies: List[float], count: int, errors: int, elapsed: float) -> Dict[str, Any]:
+        latencies = sorted(latencies)
+        return {
+            'requests': count,
+            'errors': errors,
+            'throughput_rps': round(count / elapsed, 2) if elapsed else 0,
+            'latency_ms': {
+                'mean': round(sum(latencies) / len(latencies) * 1000, 2) if latencies else 0,
+                'p50': round(percentile(latencies, 0.5) * 1000, 2),
+                'p95': round(percentile(latencies, 0.95) * 1000, 2),
+                'p99': round(percentile(latencies, 0.99) * 1000, 2),
+                'max': round(latencies[-1] * 1000, 2) if latencies else 0
+            }
+        }
+
+    def report(self) -> Dict[str, Any]:
+        elapsed = self.stopped_at - self.started_at
+        endpoints = {}
+        for label in sorted(self.samples):
+            endpoints[label] = {
+                **self.summarize(self.samples[label], len(self.samples[label]), self.errors[label], elapsed),
+                'statuses': {str(status): count for status, count in sorted(self.statuses[label].items())}
+            }
+        all_latencies = [latency for samples in self.samples.values() for latency in samples]
+        return {
+            'elapsed_seconds': round(elapsed, 2),
+            'overall': self.summarize(all_latencies, len(all_latencies), sum(self.errors.values()), elapsed),
+            'endpoints': endpoints
+        }
+
+
+class ApiBenchmark:
+    def __init__(self):
+        self.db_name = f"benchmark_{uuid.uuid4().hex[:8]}"
+        self.server = None
+        self.app = None
+        self.client: Optional[httpx.AsyncClient] = None
+        self.recorder = LatencyRecorder()
+        self.deadline = 0.0
+
+    async def setup(self):
+        """Start the app in-process on a scratch database, or connect to BENCH_URL"""
+        if BENCH_URL:
+            self.client = httpx.AsyncClient(base_url=BENCH_URL, timeout=60)
+            return
+
+        os.environ['MONGO_URL'] = MONGO_URL
+        os.environ['DB_NAME'] = self.db_name
+        import server
+        self.server = server
+        self.app = server.create_app()
+        await server.startup_db_client(self.app.state)
+        await self.check_llm_backend()
+        await self.seed()
+        self.client = httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=self.app), base_url='http://benchmark', timeout=60
+        )
+
+    async def check_llm_backend(self):
+        """Fail fast if agent chats error out, so the run does not time the error path"""
+        from agent_system import CHAT_ERROR_PREFIX
+        response = await self.server.get_orchestrator(self.app.state).get_agent('agent-1').chat("Benchmark preflight check")
+        if not response or response.startswith(CHAT_ERROR_PREFIX):
+            raise RuntimeError(f"LLM backend {LLM_BACKEND!r} is not answering chats: {response[:200]}")
+        print(f"✅ LLM backend {LLM_BACKEND!r} answers chats ({len(response)} chars)")
+
+    async def seed(self):
+        """Seed tasks and activities so queries see realistic collection sizes"""
+        db = self.app.state.db
+        now = datetime.utcnow()
+        agent_ids = [f"agent-{i}" for i in range(1, 7)]
+        if SEED_TASKS:
+            await db.tasks.insert_many([
+                {
+                    "task_id": str(uuid.uuid4()),
+                    "title": random.choice(TASK_TITLES),
+                    "description": "Seeded benchmark task",
+                    "assigned_agent_id": random.choice(agent_ids),
+                    "priority": random.choice(["critical", "high", "medium", "low"]),
+                    "status": random.choice(["pending", "in_progress", "completed", "failed"]),
+                    "progress": random.randint(0, 100),
+                    "result": "Seeded result: vulnerability fixed",
+                    "created_at": now - timedelta(minutes=i),
+                    "completed_at": now - timedelta(minutes=i // 2)
+                }
+                for i in range(SEED_TASKS)
+            ])
+            for i in range(SEED_TASKS):
+                await self.app.state.activity_store.record({
+                    "activity_id": str(uuid.uuid4()),
+                    "agent_id": random.choice(agent_ids),
+                    "action": "Seeded benchmark activity",
+                    "activity_type": random.choice(["info", "success"]),
+                    "timestamp": now - timedelta(minutes=i)
+                })
+            await self.app.state.write_behind.flush()
+
+    async def teardown(self):
+        if self.client:
+            await self.client.aclose()
+        if self.server:
+            await self.server.shutdown_db_client(self.app.state)
+            if not KEEP_DB:
+                from motor.motor_asyncio import AsyncIOMotorClient
+                cleanup = AsyncIOMotorClient(MONGO_URL)
+                await cleanup.drop_database(self.db_name)
+                cleanup.close()
+
+    async def request(self, label: str, method: str, url: str, etags: Optional[Dict[str, str]] = None,
+                      **kwargs) -> Optional[httpx.Response]:
+        headers = {}
+        if etags is not None and url in etags:
+            headers['If-None-Match'] = etags[url]
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, headers=headers, **kwargs)
+        except httpx.HTTPError:
+            self.recorder.record(label, time.perf_counter() - started, None)
+            return None
+        self.recorder.record(label, time.perf_counter() - started, response.status_code)
+        if etags is not None and response.headers.get('etag'):
+            etags[url] = response.headers['etag']
+        return response
+
+    async def dashboard_user(self):
+        """One browser tab: six parallel GETs, then wait for the next poll"""
+        etags = {} if CONDITIONAL else None
+        await asyncio.sleep(random.uniform(0, POLL_INTERVAL or 0.1))
+        while time.perf_counter() < self.deadline:
+            await asyncio.gather(*[
+                self.request(label, 'GET', url, etags) for label, url in DASHBOARD_REQUESTS
+            ])
+            if POLL_INTERVAL:
+                await asyncio.sleep(POLL_INTERVAL)
+
+    async def create_and_fetch_task(self, semaphore: asyncio.Semaphore):
+        async with semaphore:
+            response = await self.request('POST /api/tasks', 'POST', '/api/tasks', json={
+                "title": random.choice(TASK_TITLES),
+                "description": "Benchmark burst task",
+                "priority": random.choice(["critical", "high", "medium", "low"])
+            })
+            if response is not None and response.status_code == 200:
+                # The task list refreshes after a create
+                await self.request('GET /api/tasks', 'GET', '/api/tasks')
+
+    async def task_bursts(self):
+        """Bursts of task creations, at most CONCURRENCY in flight"""
+        semaphore = asyncio.Semaphore(CONCURRENCY)
+        while time.perf_counter() < self.deadline:
+            await asyncio.gather(*[self.create_and_fetch_task(semaphore) for _ in range(BURST_SIZE)])
+            await asyncio.sleep(BURST_INTERVAL)
+
+    async def run(self) -> Dict[str, Any]:
+        workers = []
+        if MIX in ('dashboard', 'mixed'):
+            workers.extend(self.dashboard_user() for _ in range(CONCURRENCY))
+        if MIX in ('task_burst', 'mixed'):
+            workers.append(self.task_bursts())
+
+        self.deadline = time.perf_counter() + WARMUP + DURATION
+        runner = asyncio.gather(*workers)
+        await asyncio.sleep(WARMUP)
+        self.recorder.start()
+        await runner
+        self.recorder.stop()
+        return self.recorder.report()
+
+    async def run_benchmark(self) -> Dict[str, Any]:
+        """Set up, drive the configured mix and report"""
+        print("🚀 Starting API Benchmark")
+        print(f"📍 Target: {BENCH_URL or f'in-process app on {MONGO_URL} (database {self.db_name})'}")
+        print(f"⚙️  Mix: {MIX}, concurrency {CONCURRENCY}, {DURATION:.0f}s after {WARMUP:.0f}s warmup")
+        print("=" * 80)
+
+        await self.setup()
+        try:
+            report = await self.run()
+        finally:
+            await self.teardown()
+
+        print("\n" + "=" * 80)
+        print("📊 BENCHMARK SUMMARY")
+        print("=" * 80)
+        print(f"{'endpoint':<40} {'reqs':>7} {'err':>5} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8}")
+        rows: List[Tuple[str, Dict[str, Any]]] = list(report['endpoints'].items()) + [('TOTAL', report['overall'])]
+        for label, stats in rows:
+            latency = stats['latency_ms']
+            print(f"{label:<40} {stats['requests']:>7} {stats['errors']:>5} {stats['throughput_rps']:>8} "
+                  f"{latency['p50']:>8} {latency['p95']:>8} {latency['p99']:>8}")
+        return report
+
+
+async def main():
+    """Main benchmark runner"""
+    if MIX not in MIXES:
+        print(f"❌ Unknown BENCH_MIX {MIX!r}; expected one of {', '.join(MIXES)}")
+        return 2
+
+    benchmark = ApiBenchmark()
+    report = await benchmark.run_benchmark()
+    revision = git_revision()
+    results = {
+        **revision,
+        'timestamp': datetime.now().isoformat(),
+        'config': {
+            'target': BENCH_URL or 'in-process',
+            'mix': MIX,
+            'concurrency': CONCURRENCY,
+            'duration_seconds': DURATION,
+            'warmup_seconds': WARMUP,
+            'poll_interval_seconds': POLL_INTERVAL,
+            'conditional_requests': CONDITIONAL,
+            'task_burst_size': BURST_SIZE,
+            'task_burst_interval_seconds': BURST_INTERVAL,
+            'seed_tasks': SEED_TASKS,
+            'llm_backend': LLM_BACKEND,
+            'llm_simulator_seed': os.environ.get('LLM_SIMULATOR_SEED', '42'),
+            'llm_simulator_time_scale': os.environ.get('LLM_SIMULATOR_TIME_SCALE', '1.0')
+        },
+        **report
+    }
+
+    output = os.environ.get('BENCH_RESULTS', f"benchmark_{MIX}_{revision['commit'][:8]}.json")
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2, default=str)
+    print(f"\n💾 Benchmark results saved to {output}")
+
+    return 1 if report['overall']['errors'] else 0
+
+
+if __name__ == "__main__":
+    exit_code = asyncio.run(main())
+    exit(exit_code)
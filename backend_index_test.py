@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Index Plan Verification Suite for AI Cyber Security & Development Company
+Seeds a scratch database on a local mongod, ensures the registered indexes and
+asserts via explain() that no route query is answered with a COLLSCAN
+"""
+
+import asyncio
+import json
+import os
+import random
+import sys
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, List
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+sys.path.insert(0, str(Path(__file__).parent / 'backend'))
+from activity_store import ActivityStore  # noqa: E402
+from db_indexes import INDEXES, ROUTE_QUERIES, ensure_indexes  # noqa: E402
+
+MONGO_URL = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
+SEED_SIZE = int(os.environ.get('INDEX_TEST_SEED_SIZE', '2000'))
+
+
+def plan_stages(plan: Any) -> List[str]:
+    """Collect every stage name in an explain() plan tree"""
+    stages = []
+    if isinstance(plan, dict):
+        if 'stage' in plan:
+            stages.append(plan['stage'])
+        for value in plan.values():
+            stages.extend(plan_stages(value))
+    elif isinstance(plan, list):
+        for item in plan:
+            stages.extend(plan_stages(item))
+    return stages
+
+
+def winning_plans(explain: Any) -> List[Any]:
+    """Every winningPlan in an explain() result; time-series finds nest it under stages"""
+    plans = []
+    if isinstance(explain, dict):
+        for key, value in explain.items():
+            if key == 'winningPlan':
+                plans.append(value)
+            elif key != 'rejectedPlans':
+                plans.extend(winning_plans(value))
+    elif isinstance(explain, list):
+        for item in explain:
+            plans.extend(winning_plans(item))
+    return plans
+
+
+class IndexPlanTester:
+    def __init__(self):
+        self.client = AsyncIOMotorClient(MONGO_URL)
+        self.db_name = f"index_plan_test_{uuid.uuid4().hex[:8]}"
+        self.db = self.client[self.db_name]
+        self.test_results = []
+
+    def log_test(self, test_name: str, success: bool, details: str = "", response_data: Any = None):
+        """Log test results"""
+        result = {
+            "test": test_name,
+            "success": success,
+            "details": details,
+            "timestamp": datetime.now().isoformat(),
+            "response_data": response_data
+        }
+        self.test_results.append(result)
+        status = "✅ PASS" if success else "❌ FAIL"
+        print(f"{status} {test_name}: {details}")
+
+    async def seed(self):
+        """Seed enough documents that the planner has real choices to make"""
+        now = datetime.utcnow()
+        statuses = ["pending", "in_progress", "completed", "failed"]
+        priorities = ["critical", "high", "medium", "low"]
+        agent_ids = [f"agent-{i}" for i in range(1, 7)]
+
+        # Collections the backend creates with options (time-series activities) are made
+        # the way startup makes them, so plans are checked against the real layout
+        await ActivityStore(self.db).ensure_collection()
+
+        await self.db.agents.insert_many([
+            {"agent_id": agent_id, "name": f"Agent {agent_id}", "type": "Security Analyst", "status": "active"}
+            for agent_id in agent_ids
+        ])
+        await self.db.tasks.insert_many([
+            {
+                "task_id": f"task-{i:08d}",
+                "title": f"Task {i}",
+                "description": "Seeded task",
+                "assigned_agent_id": random.choice(agent_ids),
+                "priority": random.choice(priorities),
+                "status": random.choice(statuses),
+                "progress": random.randint(0, 100),
+                "created_at": now - timedelta(minutes=i),
+                "completed_at": now - timedelta(minutes=i // 2),
+                # A few results still inline and findings of mixed versions, as before migration
+                **({"result": "Seeded result"} if i % 10 == 0 else {"result_preview": "Seeded result"}),
+                **({"findings": {"version": 1}} if i % 3 else {})
+            }
+            for i in range(SEED_SIZE)
+        ])
+        await self.db.activities.insert_many([
+            {
+                "activity_id": f"act-{i:08d}",
+                "agent_id": random.choice(agent_ids),
+                "action": "Seeded activity",
+                "activity_type": random.choice(["info", "success", "alert", "warning"]),
+                "timestamp": now - timedelta(minutes=i)
+            }
+            for i in range(SEED_SIZE)
+        ])
+        await self.db.hive_messages.insert_many([
+            {"message_id": f"msg-{i:08d}", "from_agent_id": random.choice(agent_ids), "to_agent_id": "all",
+             "message": "Seeded message", "timestamp": now - timedelta(minutes=i)}
+            for i in range(SEED_SIZE)
+        ])
+        await self.db.certifications.insert_many([
+            {"name": f"CERT-{i}", "progress": 50, "status": random.choice(["in_progress", "certified"])}
+            for i in range(20)
+        ])
+        await self.db.health_checks.insert_many([
+            {"status": random.choice(["healthy", "degraded"]), "timestamp": now - timedelta(minutes=i)}
+            for i in range(SEED_SIZE)
+        ])
+        await self.db.error_logs.insert_many([
+            {"message": "Seeded error", "timestamp": now - timedelta(minutes=i)}
+            for i in range(SEED_SIZE)
+        ])
+
+    async def test_indexes_created(self):
+        """Every registered index exists after ensure_indexes()"""
+        ensured = await ensure_indexes(self.db)
+        for collection, indexes in INDEXES.items():
+            expected = {index.document['name'] for index in indexes}
+            existing = set((await self.db[collection].index_information()).keys())
+            missing = expected - existing
+            self.log_test(
+                f"Indexes on {collection}",
+                not missing,
+                f"missing: {sorted(missing)}" if missing else f"{len(expected)} ensured",
+                ensured.get(collection)
+            )
+
+    async def test_route_query_plans(self):
+        """No registered route query uses a collection scan"""
+        for query in ROUTE_QUERIES:
+            cursor = self.db[query['collection']].find(query['filter'])
+            if query.get('sort'):
+                cursor = cursor.sort(query['sort'])
+            if query.get('limit'):
+                cursor = cursor.limit(query['limit'])
+            explain = await cursor.explain()
+            stages = plan_stages(winning_plans(explain))
+            self.log_test(
+                query['route'],
+                bool(stages) and 'COLLSCAN' not in stages,
+                " -> ".join(reversed(stages)),
+                {"collection": query['collection'], "stages": stages}
+            )
+
+    async def run_all_tests(self):
+        """Run all index plan tests"""
+        print("🚀 Starting Index Plan Verification")
+        print(f"📍 Testing against: {MONGO_URL} (database {self.db_name})")
+        print("=" * 80)
+
+        try:
+            await self.seed()
+            await self.test_indexes_created()
+            await self.test_route_query_plans()
+        finally:
+            await self.client.drop_database(self.db_name)
+            self.client.close()
+
+        print("\n" + "=" * 80)
+        print("📊 TEST SUMMARY")
+        print("=" * 80)
+
+        passed = sum(1 for result in self.test_results if result['success'])
+        total = len(self.test_results)
+
+        print(f"Total Tests: {total}")
+        print(f"Passed: {passed}")
+        print(f"Failed: {total - passed}")
+
+        failed_tests = [result for result in self.test_results if not result['success']]
+        if failed_tests:
+            print("\n❌ FAILED TESTS:")
+            for test in failed_tests:
+                print(f"  - {test['test']}: {test['details']}")
+
+        return self.test_results
+
+
+async def main():
+    """Main test runner"""
+    tester = IndexPlanTester()
+    results = await tester.run_all_tests()
+
+    output = os.environ.get('INDEX_TEST_RESULTS', 'index_test_results.json')
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2, default=str)
+    print(f"\n💾 Test results saved to {output}")
+
+    return sum(1 for result in results if not result['success'])
+
+
+if __name__ == "__main__":
+    exit_code = asyncio.run(main())
+    exit(exit_code)
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Task Routing Simulation for AI Cyber Security & Development Company
+Replays a skewed task workload against the legacy keyword routing and the load-aware
+TaskRouter, with service times from the LLM simulator, and compares queue wait times
+"""
+
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+sys.path.insert(0, str(Path(__file__).parent / 'backend'))
+from agent_system import HiveMindOrchestrator  # noqa: E402
+from llm_simulator import SimulatedLlmChat  # noqa: E402
+from task_router import TaskRouter  # noqa: E402
+
+TASKS = int(os.environ.get('ROUTING_SIM_TASKS', '300'))
+ARRIVALS_PER_SECOND = float(os.environ.get('ROUTING_SIM_ARRIVALS_PER_SECOND', '1.5'))  # simulated time
+CAPACITY = int(os.environ.get('AGENT_MAX_CONCURRENT_TASKS', '2'))
+# Real seconds per simulated second; 0.01 replays 100 simulated seconds in one
+TIME_SCALE = float(os.environ.get('ROUTING_SIM_TIME_SCALE', '0.01'))
+SEED = int(os.environ.get('ROUTING_SIM_SEED', '7'))
+os.environ.setdefault('LLM_SIMULATOR_SEED', str(SEED))
+
+# Skewed workload: most tasks are security work, the rest spread over the other specialties
+WORKLOAD: List[Tuple[float, List[str]]] = [
+    (0.60, ["Security audit of payment service", "Threat hunt on VPN logs", "Vulnerability scan of public hosts",
+            "Security review of login flow", "Investigate suspicious attack traffic"]),
+    (0.10, ["Penetration test of web app", "OWASP Top 10 assessment of API", "Network pentesting of DMZ"]),
+    (0.08, ["Encrypt customer database backups", "Rotate key management for TLS certificates"]),
+    (0.10, ["Build deployment pipeline for API gateway", "Implement rate limiting for public endpoints"]),
+    (0.07, ["Review authentication module code", "Static analysis of billing service"]),
+    (0.05, ["GDPR compliance gap analysis", "HIPAA policy review"])
+]
+
+STRATEGIES = ('keyword', 'load_aware')
+
+orchestrator = HiveMindOrchestrator()
+
+
+def keyword_route(title: str, description: str) -> str:
+    """Routing used before TaskRouter: first matching keyword, else agent-1"""
+    task_lower = title.lower() + " " + description.lower()
+    if any(word in task_lower for word in ["security", "threat", "vulnerability"]):
+        return "agent-1"
+    elif any(word in task_lower for word in ["code", "develop", "build"]):
+        return "agent-4"
+    elif any(word in task_lower for word in ["review", "audit"]):
+        return "agent-5"
+    elif any(word in task_lower for word in ["compliance", "regulation"]):
+        return "agent-6"
+    return "agent-1"
+
+
+def percentile(samples: List[float], p: float) -> float:
+    """Nearest-rank percentile of a sorted list"""
+    if not samples:
+        return 0
+    return samples[min(len(samples) - 1, int(len(samples) * p))]
+
+
+def generate_workload() -> List[Dict[str, Any]]:
+    """Arrival times and titles, identical for every strategy"""
+    rng = random.Random(SEED)
+    weights = [weight for weight, _ in WORKLOAD]
+    arrival = 0.0
+    tasks = []
+    for i in range(TASKS):
+        arrival += rng.expovariate(ARRIVALS_PER_SECOND)
+        titles = rng.choices([titles for _, titles in WORKLOAD], weights=weights)[0]
+        tasks.append({"index": i, "arrival": arrival, "title": rng.choice(titles), "description": "Simulated task"})
+    return tasks
+
+
+def service_time(agent_id: str, title: str) -> float:
+    """Simulated seconds the agent's provider takes to answer this task"""
+    agent = orchestrator.get_agent(agent_id)
+    chat = SimulatedLlmChat(system_message=agent.system_prompt).with_model(agent.model_provider, agent.model_name)
+    plan = chat.plan(title)
+    return plan['ttft'] + len(plan['tokens']) * plan['token_interval']
+
+
+class RoutingSimulation:
+    def __init__(self, strategy: str, workload: List[Dict[str, Any]]):
+        self.strategy = strategy
+        self.workload = workload
+        self.router = TaskRouter(orchestrator.get_all_agents().values(), capacity=CAPACITY)
+        self.waits: List[float] = []
+        self.completions: List[float] = []
+        self.assignments = Counter()
+
+    def dispatch(self, task: Dict[str, Any]) -> str:
+        if self.strategy == 'keyword':
+            agent_id = keyword_route(task["title"], task["description"])
+            self.router.agents[agent_id].queued += 1
+            return agent_id
+        agent_id, _ = self.router.route(task["title"], task["description"])
+        return agent_id
+
+    async def run_task(self, task: Dict[str, Any], started: float):
+        await asyncio.sleep(max(0.0, task["arrival"] * TIME_SCALE - (time.perf_counter() - started)))
+        arrived = time.perf_counter()
+        agent_id = self.dispatch(task)
+        self.assignments[agent_id] += 1
+        async with self.router.slot(agent_id) as waited:
+            self.waits.append(waited / TIME_SCALE)
+            await asyncio.sleep(service_time(agent_id, task["title"]) * TIME_SCALE)
+        self.completions.append((time.perf_counter() - arrived) / TIME_SCALE)
+
+    async def run(self) -> Dict[str, Any]:
+        started = time.perf_counter()
+        await asyncio.gather(*[self.run_task(task, started) for task in self.workload])
+        makespan = (time.perf_counter() - started) / TIME_SCALE
+
+        waits = sorted(self.waits)
+        completions = sorted(self.completions)
+        return {
+            "strategy": self.strategy,
+            "tasks": len(waits),
+            "makespan_s": round(makespan, 1),
+            "queue_wait_s": {
+                "mean": round(sum(waits) / len(waits), 2) if waits else 0,
+                "p50": round(percentile(waits, 0.5), 2),
+                "p95": round(percentile(waits, 0.95), 2),
+                "p99": round(percentile(waits, 0.99), 2),
+                "max": round(waits[-1], 2) if waits else 0
+            },
+            "completion_s": {
+                "p50": round(percentile(completions, 0.5), 2),
+                "p95": round(percentile(completions, 0.95), 2)
+            },
+            "tasks_per_agent": {agent_id: self.assignments.get(agent_id, 0) for agent_id in sorted(self.router.agents)}
+        }
+
+
+async def main():
+    """Run every strategy on the same workload"""
+    print("🚀 Starting Task Routing Simulation")
+    print(f"⚙️  {TASKS} tasks at {ARRIVALS_PER_SECOND}/s, {CAPACITY} slots per agent, time scale {TIME_SCALE}")
+    print("=" * 80)
+
+    workload = generate_workload()
+    results = []
+    for strategy in STRATEGIES:
+        SimulatedLlmChat._occurrences.clear()  # identical service times for every strategy
+        result = await RoutingSimulation(strategy, workload).run()
+        results.append(result)
+        wait = result["queue_wait_s"]
+        print(f"{strategy:<12} wait mean {wait['mean']:>8}s  p50 {wait['p50']:>8}s  p95 {wait['p95']:>8}s  "
+              f"p99 {wait['p99']:>8}s  makespan {result['makespan_s']}s")
+        print(f"{'':<12} tasks per agent: {result['tasks_per_agent']}")
+
+    output = os.environ.get('ROUTING_SIM_RESULTS', 'routing_simulation_results.json')
+    with open(output, 'w') as f:
+        json.dump({
+            "timestamp": datetime.now().isoformat(),
+            "config": {
+                "tasks": TASKS,
+                "arrivals_per_second": ARRIVALS_PER_SECOND,
+                "capacity_per_agent": CAPACITY,
+                "time_scale": TIME_SCALE,
+                "seed": SEED
+            },
+            "results": results
+        }, f, indent=2)
+    print(f"\n💾 Simulation results saved to {output}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
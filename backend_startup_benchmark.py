@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Cold Start Benchmark for AI Cyber Security & Development Company
+Starts the backend in fresh interpreters against a scratch database on a local mongod and
+reports import, startup phase and first-request times for a first boot and worker respawns
+"""
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List
+
+from backend_benchmark import git_revision
+
+ROOT_DIR = Path(__file__).parent
+MONGO_URL = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
+RUNS = int(os.environ.get('STARTUP_BENCH_RUNS', '5'))  # respawns after the first boot
+KEEP_DB = os.environ.get('BENCH_KEEP_DB', 'false') == 'true'
+
+# Runs inside each fresh interpreter and prints one JSON line of timings
+WORKER = """
+import asyncio, json, time
+started = time.perf_counter()
+import server
+import httpx
+imported = time.perf_counter()
+
+async def boot():
+    app = server.create_app()
+    await server.startup_db_client(app.state)
+    booted = time.perf_counter()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url='http://startup') as client:
+        response = await client.get('/api/agents')
+    first_request = time.perf_counter()
+    await server.shutdown_db_client(app.state)
+    print(json.dumps({
+        'import_ms': round((imported - started) * 1000, 1),
+        'startup_ms': app.state.startup_report['startup_ms'],
+        'phases': app.state.startup_report['phases'],
+        'first_request_ms': round((first_request - booted) * 1000, 1),
+        'first_request_status': response.status_code,
+        'ready_ms': round((booted - started) * 1000, 1)
+    }))
+
+asyncio.run(boot())
+"""
+
+
+def spawn(db_name: str) -> Dict[str, Any]:
+    env = {**os.environ, 'MONGO_URL': MONGO_URL, 'DB_NAME': db_name}
+    env.setdefault('LLM_BACKEND', 'simulated')
+    result = subprocess.run(
+        [sys.executable, '-c', WORKER], cwd=ROOT_DIR / 'backend', env=env,
+        capture_output=True, text=True, timeout=120
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Worker failed: {result.stderr[-2000:]}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def summarize(samples: List[Dict[str, Any]]) -> Dict[str, Any]:
+    keys = ('import_ms', 'startup_ms', 'first_request_ms', 'ready_ms')
+    summary = {key: {'median': round(statistics.median(s[key] for s in samples), 1),
+                     'max': max(s[key] for s in samples)} for key in keys}
+    phases = sorted({phase for s in samples for phase in s['phases']})
+    summary['phases'] = {phase: round(statistics.median(s['phases'].get(phase, 0) for s in samples), 1)
+                         for phase in phases}
+    return summary
+
+
+def main():
+    """Boot once on an empty database, then respawn RUNS times on the seeded one"""
+    db_name = f"startup_benchmark_{uuid.uuid4().hex[:8]}"
+    print("🚀 Starting Cold Start Benchmark")
+    print(f"⚙️  Database {db_name} on {MONGO_URL}, {RUNS} respawns")
+    print("=" * 80)
+
+    try:
+        first_boot = spawn(db_name)
+        print(f"First boot: ready in {first_boot['ready_ms']} ms "
+              f"(import {first_boot['import_ms']} ms, startup {first_boot['startup_ms']} ms)")
+        respawns = []
+        for i in range(RUNS):
+            respawns.append(spawn(db_name))
+            print(f"Respawn {i + 1}: ready in {respawns[-1]['ready_ms']} ms, "
+                  f"first request {respawns[-1]['first_request_ms']} ms")
+    finally:
+        if not KEEP_DB:
+            from pymongo import MongoClient
+            MongoClient(MONGO_URL).drop_database(db_name)
+
+    results = {
+        **git_revision(),
+        'timestamp': datetime.now().isoformat(),
+        'config': {'runs': RUNS, 'seed_database': os.environ.get('SEED_DATABASE', 'true')},
+        'first_boot': first_boot,
+        'respawn': summarize(respawns) if respawns else {}
+    }
+    output = os.environ.get('BENCH_RESULTS', f"startup_benchmark_{results['commit'][:8]}.json")
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\n💾 Startup benchmark results saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -163,13 +163,16 @@ class BackendTester:
                 has_required_fields = all(field in data for field in required_fields)
                 no_id_field = '_id' not in data
                 
-                if has_required_fields and no_id_field and data['status'] == 'in_progress':
+                # Pending until the agent has a free slot, then in progress
+                valid_status = data.get('status') in ('pending', 'in_progress')
+                
+                if has_required_fields and no_id_field and valid_status:
                     self.log_test("POST /api/tasks", True, f"Created task {data['task_id']} assigned to {data.get('assigned_agent_id')}", data)
                 else:
                     issues = []
                     if not has_required_fields: issues.append("missing required fields")
                     if not no_id_field: issues.append("contains _id field")
-                    if data.get('status') != 'in_progress': issues.append("incorrect status")
+                    if not valid_status: issues.append("incorrect status")
                     self.log_test("POST /api/tasks", False, f"Data validation failed: {', '.join(issues)}")
             else:
                 self.log_test("POST /api/tasks", False, f"Expected task object with task_id, got {type(data)}")